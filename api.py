@@ -4,20 +4,20 @@ if __name__ == '__main__':
     import multiprocessing
     import random
     import re
-    import shutil
     import threading
     import time
     from pathlib import Path
 
-    from flask import Flask, request, jsonify
+    from flask import Flask, request, jsonify, Response, stream_with_context
     from waitress import serve
 
 
     from videotrans.configure import config
+    from videotrans.configure._status import END_STATUS, LOGS_STATUS
     from videotrans.task._dubbing import DubbingSrt
     from videotrans.task._speech2text import SpeechToText
     from videotrans.task._translate_srt import TranslateSrt
-    from videotrans.task.job import start_thread
+    from videotrans.task.job import start_thread, queue_stats
     from videotrans.task.trans_create import TransCreate
     from videotrans.util import tools
     from videotrans import tts as tts_model, translator, recognition
@@ -40,18 +40,17 @@ if __name__ == '__main__':
     API_RESOURCE='apidata'
     TARGET_DIR = ROOT_DIR + f'/{API_RESOURCE}'
     Path(TARGET_DIR).mkdir(parents=True, exist_ok=True)
-    # 进度日志
-    PROCESS_INFO = TARGET_DIR + '/processinfo'
-    if Path(PROCESS_INFO).is_dir():
-        shutil.rmtree(PROCESS_INFO)
-    Path(PROCESS_INFO).mkdir(parents=True, exist_ok=True)
     # url前缀
     URL_PREFIX = f"http://{HOST}:{PORT}/{API_RESOURCE}"
     config.exit_soft = False
+    # 工作线程数，每个 /task_events 连接占用一个线程直至任务结束，推送连接数需小于此值，为其他接口保留线程
+    API_THREADS = max(4, int(float(config.settings.get('api_threads', 16))))
+    SSE_MAX = max(1, min(int(float(config.settings.get('api_sse_max', 8))), API_THREADS - 2))
+    _sse_slots = threading.BoundedSemaphore(SSE_MAX)
     # 停止 结束 失败状态
-    end_status_list = ['error', 'succeed', 'end', 'stop']
+    end_status_list = END_STATUS
     #日志状态
-    logs_status_list = ['logs']
+    logs_status_list = LOGS_STATUS
 
     ######################
 
@@ -537,18 +536,62 @@ if __name__ == '__main__':
             return_data[task_id]=_get_task_data(task_id)
         return jsonify({"code": 0, "msg": "ok","data":return_data})
     
-    def _get_task_data(task_id):
-        file = PROCESS_INFO + f'/{task_id}.json'
-        if not Path(file).is_file():
-            if task_id in config.uuid_logs_queue:
-                return {"code": -1, "msg": _get_order(task_id)}
-
-            return {"code": 1, "msg": f"该任务 {task_id} 不存在"}
+    # 各阶段排队深度及等待秒数
+    @app.route('/queue_stats', methods=['POST', 'GET'])
+    def queue_stats_api():
+        return jsonify({"code": 0, "msg": "ok", "data": queue_stats()})
 
+    # 推送任务进度 text/event-stream，可通过 last_id 参数或 Last-Event-ID 头从断点继续
+    # 每条消息 id 为序号，data 为 {"text":"","type":"logs|error|succeed|..","uuid":""}，任务结束后关闭连接
+    # 同时保持的连接数受 api_sse_max 限制，超出时返回 503
+    @app.route('/task_events', methods=['GET'])
+    def task_events():
+        task_id = request.args.get('task_id')
+        if not task_id:
+            return jsonify({"code": 1, "msg": "The parem  task_id is not set"})
+        if task_id not in config.task_status:
+            return jsonify({"code": 1, "msg": f"该任务 {task_id} 不存在"})
         try:
-            data = json.loads(Path(file).read_text(encoding='utf-8'))
-        except Exception as e:
-            return {"code": -1, "msg": Path(file).read_text(encoding='utf-8')}
+            last_id = int(request.args.get('last_id') or request.headers.get('Last-Event-ID') or 0)
+        except ValueError:
+            last_id = 0
+        # 推送连接已满时拒绝，避免占满工作线程导致其他接口无法响应
+        if not _sse_slots.acquire(blocking=False):
+            return jsonify({"code": 1, "msg": f"推送连接数已达上限 {SSE_MAX}，请使用 /task_status 查询" if config.defaulelang == 'zh' else f"Too many event streams (max {SSE_MAX}), please poll /task_status"}), 503
+        released = []
+
+        def _release():
+            if not released:
+                released.append(1)
+                _sse_slots.release()
+
+        def _stream(last_id):
+            while 1:
+                events = config.task_status.wait_events(task_id, after=last_id, timeout=15)
+                if events is None:
+                    return
+                if not events:
+                    # 保持连接
+                    yield ": keepalive\n\n"
+                    continue
+                for seq, data in events:
+                    last_id = seq
+                    yield f"id: {seq}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                    if data.get('type') in end_status_list:
+                        return
+
+        resp = Response(stream_with_context(_stream(last_id)), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        # 任务结束或客户端断开时归还名额
+        resp.call_on_close(_release)
+        return resp
+
+    def _get_task_data(task_id):
+        data = config.task_status.latest(task_id)
+        if data is None:
+            return {"code": 1, "msg": f"该任务 {task_id} 不存在"}
+        if not data:
+            return {"code": -1, "msg": _get_order(task_id)}
 
         if data['type'] == 'error':
             return {"code": 3, "msg": data["text"]}
@@ -571,39 +614,23 @@ if __name__ == '__main__':
 
     # 排队
     def _get_order(task_id):
-        order_num=0
-        for it in config.prepare_queue:
-            order_num+=1
-            if it.uuid == task_id:
-                return f'当前处于预处理队列第{order_num}位' if config.defaulelang=='zh' else f"No.{order_num} on perpare queue"
-        
-        order_num=0
-        for it in config.regcon_queue:
-            order_num+=1
-            if it.uuid == task_id:
-                return f'当前处于语音识别队列第{order_num}位' if config.defaulelang=='zh' else f"No.{order_num} on perpare queue"
-        order_num=0
-        for it in config.trans_queue:
-            order_num+=1
-            if it.uuid == task_id:
-                return f'当前处于字幕翻译队列第{order_num}位' if config.defaulelang=='zh' else f"No.{order_num} on perpare queue"
-        order_num=0
-        for it in config.dubb_queue:
-            order_num+=1
-            if it.uuid == task_id:
-                return f'当前处于配音队列第{order_num}位' if config.defaulelang=='zh' else f"No.{order_num} on perpare queue"
-        order_num=0
-        for it in config.align_queue:
-            order_num+=1
-            if it.uuid == task_id:
-                return f'当前处于声画对齐队列第{order_num}位' if config.defaulelang=='zh' else f"No.{order_num} on perpare queue"
-        order_num=0
-        for it in config.assemb_queue:
-            order_num+=1
-            if it.uuid == task_id:
-                return f'当前处于输出整理队列第{order_num}位' if config.defaulelang=='zh' else f"No.{order_num} on perpare queue"
+        names = {
+            "prepare": ['预处理', 'prepare'],
+            "regcon": ['语音识别', 'recognition'],
+            "trans": ['字幕翻译', 'translation'],
+            "dubb": ['配音', 'dubbing'],
+            "audio_align": ['AI自动对齐', 'auto align'],
+            "align": ['声画对齐', 'align'],
+            "assemb": ['输出整理', 'assemble'],
+        }
+        for name, q in config.STAGE_QUEUES.items():
+            order_num = q.position(task_id)
+            if order_num:
+                stats = q.stats()
+                zh, en = names.get(name, [name, name])
+                return f'当前处于{zh}队列第{order_num}位，平均等待{stats["avg_wait"]}秒' if config.defaulelang=='zh' else f"No.{order_num} on {en} queue, average wait {stats['avg_wait']}s"
         return '正在排队等待执行中，请稍后' if config.defaulelang=='zh' else f"Waiting in queue"
-    
+
     def _get_files_in_directory(dirname):
         """
         使用 pathlib 库获取指定目录下的所有文件名，并返回一个文件名列表。
@@ -624,48 +651,19 @@ if __name__ == '__main__':
             return []
 
 
-    def _listen_queue():
-        # 监听队列日志 uuid_logs_queue 不在停止中的 stoped_uuid_set
-        Path(TARGET_DIR + f'/processinfo').mkdir(parents=True, exist_ok=True)
-        while 1:
-            # 找出未停止的
-            uuid_list = list(config.uuid_logs_queue.keys())
-            uuid_list = [uuid for uuid in uuid_list if uuid not in config.stoped_uuid_set]
-            # 全部结束
-            if len(uuid_list) < 1:
-                time.sleep(1)
-                continue
-            while len(uuid_list) > 0:
-                uuid = uuid_list.pop(0)
-                if uuid in config.stoped_uuid_set:
-                    continue
-                try:
-                    q = config.uuid_logs_queue.get(uuid)
-                    if not q:
-                        continue
-                    data = q.get(block=False)
-                    if not data:
-                        continue
-
-                    if data['type'] not in end_status_list + logs_status_list:
-                        continue
-                    with open(PROCESS_INFO + f'/{uuid}.json', 'w', encoding='utf-8') as f:
-                        f.write(json.dumps(data))
-                    if data['type'] in end_status_list:
-                        config.stoped_uuid_set.add(uuid)
-                        del config.uuid_logs_queue[uuid]
-                except Exception:
-                    pass
-            time.sleep(0.1)
-
     multiprocessing.freeze_support()  # Windows 上需要这个来避免子进程的递归执行问题
     print(f'Starting... API URL is   http://{HOST}:{PORT}')
     print(f'Document at https://pyvideotrans.com/api-cn')
     start_thread()
-    threading.Thread(target=_listen_queue).start()
     try:
         print(f'\nAPI URL is   http://{HOST}:{PORT}')
-        serve(app, host=HOST, port=int(PORT))
+        serve(app, host=HOST, port=int(PORT), threads=API_THREADS)
     except Exception as e:
         import traceback
         traceback.print_exc()
+    finally:
+        config.exit_soft = True
+        from videotrans.recognition._whisper_server import shutdown_whisper_server
+        shutdown_whisper_server()
+        from videotrans.translator._cache import close_trans_cache
+        close_trans_cache()
@@ -1,6 +1,6 @@
 import os
 
-from videotrans.util import tools
+from videotrans.util import tools, http_pool
 
 
 class BaseCon:
@@ -15,6 +15,18 @@ class BaseCon:
             kwargs['uuid'] = self.uuid
         tools.set_process(**kwargs)
 
+    # 当前应使用的代理地址，不修改环境变量，无代理返回 None
+    def _get_proxy(self):
+        return tools.set_proxy() or None
+
+    # 本渠道复用的 httpx.Client，代理显式传入
+    def _http_client(self, proxy=None, timeout=None):
+        return http_pool.get_client(self.__class__.__name__, proxy=proxy, timeout=timeout)
+
+    # 本渠道复用的 requests.Session
+    def _http_session(self, proxy=None):
+        return http_pool.get_session(self.__class__.__name__, proxy=proxy)
+
     def _set_proxy(self, type='set'):
         if type == 'del':
             try:
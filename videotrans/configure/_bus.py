@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+界面模式下的任务消息总线，取代原先以 uuid 为键的 Queue 字典 uuid_logs_queue
+
+config.push_queue 发布到这里，界面线程有两种接收方式:
+  get(uuid)/get_any(uuids) 阻塞在条件变量上直到有消息或超时，不再空转轮询
+  subscribe(uuid, callback) 发布时直接回调，可传入 Qt 信号的 emit，消息不再进入邮箱
+每个任务一个有界邮箱，最多 max_pending 条，满时先丢弃最早的进度类消息
+进度类消息合并: set_precent 只保留最新一条，连续的 logs 只保留最后一条，界面本来也只显示最新值
+"""
+import json
+import threading
+import time
+from collections import deque
+
+# 只需显示最新值的消息类型
+COALESCE_TYPES = ('set_precent',)
+# 与上一条未取走的同类消息相邻时合并
+COALESCE_ADJACENT_TYPES = ('logs',)
+
+
+class LogBus:
+
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        # uuid -> deque[dict]
+        self._boxes = {}
+        # uuid -> [callback]
+        self._subs = {}
+        # 已暂停的任务，丢弃其后续消息，直至 remove
+        self._muted = set()
+        # get_any 轮流的起始位置
+        self._turn = 0
+        self._cond = threading.Condition()
+
+    def publish(self, uuid, data):
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                data = {"text": data, "type": "logs", "uuid": uuid}
+        with self._cond:
+            if uuid in self._muted:
+                return
+            callbacks = list(self._subs.get(uuid, ()))
+            if not callbacks:
+                self._put(uuid, data)
+                self._cond.notify_all()
+        # 回调在锁外执行，回调中可以再次发布
+        for callback in callbacks:
+            try:
+                callback(data)
+            except Exception:
+                pass
+
+    def _put(self, uuid, data):
+        box = self._boxes.get(uuid)
+        if box is None:
+            box = self._boxes[uuid] = deque()
+        _type = data.get('type')
+        if _type in COALESCE_TYPES:
+            for i, it in enumerate(box):
+                if it.get('type') == _type:
+                    del box[i]
+                    break
+        elif _type in COALESCE_ADJACENT_TYPES and box and box[-1].get('type') == _type:
+            box.pop()
+        if len(box) >= self.max_pending:
+            for i, it in enumerate(box):
+                if it.get('type') in COALESCE_TYPES + COALESCE_ADJACENT_TYPES:
+                    del box[i]
+                    break
+            else:
+                box.popleft()
+        box.append(data)
+
+    def get(self, uuid, timeout=None):
+        """
+        取出该任务的下一条消息，没有时最多等待 timeout 秒，超时返回 None
+        """
+        return self.get_any([uuid], timeout)[1]
+
+    def get_any(self, uuids, timeout=None):
+        """
+        取出 uuids 中某个有消息的任务的一条消息，返回 (uuid, data)
+        每次从不同位置开始查找，消息多的任务不会让其他任务一直等待
+        都没有时最多等待 timeout 秒，超时返回 (None, None)
+        """
+        uuids = list(uuids)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while 1:
+                self._turn += 1
+                for n in range(len(uuids)):
+                    uuid = uuids[(self._turn + n) % len(uuids)]
+                    box = self._boxes.get(uuid)
+                    if box:
+                        return uuid, box.popleft()
+                remain = None if deadline is None else deadline - time.monotonic()
+                if remain is not None and remain <= 0:
+                    return None, None
+                self._cond.wait(remain)
+
+    def subscribe(self, uuid, callback):
+        """
+        发布时回调 callback(data)，在发布线程中执行，需线程安全，如 Qt 信号的 emit
+        已在邮箱中的消息按顺序先回调
+        """
+        with self._cond:
+            self._subs.setdefault(uuid, []).append(callback)
+            pending = self._boxes.pop(uuid, None) or ()
+        for data in pending:
+            try:
+                callback(data)
+            except Exception:
+                pass
+
+    def unsubscribe(self, uuid, callback):
+        with self._cond:
+            callbacks = self._subs.get(uuid)
+            if callbacks and callback in callbacks:
+                callbacks.remove(callback)
+                if not callbacks:
+                    del self._subs[uuid]
+
+    # 暂停任务，丢弃已有及后续的消息
+    def mute(self, uuid):
+        with self._cond:
+            self._muted.add(uuid)
+            self._boxes.pop(uuid, None)
+            self._cond.notify_all()
+
+    # 任务结束或重新开始，清除邮箱、订阅与暂停标记
+    def remove(self, uuid):
+        with self._cond:
+            self._boxes.pop(uuid, None)
+            self._subs.pop(uuid, None)
+            self._muted.discard(uuid)
+            self._cond.notify_all()
+
+    def __contains__(self, uuid):
+        with self._cond:
+            return uuid in self._boxes
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+流水线各阶段的任务队列
+
+替代原先 config 中的普通 list，生产者 append 后立即唤醒等待中的工作线程，无需轮询
+按优先级出队，数值越大越先执行，相同优先级按入队顺序
+同时记录每个阶段的排队深度和等待时长，供 api 查询排队位置
+为兼容旧代码，保留 append / pop(0) / len / 迭代 / remove 等 list 用法
+"""
+import heapq
+import itertools
+import threading
+import time
+
+
+# 任务 uuid，BaseTask 实例或 dict
+def _uuid(item):
+    if isinstance(item, dict):
+        return item.get('uuid')
+    return getattr(item, 'uuid', None)
+
+
+# 任务优先级，来自 cfg['priority'] 或 dict['priority']，默认 0
+def _priority(item):
+    if isinstance(item, dict):
+        value = item.get('priority', 0)
+    else:
+        cfg = getattr(item, 'cfg', None)
+        value = cfg.get('priority', 0) if isinstance(cfg, dict) else 0
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class StageQueue:
+
+    def __init__(self, name=''):
+        self.name = name
+        # (-priority, seq, enqueue_time, item)
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        # 已出队任务的累计等待秒数及数量
+        self._wait_total = 0.0
+        self._wait_count = 0
+        self._last_wait = 0.0
+
+    def append(self, item, priority=None):
+        if priority is None:
+            priority = _priority(item)
+        with self._cond:
+            heapq.heappush(self._heap, (-priority, next(self._seq), time.time(), item))
+            self._cond.notify()
+
+    put = append
+
+    def _take(self):
+        _, _, enqueue_time, item = heapq.heappop(self._heap)
+        wait = time.time() - enqueue_time
+        self._wait_total += wait
+        self._wait_count += 1
+        self._last_wait = wait
+        return item
+
+    # 阻塞获取，超时返回 None，供工作线程使用
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._heap:
+                self._cond.wait(timeout)
+            if not self._heap:
+                return None
+            return self._take()
+
+    # 兼容 list.pop(0)，队列为空时抛出 IndexError
+    def pop(self, index=0):
+        if index != 0:
+            raise IndexError('StageQueue only supports pop(0)')
+        with self._cond:
+            if not self._heap:
+                raise IndexError('pop from empty StageQueue')
+            return self._take()
+
+    def remove(self, item):
+        with self._cond:
+            for i, entry in enumerate(self._heap):
+                if entry[3] is item:
+                    self._heap.pop(i)
+                    heapq.heapify(self._heap)
+                    return
+        raise ValueError('item not in StageQueue')
+
+    # 删除某个 uuid 的所有排队任务，返回删除数量
+    def discard(self, uuid):
+        with self._cond:
+            before = len(self._heap)
+            self._heap = [entry for entry in self._heap if _uuid(entry[3]) != uuid]
+            heapq.heapify(self._heap)
+            return before - len(self._heap)
+
+    def clear(self):
+        with self._cond:
+            self._heap.clear()
+
+    # 唤醒所有等待线程，退出软件时使用
+    def wake_all(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    # 按出队顺序排列的快照
+    def _ordered(self):
+        with self._cond:
+            return sorted(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return len(self._heap) > 0
+
+    def __iter__(self):
+        return iter([entry[3] for entry in self._ordered()])
+
+    # 某 uuid 在本队列中的排队位置，从1开始，不存在返回 0
+    def position(self, uuid):
+        for i, entry in enumerate(self._ordered()):
+            if _uuid(entry[3]) == uuid:
+                return i + 1
+        return 0
+
+    def stats(self):
+        now = time.time()
+        with self._cond:
+            depth = len(self._heap)
+            oldest = max((now - entry[2] for entry in self._heap), default=0.0)
+            avg_wait = self._wait_total / self._wait_count if self._wait_count else 0.0
+            return {
+                "name": self.name,
+                "depth": depth,
+                "oldest_wait": round(oldest, 3),
+                "avg_wait": round(avg_wait, 3),
+                "last_wait": round(self._last_wait, 3),
+                "done": self._wait_count,
+            }
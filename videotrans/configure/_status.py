@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+api 模式下的任务进度存储
+
+config.push_queue 直接写入此处，不再经由轮询线程写 processinfo/<uuid>.json
+每个任务保存最近 max_events 条消息的环形缓冲及最新状态，/task_status 查询最新状态，
+/task_events 以 SSE 推送，等待新消息时阻塞在条件变量上
+结束的任务保留 retention 秒，超过 stale 秒没有任何消息的未结束任务(如已被放弃)也会删除，
+任务数超过 max_tasks 时先淘汰最早结束的，仍超出时淘汰最久没有消息的
+"""
+import json
+import threading
+import time
+from collections import deque, OrderedDict
+
+# 停止 结束 失败状态
+END_STATUS = ['error', 'succeed', 'end', 'stop']
+# 可作为最新状态的日志类型
+LOGS_STATUS = ['logs']
+
+
+class _Task:
+    __slots__ = ('events', 'seq', 'latest', 'ended_at', 'updated_at', 'cond')
+
+    def __init__(self, max_events, lock):
+        # 各任务共用一把锁，但只唤醒等待本任务的连接
+        self.cond = threading.Condition(lock)
+        self.events = deque(maxlen=max_events)
+        self.seq = 0
+        self.latest = None
+        self.ended_at = 0.0
+        self.updated_at = time.time()
+
+
+class TaskStatusStore:
+
+    def __init__(self, max_events=200, retention=7200, max_tasks=2000, stale=86400):
+        self.max_events = max_events
+        self.retention = retention
+        self.stale = stale
+        self.max_tasks = max_tasks
+        self._tasks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, uuid, data):
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                data = {"text": data, "type": "logs"}
+        with self._lock:
+            task = self._tasks.get(uuid)
+            if task is None:
+                task = self._tasks[uuid] = _Task(self.max_events, self._lock)
+                self._evict()
+            task.seq += 1
+            task.updated_at = time.time()
+            task.events.append((task.seq, data))
+            if data.get('type') in END_STATUS + LOGS_STATUS:
+                task.latest = data
+            if data.get('type') in END_STATUS:
+                task.ended_at = time.time()
+            task.cond.notify_all()
+
+    def _evict(self):
+        now = time.time()
+        for uuid in [k for k, t in self._tasks.items() if
+                     (t.ended_at and now - t.ended_at > self.retention) or now - t.updated_at > self.stale]:
+            self._drop(uuid)
+        if len(self._tasks) <= self.max_tasks:
+            return
+        for uuid in sorted((k for k, t in self._tasks.items() if t.ended_at), key=lambda k: self._tasks[k].ended_at):
+            self._drop(uuid)
+            if len(self._tasks) <= self.max_tasks:
+                return
+        for uuid in sorted(self._tasks, key=lambda k: self._tasks[k].updated_at):
+            self._drop(uuid)
+            if len(self._tasks) <= self.max_tasks:
+                return
+
+    # 删除并唤醒仍在等待该任务的连接，wait_events 随后返回 None
+    def _drop(self, uuid):
+        self._tasks.pop(uuid).cond.notify_all()
+
+    def __contains__(self, uuid):
+        return uuid in self._tasks
+
+    # 最新状态，任务不存在返回 None，存在但尚无状态时返回 {}
+    def latest(self, uuid):
+        with self._lock:
+            task = self._tasks.get(uuid)
+            if task is None:
+                return None
+            return task.latest or {}
+
+    def latest_many(self, uuids):
+        with self._lock:
+            return {uuid: (self._tasks[uuid].latest or {}) if uuid in self._tasks else None for uuid in uuids}
+
+    def wait_events(self, uuid, after=0, timeout=15):
+        """
+        返回 seq 大于 after 的消息 [(seq, data)]，没有时最多等待 timeout 秒
+        任务不存在返回 None
+        """
+        deadline = time.time() + timeout
+        with self._lock:
+            while 1:
+                task = self._tasks.get(uuid)
+                if task is None:
+                    return None
+                if task.seq > after:
+                    return [it for it in task.events if it[0] > after]
+                remain = deadline - time.time()
+                if remain <= 0:
+                    return []
+                task.cond.wait(remain)
+
+    def is_ended(self, uuid):
+        with self._lock:
+            task = self._tasks.get(uuid)
+            return bool(task and task.ended_at)
@@ -8,7 +8,10 @@ import re
 import sys
 import tempfile
 from pathlib import Path
-from queue import Queue
+
+from videotrans.configure._queue import StageQueue
+from videotrans.configure._bus import LogBus
+from videotrans.configure._status import TaskStatusStore
 
 MAINWIN=None
 
@@ -36,6 +39,11 @@ _temp_path.mkdir(parents=True, exist_ok=True)
 TEMP_DIR = _temp_path.as_posix()
 Path(TEMP_DIR+'/dubbing_cache').mkdir(exist_ok=True)
 
+# 跨任务、跨启动复用的缓存目录 cache，与 tmp 不同，退出时不删除
+_cache_path = _root_path / "cache"
+_cache_path.mkdir(parents=True, exist_ok=True)
+CACHE_DIR = _cache_path.as_posix()
+
 # 日志目录 logs
 _logs_path = _root_path / "logs"
 _logs_path.mkdir(parents=True, exist_ok=True)
@@ -144,22 +152,24 @@ if defaulelang=='zh':
     os.environ['HF_ENDPOINT']='https://hf-mirror.com'
 
 ####################################
-# 存储所有任务的进度队列，以uuid为键
-# 根据uuid将日志进度等信息存入队列，如果不存在则创建
-uuid_logs_queue = {}
+# 界面模式下所有任务的进度消息，以uuid区分，界面线程阻塞等待或订阅回调
+log_bus = LogBus()
+
+
+# api 模式下的任务进度，push_queue 直接写入，供 /task_status 及 /task_events 使用
+task_status = TaskStatusStore()
 
 
 def push_queue(uuid, jsondata):
     if uuid in stoped_uuid_set:
         return
-    if uuid not in uuid_logs_queue:
-        uuid_logs_queue[uuid] = Queue()
-    try:
-        # 暂停时会重设为字符串 stop
-        if isinstance(uuid_logs_queue[uuid], Queue):
-            uuid_logs_queue[uuid].put_nowait(jsondata)
-    except Exception:
-        pass
+    if exec_mode == 'api':
+        task_status.publish(uuid, jsondata)
+        if task_status.is_ended(uuid):
+            stoped_uuid_set.add(uuid)
+        return
+    # 暂停的任务在总线中被 mute，消息直接丢弃
+    log_bus.publish(uuid, jsondata)
 
 
 # 存储已停止/暂停的任务
@@ -195,20 +205,24 @@ box_recogn = 'stop'
 task_countdown = 0
 
 #####################################
+# 各阶段任务队列，append 后立即唤醒对应工作线程
 # 预先处理队列
-prepare_queue = []
+prepare_queue = StageQueue('prepare')
 # 识别队列
-regcon_queue = []
+regcon_queue = StageQueue('regcon')
 # 翻译队列
-trans_queue = []
+trans_queue = StageQueue('trans')
 # 配音队列
-dubb_queue = []
+dubb_queue = StageQueue('dubb')
 # 音视频画面对齐
-align_queue = []
+align_queue = StageQueue('align')
 # 音频AI自动对齐队列
-audio_align_queue = []
+audio_align_queue = StageQueue('audio_align')
 # 合成队列
-assemb_queue = []
+assemb_queue = StageQueue('assemb')
+
+STAGE_QUEUES = {q.name: q for q in
+                [prepare_queue, regcon_queue, trans_queue, dubb_queue, audio_align_queue, align_queue, assemb_queue]}
 
 
 # 执行模式 gui 或 api
@@ -272,8 +286,12 @@ def parse_init():
         "cuda_decode":False,
         
         "videoslow_hard":True,
+        "videoslow_onepass":False,
+        "videoslow_chunk":200,
         
         "preset": "fast",
+        "ffmpeg_jobs": 0,
+        "ffmpeg_timeout": 0,
         "ffmpeg_cmd": "",
         "aisendsrt": False,
         "video_codec": 264,
@@ -291,6 +309,9 @@ def parse_init():
         "remove_silence": False,
         "remove_srt_silence": False,
         "remove_white_ms": 0,
+        "process_max": 0,
+        "audio_stretch": "ffmpeg",
+        "clip_cache_mb": 512,
         "force_edit_srt": True,
         "vad": True,
         "threshold":0.5,
@@ -304,15 +325,29 @@ def parse_init():
 
         "rephrase":False,
 
+        "recogn_concurrency": 2,
+        "recogn_rpm": 0,
         "voice_silence": 200,
         "interval_split": 10,
         "bgm_split_time": 300,
+        "separate_workers": 2,
+        "separate_batch_size": 4,
         "trans_thread": 20,
         "aitrans_thread": 50,
+        "trans_concurrency": 1,
+        "trans_rpm": 0,
+        "http_pool_size": 20,
+        "trans_cache_days": 30,
+        "trans_cache_mb": 200,
         "retries": 2,
         "translation_wait": 0,
         "dubbing_wait": 0,
         "dubbing_thread": 5,
+        "tts_cache": True,
+        "tts_cache_mb": 1024,
+        "stage_workers": "trans=1,regcon=1",
+        "api_threads": 16,
+        "api_sse_max": 8,
         "save_segment_audio":False,
         "countdown_sec": 120,
         "backaudio_volume": 0.8,
@@ -350,6 +385,9 @@ def parse_init():
         "initial_prompt_fa": "",
         "whisper_threads": 0,
         "whisper_worker": 1,
+        "whisper_server": False,
+        "whisper_server_idle": 300,
+        "average_batch_size": 8,
         "beam_size": 5,
         "best_of": 5,
         "temperature": 0.0,
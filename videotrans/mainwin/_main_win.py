@@ -241,6 +241,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 f.write('stop')
         except:
             pass
+        from videotrans.recognition._whisper_server import shutdown_whisper_server
+        shutdown_whisper_server()
         sets=QSettings("pyvideotrans", "settings")
         sets.setValue("windowSize", self.size())
         self.hide()
@@ -262,6 +264,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             pass
         time.sleep(3)
         os.chdir(config.ROOT_DIR)
+        # 等待任务线程退出后再关闭，避免仍在翻译的线程使用已关闭的连接
+        from videotrans.translator._cache import close_trans_cache
+        close_trans_cache()
         tools._unlink_tmp()
         event.accept()
 
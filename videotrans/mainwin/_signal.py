@@ -1,5 +1,4 @@
 import json
-import queue
 import shutil
 import time
 from PySide6.QtCore import QThread, Signal
@@ -13,11 +12,8 @@ class UUIDSignalThread(QThread):
         self.parent = parent
 
     def _remove_queue(self):
-        for uuid in config.stoped_uuid_set:
-            try:
-                del config.uuid_logs_queue[uuid]
-            except:
-                pass
+        for uuid in list(config.stoped_uuid_set):
+            config.log_bus.remove(uuid)
 
     def run(self):
         if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
@@ -40,23 +36,7 @@ class UUIDSignalThread(QThread):
                 time.sleep(0.1)
                 self._remove_queue()
                 continue
-            while len(uuid_list) > 0:
-                uuid = uuid_list.pop(0)
-                if config.exit_soft:
-                    return
-                if uuid in config.stoped_uuid_set:
-                    try:
-                        del config.uuid_logs_queue[uuid]
-                    except:
-                        pass
-                    continue
-                try:
-                    q:queue.Queue = config.uuid_logs_queue.get(uuid)
-                    if not q:
-                        continue
-                    data = q.get(block=True,timeout=0.1)
-                    if data:
-                        self.uito.emit(json.dumps(data))
-                except Exception:
-                    pass
-
+            # 阻塞等待任一任务的消息，最多 0.5s 后重新检查任务列表
+            uuid, data = config.log_bus.get_any(uuid_list, timeout=0.5)
+            if data:
+                self.uito.emit(json.dumps(data))
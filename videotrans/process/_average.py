@@ -1,3 +1,4 @@
+import bisect
 import json
 import os
 import sys
@@ -6,6 +7,7 @@ import tempfile
 import time
 from pathlib import Path
 
+import numpy as np
 import torch
 import zhconv
 from faster_whisper import WhisperModel
@@ -109,59 +111,90 @@ def run(raws, err,detect, *, model_name, is_cuda, detect_language, audio_file, q
             return
     write_log({"text": model_name+" Loaded", "type": "logs"})
     prompt = settings.get(f'initial_prompt_{detect_language}') if detect_language!='auto' else None
+    transcribe_kw = dict(
+        beam_size=settings['beam_size'],
+        best_of=settings['best_of'],
+        temperature=0.0 if settings['temperature'] == 0 else [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        vad_filter=False,
+        language=detect_language[:2] if detect_language!='auto' else None,
+        initial_prompt=prompt if prompt else None
+    )
+    # 一次解码为 16k 单声道 float32，各片段直接取视图传给模型，不再导出临时 wav
+    samples = _to_float32(normalized_sound)
+    batched = None
+    batch_size = int(float(settings.get('average_batch_size', 8)))
+    if batch_size > 1:
+        try:
+            from faster_whisper import BatchedInferencePipeline
+            batched = BatchedInferencePipeline(model=model)
+        except ImportError:
+            batched = None
+    step = batch_size if batched else 1
+
+    def add_line(start_time, end_time, text):
+        text = re.sub(r'&#\d+;', '', text.replace('&#39;', "'")).strip()
+
+        if not text or re.match(r"^[^a-zA-Z]*$", text):
+            return
+
+        if detect['langcode'][:2] == 'zh' and settings['zh_hant_s']:
+            text = zhconv.convert(text, 'zh-hans')
+
+        start = ms_to_time_string(ms=start_time)
+        end = ms_to_time_string(ms=end_time)
+        text=cleartext(text)
+        srt_line = {
+            "line": len(raws) + 1,
+            "time": f"{start} --> {end}",
+            "text": text,
+            "start_time":start_time,
+            "end_time":end_time,
+            "startraw":start,
+            "endraw":end
+        }
+        raws.append(srt_line)
+        write_log({"text": f"{srt_line['line']}\n{srt_line['time']}\n{srt_line['text']}\n\n", "type": "subtitle"})
+        write_log({"text": f" {srt_line['line']}/{total_length}", "type": "logs"})
+
     try:
         last_detect=detect_language
-        for i, duration in enumerate(nonsilent_data):
+        for i in range(0, total_length, step):
             if not Path(TEMP_DIR + f'/{os.getpid()}.lock').exists():
                 return
-            start_time, end_time, buffered = duration
-            chunk_filename = tmp_path + f"/c{i}_{start_time // 1000}_{end_time // 1000}.wav"
-            audio_chunk = normalized_sound[start_time:end_time]
-            audio_chunk.export(chunk_filename, format="wav")
-
-            text = ""
-            segments, info = model.transcribe(chunk_filename,
-                                           beam_size=settings['beam_size'],
-                                           best_of=settings['best_of'],
-                                           condition_on_previous_text=settings[
-                                               'condition_on_previous_text'],
-                                           temperature=0.0 if settings['temperature'] == 0 else [0.0, 0.2,
-                                                                                                 0.4,
-                                                                                                 0.6, 0.8,
-                                                                                                 1.0],
-                                           vad_filter=False,
-                                           language=detect_language[:2] if detect_language!='auto' else None,
-                                           initial_prompt=prompt if prompt else None
-                                           )
+            items = [it for it in nonsilent_data[i:i + step] if it[1] > it[0]]
+            if not items:
+                continue
+            texts = None
+            # 批量推理时每个片段不可超过 30s
+            if batched and all(it[1] - it[0] <= 30000 for it in items):
+                # 多个片段一次批量推理，按开始时间把结果归回各片段
+                try:
+                    segments, info = batched.transcribe(samples,
+                                                        clip_timestamps=[{"start": it[0] * 16, "end": it[1] * 16} for it in items],
+                                                        batch_size=len(items),
+                                                        **transcribe_kw)
+                    texts = [""] * len(items)
+                    starts = [it[0] / 1000 for it in items]
+                    for t in segments:
+                        idx = max(0, bisect.bisect_right(starts, t.start + 0.001) - 1)
+                        texts[idx] += t.text + " "
+                except Exception as e:
+                    # faster-whisper 版本不支持或显存不足等，后续改为逐个片段识别，本组重新识别
+                    write_log({"text": f'batched transcribe failed, fallback to single: {e}', "type": "logs"})
+                    batched = None
+                    texts = None
+            if texts is None:
+                texts = []
+                for start_time, end_time, buffered in items:
+                    segments, info = model.transcribe(samples[start_time * 16:end_time * 16],
+                                                      condition_on_previous_text=settings['condition_on_previous_text'],
+                                                      **transcribe_kw)
+                    texts.append("".join(t.text + " " for t in segments))
             if last_detect=='auto':
                 detect['langcode']='zh-cn' if info.language[:2]=='zh' else info.language
                 last_detect=detect['langcode']
-            for t in segments:
-                text += t.text + " "
-
-            text = re.sub(r'&#\d+;', '', text.replace('&#39;', "'")).strip()
-
-            if not text or re.match(r"^[^a-zA-Z]*$", text):
-                continue
-
-            if detect['langcode'][:2] == 'zh' and settings['zh_hant_s']:
-                text = zhconv.convert(text, 'zh-hans')
-
-            start = ms_to_time_string(ms=start_time)
-            end = ms_to_time_string(ms=end_time)
-            text=cleartext(text)
-            srt_line = {
-                "line": len(raws) + 1,
-                "time": f"{start} --> {end}",
-                "text": text,
-                "start_time":start_time,
-                "end_time":end_time,
-                "startraw":start,
-                "endraw":end
-            }
-            raws.append(srt_line)
-            write_log({"text": f"{srt_line['line']}\n{srt_line['time']}\n{srt_line['text']}\n\n", "type": "subtitle"})
-            write_log({"text": f" {srt_line['line']}/{total_length}", "type": "logs"})
+            for it, text in zip(items, texts):
+                add_line(it[0], it[1], text)
     except (LookupError,ValueError,AttributeError,ArithmeticError) as e:
         err['msg']=f'{e}'
         if detect_language=='auto':
@@ -176,6 +209,12 @@ def run(raws, err,detect, *, model_name, is_cuda, detect_language, audio_file, q
             pass
 
 
+# 16k 单声道 float32，-1~1，faster-whisper 可直接接收
+def _to_float32(normalized_sound):
+    audio = normalized_sound.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+    return np.frombuffer(audio.raw_data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
 # split audio by silence
 def _shorten_voice_old(normalized_sound, settings):
     max_interval = int(float(settings.get('interval_split',1))) * 1000
@@ -0,0 +1,100 @@
+"""
+常驻的 faster-whisper 识别进程
+
+模型按 (model_name, device, compute_type) 保存在 LRU 中，连续的识别任务无需每次重新从磁盘加载
+任务通过 job_q 传入，结果以 {"id": 任务id, "type": ...} 的形式逐条写入 result_q
+    logs/subtitle  进度文字
+    segment        一条识别结果，data 为 {"words":[], "text":""}
+    done           识别完成，langcode 为检测出的语言
+    error          出错，text 为错误信息
+cancel_id 为共享整数，等于当前任务 id 时中止该任务
+空闲超过 idle_timeout 秒后释放所有模型并退出进程，下次有任务时再由主进程启动
+"""
+import gc
+import multiprocessing
+import os
+import queue
+from collections import OrderedDict
+
+import torch
+
+from videotrans.process._overall import load_model, transcribe, segment_to_raw, compute_type
+
+
+def _release(model):
+    del model
+    gc.collect()
+    try:
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+def serve(job_q: multiprocessing.Queue, result_q: multiprocessing.Queue, cancel_id, *, ROOT_DIR, idle_timeout=300,
+          max_models=2):
+    os.chdir(ROOT_DIR)
+    models = OrderedDict()
+    try:
+        while 1:
+            try:
+                job = job_q.get(timeout=max(10, idle_timeout))
+            except queue.Empty:
+                return
+            if job is None:
+                return
+            _run_job(job, models, result_q, cancel_id, max_models)
+    finally:
+        while models:
+            _release(models.popitem()[1])
+
+
+def _run_job(job, models, result_q, cancel_id, max_models):
+    job_id = job['id']
+    settings = job['settings']
+    defaulelang = job['defaulelang']
+    model_name = job['model_name']
+    detect_language = job['detect_language']
+
+    def write(data):
+        data['id'] = job_id
+        try:
+            result_q.put_nowait(data)
+        except Exception:
+            pass
+
+    try:
+        key = (model_name, "cuda" if job['is_cuda'] else "cpu", compute_type(model_name, settings))
+        model = models.pop(key, None)
+        if model is None:
+            msg = f'[{model_name}]若不存在将从 hf-mirror.com 下载到 models 目录内' if defaulelang == 'zh' else f'If [{model_name}] not exists, download model from huggingface'
+            write({"text": msg, "type": "logs"})
+            # 先释放超出数量的旧模型，避免显存不足
+            while len(models) >= max_models:
+                _release(models.popitem(last=False)[1])
+            model = load_model(model_name, is_cuda=job['is_cuda'], settings=settings, ROOT_DIR=job['ROOT_DIR'])
+            write({"text": model_name + " Loaded", "type": "logs"})
+        models[key] = model
+
+        segments, info = transcribe(model, audio_file=job['audio_file'], detect_language=detect_language, settings=settings)
+        langcode = detect_language
+        if detect_language == 'auto':
+            langcode = 'zh-cn' if info.language[:2] == 'zh' else info.language
+        nums = 0
+        for segment in segments:
+            if cancel_id.value == job_id:
+                write({"type": "error", "text": "stop"})
+                return
+            nums += 1
+            raw = segment_to_raw(segment)
+            write({"type": "segment", "data": raw})
+            write({"text": f'{raw["text"]}\n', "type": "subtitle"})
+            write({"text": f' {"字幕" if defaulelang == "zh" else "Subtitles"} {nums} ', "type": "logs"})
+        write({"type": "done", "langcode": langcode})
+    except (LookupError, ValueError, AttributeError, ArithmeticError) as e:
+        msg = f'{e}'
+        if detect_language == 'auto':
+            msg += '检测语言失败，请设置发声语言/Failed to detect language, please set the voice language'
+        write({"type": "error", "text": msg})
+    except BaseException as e:
+        write({"type": "error", "text": '_process:' + str(e)})
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+云端识别的并发分发
+
+Gemini、OpenAI 兼容 API、Google 等按语音片段(或片段组)请求的渠道，逐组串行请求时往返耗时占据了大部分识别时间
+这里同时保持 recogn_concurrency 组在请求中，各组在 api_keys 间轮换:
+每个 key 单独一个令牌桶，recogn_rpm 为每个 key 每分钟最多请求数，某 key 遇到 429 时只暂停该 key，其他 key 继续
+单组失败后换 key 重试 retries 次，不可重试的错误立即抛出
+已完成的结果按原顺序交给 on_result，后面的组先完成时暂存，等前面的组完成后再依次输出
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from videotrans.configure import config
+from videotrans.util.rate_limit import get_bucket
+
+# 被停止时 _run_job 的返回值
+_STOPPED = object()
+
+
+class RecognDispatcher:
+
+    def __init__(self, name, api_keys=None, *, concurrency=None, rpm=None, retry=None, stop=None, on_retry=None):
+        """
+        name: 渠道名，同一渠道同一 key 在各任务间共用令牌桶
+        api_keys: key 列表或英文逗号分隔的字符串，无需 key 的渠道传 None
+        stop: 返回 True 时停止发送并放弃未完成的组
+        on_retry(msg): 出错重试时的提示
+        """
+        if isinstance(api_keys, str):
+            api_keys = api_keys.split(',')
+        self.keys = [k.strip() for k in (api_keys or []) if k and k.strip()] or ['']
+        self.concurrency = max(1, int(float(config.settings.get('recogn_concurrency', 2) if concurrency is None else concurrency)))
+        rpm = float(config.settings.get('recogn_rpm', 0) if rpm is None else rpm)
+        self.retry = int(float(config.settings.get('retries', 2) if retry is None else retry))
+        self.stop = stop or (lambda: config.exit_soft)
+        self.on_retry = on_retry
+        self.buckets = [get_bucket(f'recogn:{name}:{hashlib.md5(k.encode("utf-8")).hexdigest()[:8]}',
+                                   rate=rpm / 60, capacity=1) for k in self.keys]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _take_key(self):
+        """
+        从上次位置起轮换，取第一个有令牌的 key，都没有时等待，被停止返回 None
+        """
+        while 1:
+            with self._lock:
+                waits = []
+                for n in range(len(self.keys)):
+                    idx = (self._next + n) % len(self.keys)
+                    sec = self.buckets[idx].try_acquire()
+                    if sec <= 0:
+                        self._next = idx + 1
+                        return idx
+                    waits.append(sec)
+            if self.stop():
+                return None
+            time.sleep(min(min(waits), 0.5))
+
+    def _run_job(self, task, job, retryable, rate_limited):
+        error = None
+        for attempt in range(self.retry + 1):
+            if self.stop():
+                return _STOPPED
+            idx = self._take_key()
+            if idx is None:
+                return _STOPPED
+            try:
+                result = task(job, self.keys[idx])
+            except Exception as e:
+                if rate_limited and rate_limited(e):
+                    # 只暂停该 key，下次换其他 key
+                    sec = self.buckets[idx].backoff()
+                    msg = f'429 请求过快或超出配额，该key暂停{sec}s，换key重试' if config.defaulelang == 'zh' else f'429 rate limited, this key pauses {sec}s, retrying with another key'
+                elif retryable and retryable(e):
+                    msg = f'第{attempt + 1}次出错，重试中:{e}' if config.defaulelang == 'zh' else f'{attempt + 1} retries occurs:{e}'
+                else:
+                    raise
+                error = e
+                config.logger.warning(f'[{self.__class__.__name__}]{msg}')
+                if self.on_retry:
+                    self.on_retry(msg)
+                continue
+            self.buckets[idx].success()
+            return result
+        raise error
+
+    def run(self, jobs, task, on_result, retryable=None, rate_limited=None):
+        """
+        jobs: 各组请求数据
+        task(job, api_key): 发送一组，返回结果
+        on_result(i, job, result): 按 jobs 顺序依次调用，在调用 run 的线程中执行
+        retryable(e)/rate_limited(e): 判断异常是否可重试/是否为频率限制，均为 False 时直接抛出
+        全部完成返回 True，被停止返回 False
+        """
+        jobs = list(jobs)
+        workers = max(1, min(self.concurrency, len(jobs)))
+        if workers == 1:
+            for i, job in enumerate(jobs):
+                result = self._run_job(task, job, retryable, rate_limited)
+                if result is _STOPPED:
+                    return False
+                on_result(i, job, result)
+            return True
+
+        results = {}
+        next_i = 0
+        pool = ThreadPoolExecutor(max_workers=workers)
+        futures = {pool.submit(self._run_job, task, job, retryable, rate_limited): i for i, job in enumerate(jobs)}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for fu in done:
+                    result = fu.result()
+                    if result is _STOPPED:
+                        return False
+                    results[futures[fu]] = result
+                # 按顺序输出已完成的连续部分
+                while next_i in results:
+                    on_result(next_i, jobs[next_i], results.pop(next_i))
+                    next_i += 1
+                if pending and self.stop():
+                    return False
+            return True
+        finally:
+            for fu in pending:
+                fu.cancel()
+            pool.shutdown(wait=False)
@@ -6,7 +6,7 @@ from typing import Union, List, Dict
 from videotrans.configure import config
 from videotrans.recognition._base import BaseRecogn
 from videotrans.util import tools
-import copy,re,httpx
+import copy,re
 from elevenlabs import ElevenLabs
 
 
@@ -21,7 +21,7 @@ class ElevenLabsRecogn(BaseRecogn):
         if self._exit():
             return
 
-        pro = self._set_proxy(type='set')
+        pro = self._get_proxy()
         if pro:
             self.proxies = pro
 
@@ -31,7 +31,7 @@ class ElevenLabsRecogn(BaseRecogn):
 
             client = ElevenLabs(
                     api_key=config.params['elevenlabstts_key'],
-                    httpx_client=httpx.Client(proxy=self.proxies) if self.proxies else None
+                    httpx_client=self._http_client(self.proxies)
             )      
             
             language_code=self.detect_language[:2] if self.detect_language and self.detect_language!='auto' else ''
@@ -1,3 +1,4 @@
+import io
 import json
 import re
 from datetime import timedelta
@@ -6,11 +7,12 @@ from typing import Union, List, Dict
 
 import speech_recognition as sr
 from pydub import AudioSegment
-from pydub.silence import detect_nonsilent
 
 from videotrans.configure import config
 from videotrans.recognition._base import BaseRecogn
+from videotrans.recognition._dispatch import RecognDispatcher
 from videotrans.util import tools
+from videotrans.util.silence import detect_nonsilent
 
 
 class GoogleRecogn(BaseRecogn):
@@ -38,37 +40,29 @@ class GoogleRecogn(BaseRecogn):
                 f.write(json.dumps(nonsilent_data))
 
         total_length = len(nonsilent_data)
-        try:
-            recognizer = sr.Recognizer()
-        except Exception as e:
-            raise
 
-        for i, duration in enumerate(nonsilent_data):
-            if self._exit():
-                return
+        def _task(duration, api_key):
             start_time, end_time, buffered = duration
             if start_time == end_time:
                 end_time += int(config.settings['voice_silence'])
-
-            chunk_filename = tmp_path + f"/c{i}_{start_time // 1000}_{end_time // 1000}.wav"
-            audio_chunk = normalized_sound[start_time:end_time]
-            audio_chunk.export(chunk_filename, format="wav")
-
+            buf = io.BytesIO()
+            normalized_sound[start_time:end_time].export(buf, format="wav")
+            buf.seek(0)
+            # Recognizer 保存了能量阈值等状态，每个请求单独创建
+            recognizer = sr.Recognizer()
+            with sr.AudioFile(buf) as source:
+                audio_data = recognizer.record(source)
             try:
-                with sr.AudioFile(chunk_filename) as source:
-                    audio_data = recognizer.record(source)
-                    try:
-                        text = recognizer.recognize_google(audio_data, language=self.detect_language)
-                    except sr.UnknownValueError:
-                        text = ""
-                    except sr.RequestError as e:
-                        raise
-            except Exception as e:
-                raise
+                text = recognizer.recognize_google(audio_data, language=self.detect_language)
+            except sr.UnknownValueError:
+                text = ""
+            return start_time, end_time, text
 
+        def _on_result(i, duration, result):
+            start_time, end_time, text = result
             text = re.sub(r'&#\d+;', '', f"{text.capitalize()}. ".replace('&#39;', "'")).strip()
             if not text or re.match(r'^[，。、？‘’“”；：（｛｝【】）:;"\'\s \d`!@#$%^&*()_+=.,?/\\-]*$', text):
-                continue
+                return
             start = tools.ms_to_time_string(ms=start_time)
 
             end = tools.ms_to_time_string(ms=end_time)
@@ -86,6 +80,12 @@ class GoogleRecogn(BaseRecogn):
                 self.inst.precent += 0.1
             self._signal(text=f"{config.transobj['yuyinshibiejindu']} {srt_line['line']}/{total_length}")
             self._signal(text=f"{srt_line['text']}\n", type='subtitle')
+
+        # 多个片段同时请求，结果按时间顺序输出
+        dispatcher = RecognDispatcher('google', None, stop=self._exit, on_retry=lambda msg: self._signal(text=msg))
+        if not dispatcher.run(nonsilent_data, _task, _on_result,
+                              retryable=lambda e: isinstance(e, sr.RequestError)):
+            return
         return self.raws
 
     # split audio by silence
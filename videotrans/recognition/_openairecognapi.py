@@ -4,18 +4,17 @@ import time
 from pathlib import Path
 from typing import Union, List, Dict
 
-import httpx
 import requests
 import json
 
-from pydub import AudioSegment
-
 from videotrans.configure import config
 
 
 from videotrans.recognition._base import BaseRecogn
+from videotrans.recognition._dispatch import RecognDispatcher
+from videotrans.recognition._vad import get_vad_index
 from videotrans.util import tools
-from openai import OpenAI, APIConnectionError
+from openai import OpenAI, APIConnectionError, InternalServerError, RateLimitError
 
 class OpenaiAPIRecogn(BaseRecogn):
 
@@ -29,7 +28,7 @@ class OpenaiAPIRecogn(BaseRecogn):
             return
 
         if not re.search(r'localhost', self.api_url) and not re.match(r'https?://(\d+\.){3}\d+', self.api_url):
-            pro = self._set_proxy(type='set')
+            pro = self._get_proxy()
             if pro:
                 self.proxies = pro
         else:
@@ -68,7 +67,7 @@ class OpenaiAPIRecogn(BaseRecogn):
                 raise Exception(f'No file {self.audio_file}')
             # 发送请求
             raws=[]
-            client=OpenAI(api_key=config.params['openairecognapi_key'], base_url=self.api_url,  http_client=httpx.Client(proxy=self.proxies))
+            client=OpenAI(api_key=config.params['openairecognapi_key'], base_url=self.api_url,  http_client=self._http_client(self.proxies))
             with open(self.audio_file, 'rb') as file:
                 transcript = client.audio.transcriptions.create(
                     file=(self.audio_file, file.read()),
@@ -100,19 +99,29 @@ class OpenaiAPIRecogn(BaseRecogn):
         try:
             # 发送请求
             raws=self.cut_audio()
-            client=OpenAI(api_key=config.params['openairecognapi_key'], base_url=self.api_url,  http_client=httpx.Client(proxy=self.proxies,timeout=7200))
-            for i,it in enumerate(raws):
-                with open(it['file'], 'rb') as file:
-                    transcript = client.audio.transcriptions.create(
-                        file=(it['file'], file.read()),
-                        model=config.params["openairecognapi_model"],
-                        prompt=config.params['openairecognapi_prompt'],
-                        timeout=7200,
-                        response_format="json"
-                    )
-                    if not hasattr(transcript, 'text'):
-                        continue
-                    raws[i]['text']=transcript.text
+            client=OpenAI(api_key=config.params['openairecognapi_key'], base_url=self.api_url,  http_client=self._http_client(self.proxies, timeout=7200))
+
+            def _task(it, api_key):
+                transcript = client.audio.transcriptions.create(
+                    file=(f"{it['start_time']}_{it['end_time']}.wav", self._vad.wav_bytes(it['start_time'], it['end_time'])),
+                    model=config.params["openairecognapi_model"],
+                    prompt=config.params['openairecognapi_prompt'],
+                    timeout=7200,
+                    response_format="json"
+                )
+                return transcript.text if hasattr(transcript, 'text') else None
+
+            def _on_result(i, it, text):
+                if text is not None:
+                    raws[i]['text']=text
+
+            # 多个片段同时请求，结果按时间顺序写回
+            dispatcher=RecognDispatcher('openairecognapi', [config.params['openairecognapi_key']], stop=self._exit,
+                                        on_retry=lambda msg: self._signal(text=msg))
+            if not dispatcher.run(raws, _task, _on_result,
+                                  retryable=lambda e: isinstance(e, (APIConnectionError, InternalServerError)),
+                                  rate_limited=lambda e: isinstance(e, RateLimitError)):
+                return
             return raws
         except APIConnectionError as e:
             api_url_msg = f' 当前Api: {self.api_url}' if self.api_url else ''
@@ -122,56 +131,15 @@ class OpenaiAPIRecogn(BaseRecogn):
             raise Exception(msg)
         except Exception:
             raise
+    # 语音片段起止时间，VAD 结果由共享索引提供，同一音频不再重复解码和运行 VAD
     def cut_audio(self):
-
-        sampling_rate=16000
-        from faster_whisper.audio import decode_audio
-        from faster_whisper.vad import (
-            VadOptions,
-            get_speech_timestamps
-        )
-
-        def convert_to_milliseconds(timestamps):
-            milliseconds_timestamps = []
-            for timestamp in timestamps:
-                milliseconds_timestamps.append(
-                    {
-                        "start": int(round(timestamp["start"] / sampling_rate * 1000)),
-                        "end": int(round(timestamp["end"] / sampling_rate * 1000)),
-                    }
-                )
-
-            return milliseconds_timestamps
-        vad_p={
-            "threshold":float(config.settings['threshold']),
-            "min_speech_duration_ms":int(config.settings['min_speech_duration_ms']),
-            "max_speech_duration_s":float(config.settings['max_speech_duration_s']) if float(config.settings['max_speech_duration_s'])>0 else float('inf'),
-            "min_silence_duration_ms":int(config.settings['min_silence_duration_ms']),
-            "speech_pad_ms":int(config.settings['speech_pad_ms'])
-        }
-        speech_chunks=get_speech_timestamps(decode_audio(self.audio_file, sampling_rate=sampling_rate),vad_options=VadOptions(**vad_p))
-        speech_chunks=convert_to_milliseconds(speech_chunks)
-
-        # 在config.TEMP_DIR下创建一个以当前时间戳为名的文件夹，用于保存切割后的音频片段
-        dir_name = f"{config.TEMP_DIR}/{time.time()}"
-        Path(dir_name).mkdir(parents=True, exist_ok=True)
-        print(f"Saving segments to {dir_name}")
-        data=[]
-        audio = AudioSegment.from_file(self.audio_file,format=self.audio_file[-3:])
-        for it in speech_chunks:
-            start_ms, end_ms=it['start'],it['end']
-            chunk = audio[start_ms:end_ms]
-            file_name=f"{dir_name}/{start_ms}_{end_ms}.wav"
-            chunk.export(file_name, format="wav")
-            data.append({
-                "start_time":start_ms,
-                "end_time":end_ms,
-                "file":file_name,
-                "text":"",
-                "time":tools.ms_to_time_string(ms=start_ms)+' --> '+tools.ms_to_time_string(ms=end_ms)
-            })
-
-        return data
+        self._vad = get_vad_index(self.audio_file)
+        return [{
+            "start_time": start_ms,
+            "end_time": end_ms,
+            "text": "",
+            "time": tools.ms_to_time_string(ms=start_ms) + ' --> ' + tools.ms_to_time_string(ms=end_ms)
+        } for start_ms, end_ms in self._vad.chunks()]
 
     def _get_url(self, url=""):
         baseurl = "https://api.openai.com/v1"
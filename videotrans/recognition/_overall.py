@@ -59,7 +59,61 @@ class FasterAll(BaseRecogn):
             tmp['time']=f"{tmp['startraw']} --> {tmp['endraw']}"
             self.raws.append(tmp)
 
+    # 整理识别结果，需要时重新断句
+    def _collect(self, raws, langcode):
+        if self.detect_language=='auto' and self.inst and  hasattr(self.inst,'set_source_language'):
+            config.logger.info(f'需要自动检测语言，当前检测出的语言为{langcode=}')
+            self.detect_language=langcode
+
+        if not config.settings['rephrase']:
+            self.get_srtlist(raws)
+        else:
+            try:
+                words_list=[]
+                for it in list(raws):
+                    words_list+=it['words']
+                self._signal(text="正在重新断句..." if config.defaulelang=='zh' else "Re-segmenting...")
+                self.raws=self.re_segment_sentences(words_list,self.detect_language[:2])
+            except Exception as e:
+                self.get_srtlist(raws)
+
+    # 使用常驻识别进程，模型保持加载状态
+    def _exec_server(self):
+        from videotrans.recognition._whisper_server import get_whisper_server
+        job = {
+            "model_name": self.model_name,
+            "is_cuda": self.is_cuda,
+            "detect_language": self.detect_language,
+            "audio_file": self.audio_file,
+            "settings": dict(config.settings),
+            "defaulelang": config.defaulelang,
+            "ROOT_DIR": config.ROOT_DIR,
+        }
+        raws = []
+        langcode = self.detect_language
+        for data in get_whisper_server().transcribe(job, stop=self._exit):
+            if data['type'] == 'segment':
+                raws.append(data['data'])
+            elif data['type'] == 'done':
+                langcode = data['langcode']
+            elif data['type'] == 'error':
+                raise Exception(data['text'])
+            else:
+                if self.inst and self.inst.precent < 50:
+                    self.inst.precent += 0.1
+                self._signal(text=data['text'], type=data['type'])
+        if self._exit():
+            return
+        if len(raws) < 1:
+            raise Exception("没有识别到任何说话声" if config.defaulelang=='zh' else "No speech detected")
+        self._collect(raws, langcode)
+        if len(self.raws)<1:
+            raise Exception('未识别到有效文字' if config.defaulelang=='zh' else 'No speech detected')
+        return self.raws
+
     def _exec(self):
+        if config.settings.get('whisper_server'):
+            return self._exec_server()
         # 修复CUDA fork问题：强制使用spawn方法
         try:
             multiprocessing.set_start_method('spawn', force=True)
@@ -117,21 +171,7 @@ class FasterAll(BaseRecogn):
                     self.error = "没有识别到任何说话声" if config.defaulelang=='zh' else "No speech detected"
                 else:
                     self.error=''
-                    if self.detect_language=='auto' and self.inst and  hasattr(self.inst,'set_source_language'):
-                        config.logger.info(f'需要自动检测语言，当前检测出的语言为{detect["langcode"]=}')
-                        self.detect_language=detect['langcode']
-
-                    if not config.settings['rephrase']:
-                        self.get_srtlist(raws)
-                    else:
-                        try:
-                            words_list=[]
-                            for it in list(raws):
-                                words_list+=it['words']
-                            self._signal(text="正在重新断句..." if config.defaulelang=='zh' else "Re-segmenting...")
-                            self.raws=self.re_segment_sentences(words_list,self.detect_language[:2])
-                        except Exception as e:
-                            self.get_srtlist(raws)
+                    self._collect(raws, detect['langcode'])
                 try:
                     if process.is_alive():
                         process.terminate()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+共享的 VAD 分段索引
+
+Gemini、OpenAI 兼容 API 等按语音片段分别识别的渠道，都需要 解码 -> Silero VAD -> 切出每段音频
+这里以 (音频内容 md5, VAD 参数) 为键，将语音片段起止毫秒保存在 cache/vad_index/<key>.json，
+该目录退出时不删除，更换识别渠道、重新识别同一音频或重启软件后，直接读取索引，不再解码和运行 VAD
+片段音频按需提供: pcm() 为 16k float32 数组，wav_bytes() 为内存中的 wav，chunk_file() 首次访问时才写出文件
+片段均从 16k 单声道 16bit wav 中按偏移读取，原文件不是该格式时，运行 VAD 时顺带写出一份到 tmp/vad_index，
+不在内存中保留整段解码后的音频
+"""
+import hashlib
+import io
+import json
+import threading
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from videotrans.configure import config
+
+SAMPLING_RATE = 16000
+
+
+def vad_params(settings=None):
+    settings = settings or config.settings
+    return {
+        "threshold": float(settings['threshold']),
+        "min_speech_duration_ms": int(settings['min_speech_duration_ms']),
+        "max_speech_duration_s": float(settings['max_speech_duration_s']) if float(
+            settings['max_speech_duration_s']) > 0 else float('inf'),
+        "min_silence_duration_ms": int(settings['min_silence_duration_ms']),
+        "speech_pad_ms": int(settings['speech_pad_ms'])
+    }
+
+
+def _file_md5(filename):
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+# 是否可直接按偏移读取的 16k 单声道 16bit wav
+def _is_pcm16_wav(filename):
+    if not str(filename).lower().endswith('.wav'):
+        return False
+    try:
+        with wave.open(str(filename), 'rb') as f:
+            return f.getframerate() == SAMPLING_RATE and f.getnchannels() == 1 and f.getsampwidth() == 2
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+def _write_pcm16_wav(filename, audio):
+    data = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(filename, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLING_RATE)
+        f.writeframes(data.tobytes())
+
+
+class VadIndex:
+
+    def __init__(self, audio_file, params=None):
+        self.audio_file = Path(audio_file).as_posix()
+        self.params = params or vad_params()
+        raw = json.dumps([_file_md5(self.audio_file), {k: str(v) for k, v in self.params.items()}], sort_keys=True)
+        self.key = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        # 索引跨启动保留，片段音频只在本次运行中使用
+        self.root = Path(config.CACHE_DIR) / 'vad_index'
+        self.index_file = self.root / f'{self.key}.json'
+        self.tmp_root = Path(config.TEMP_DIR) / 'vad_index'
+        self._chunks = None
+        # 可按偏移读取的 wav
+        self._wav = self.audio_file if _is_pcm16_wav(self.audio_file) else None
+        self._lock = threading.Lock()
+
+    # 整体解码为 16k 单声道 float32，原文件不可按偏移读取时顺带写出一份 wav
+    def _decode(self):
+        from faster_whisper.audio import decode_audio
+        audio = decode_audio(self.audio_file, sampling_rate=SAMPLING_RATE)
+        if self._wav is None:
+            self.tmp_root.mkdir(parents=True, exist_ok=True)
+            wav = self.tmp_root / f'{self.key}.wav'
+            tmp = wav.with_suffix('.tmp')
+            _write_pcm16_wav(tmp.as_posix(), audio)
+            tmp.replace(wav)
+            self._wav = wav.as_posix()
+        return audio
+
+    def chunks(self):
+        """
+        语音片段 [(start_ms, end_ms), ...]，优先读取索引文件
+        """
+        with self._lock:
+            if self._chunks is not None:
+                return self._chunks
+            try:
+                self._chunks = [tuple(it) for it in json.loads(self.index_file.read_text(encoding='utf-8'))['chunks']]
+                return self._chunks
+            except (OSError, ValueError, KeyError):
+                pass
+            from faster_whisper.vad import VadOptions, get_speech_timestamps
+            speech = get_speech_timestamps(self._decode(), vad_options=VadOptions(**self.params))
+            self._chunks = [(int(round(it["start"] / SAMPLING_RATE * 1000)), int(round(it["end"] / SAMPLING_RATE * 1000)))
+                            for it in speech]
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_file.with_suffix('.tmp')
+            tmp.write_text(json.dumps({"sr": SAMPLING_RATE, "chunks": self._chunks}), encoding='utf-8')
+            tmp.replace(self.index_file)
+            return self._chunks
+
+    def pcm(self, start_ms, end_ms):
+        """
+        [start_ms, end_ms) 的 16k 单声道 float32 数组
+        """
+        with self._lock:
+            if self._wav is None or not Path(self._wav).is_file():
+                # 索引来自上次运行，本次尚未写出 wav
+                self._wav = None
+                self._decode()
+            wav_file = self._wav
+        with wave.open(wav_file, 'rb') as f:
+            start = int(start_ms * SAMPLING_RATE / 1000)
+            f.setpos(min(start, f.getnframes()))
+            frames = f.readframes(max(0, int(end_ms * SAMPLING_RATE / 1000) - start))
+        return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def wav_bytes(self, start_ms, end_ms):
+        buf = io.BytesIO()
+        _write_pcm16_wav(buf, self.pcm(start_ms, end_ms))
+        return buf.getvalue()
+
+    def chunk_file(self, start_ms, end_ms):
+        """
+        需要文件路径的渠道使用，首次访问时写出，之后直接复用
+        """
+        file_name = self.tmp_root / self.key / f'{start_ms}_{end_ms}.wav'
+        if not file_name.is_file():
+            file_name.parent.mkdir(parents=True, exist_ok=True)
+            tmp = file_name.with_suffix('.tmp')
+            tmp.write_bytes(self.wav_bytes(start_ms, end_ms))
+            tmp.replace(file_name)
+        return file_name.as_posix()
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vad_index(audio_file, params=None):
+    """
+    同一文件同一参数在本进程内共用一个实例
+    """
+    params = params or vad_params()
+    p = Path(audio_file)
+    st = p.stat()
+    key = (p.as_posix(), st.st_size, st.st_mtime_ns, json.dumps({k: str(v) for k, v in params.items()}, sort_keys=True))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = VadIndex(audio_file, params)
+            # 只保留最近的几个
+            while len(_indexes) > 4:
+                _indexes.pop(next(iter(_indexes)))
+        return index
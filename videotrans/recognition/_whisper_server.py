@@ -0,0 +1,138 @@
+"""
+主进程一侧的常驻识别进程管理
+
+首次使用时以 spawn 方式启动 videotrans.process._whisper_server.serve，之后的任务复用该进程及已加载模型
+进程空闲超时退出后，下次提交任务时自动重新启动
+软件退出、API 服务结束及相关设置被修改时调用 shutdown_whisper_server 关闭进程并释放模型
+"""
+import itertools
+import multiprocessing
+import queue
+import threading
+
+from videotrans.configure import config
+
+
+class WhisperServer:
+
+    def __init__(self):
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._process = None
+        self._job_q = None
+        self._result_q = None
+        self._cancel_id = None
+        # 任务id -> 本地结果队列
+        self._jobs = {}
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def _ensure(self):
+        if self.is_alive():
+            return
+        from videotrans.process._whisper_server import serve
+        self._job_q = self._ctx.Queue()
+        self._result_q = self._ctx.Queue()
+        self._cancel_id = self._ctx.Value('q', 0)
+        self._process = self._ctx.Process(target=serve, args=(self._job_q, self._result_q, self._cancel_id), kwargs={
+            "ROOT_DIR": config.ROOT_DIR,
+            "idle_timeout": int(float(config.settings.get('whisper_server_idle', 300)))
+        }, daemon=True)
+        self._process.start()
+        config.logger.info(f'常驻识别进程已启动 pid:{self._process.pid}')
+        threading.Thread(target=self._dispatch, args=(self._process, self._result_q), daemon=True).start()
+
+    # 将结果分发到各任务的本地队列，进程退出后结束
+    def _dispatch(self, process, result_q):
+        while 1:
+            try:
+                data = result_q.get(timeout=1)
+            except queue.Empty:
+                if not process.is_alive():
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            q = self._jobs.get(data.get('id'))
+            if q is not None:
+                q.put(data)
+
+    def _submit(self, job):
+        with self._lock:
+            self._ensure()
+            job_id = next(self._ids)
+            self._jobs[job_id] = queue.Queue()
+            self._job_q.put(dict(job, id=job_id))
+            return job_id, self._process
+
+    def transcribe(self, job, stop=None):
+        """
+        提交识别任务，逐条返回识别进程发回的消息，直到 done 或 error
+        进程在任务完成前退出时(如恰好空闲超时)重新提交一次
+        """
+        retry = 1
+        job_id, process = self._submit(job)
+        try:
+            while 1:
+                if stop and stop():
+                    self._cancel_id.value = job_id
+                    return
+                try:
+                    data = self._jobs[job_id].get(timeout=0.5)
+                except queue.Empty:
+                    if process.is_alive():
+                        continue
+                    if retry < 1:
+                        yield {"type": "error", "text": "whisper server exited"}
+                        return
+                    retry -= 1
+                    self._jobs.pop(job_id, None)
+                    job_id, process = self._submit(job)
+                    continue
+                yield data
+                if data['type'] in ['done', 'error']:
+                    return
+        finally:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self):
+        with self._lock:
+            if not self.is_alive():
+                return
+            try:
+                self._job_q.put(None)
+                self._process.join(timeout=5)
+            except Exception:
+                pass
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+
+
+_server = None
+_server_lock = threading.Lock()
+
+# 进程启动或加载模型时读取的设置，修改后需重启进程才能生效
+RESTART_SETTINGS = ('whisper_server', 'whisper_server_idle', 'cuda_com_type', 'whisper_threads', 'whisper_worker')
+
+
+def get_whisper_server():
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = WhisperServer()
+        return _server
+
+
+# 关闭已启动的常驻识别进程，未启动时不做任何事，下次使用时按当前设置重新启动
+def shutdown_whisper_server():
+    with _server_lock:
+        server = _server
+    if server is None:
+        return
+    try:
+        server.shutdown()
+    except Exception as e:
+        config.logger.exception(f'关闭常驻识别进程失败:{e}', exc_info=True)
@@ -67,9 +67,11 @@ def wave_to_spectrogram_mt(
         wave_left = np.asfortranarray(wave[0])
         wave_right = np.asfortranarray(wave[1])
 
+    # 结果放在局部变量中，多个分段同时计算时不会互相覆盖
+    result = {}
+
     def run_thread(**kwargs):
-        global spec_left
-        spec_left = librosa.stft(**kwargs)
+        result['left'] = librosa.stft(**kwargs)
 
     thread = threading.Thread(
         target=run_thread,
@@ -79,7 +81,7 @@ def wave_to_spectrogram_mt(
     spec_right = librosa.stft(wave_right, n_fft=n_fft, hop_length=hop_length)
     thread.join()
 
-    spec = np.asfortranarray([spec_left, spec_right])
+    spec = np.asfortranarray([result['left'], spec_right])
 
     return spec
 
@@ -316,9 +318,10 @@ def spectrogram_to_wave_mt(spec, hop_length, mid_side, reverse, mid_side_b2):
     spec_left = np.asfortranarray(spec[0])
     spec_right = np.asfortranarray(spec[1])
 
+    result = {}
+
     def run_thread(**kwargs):
-        global wave_left
-        wave_left = librosa.istft(**kwargs)
+        result['left'] = librosa.istft(**kwargs)
 
     thread = threading.Thread(
         target=run_thread, kwargs={"stft_matrix": spec_left, "hop_length": hop_length}
@@ -326,6 +329,7 @@ def spectrogram_to_wave_mt(spec, hop_length, mid_side, reverse, mid_side_b2):
     thread.start()
     wave_right = librosa.istft(spec_right, hop_length=hop_length)
     thread.join()
+    wave_left = result['left']
 
     if reverse:
         return np.asfortranarray([np.flip(wave_left), np.flip(wave_right)])
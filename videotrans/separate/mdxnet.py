@@ -1,4 +1,5 @@
 import os
+import threading
 
 import librosa
 import numpy as np
@@ -11,6 +12,13 @@ from videotrans.util.tools import runffmpeg
 cpu = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 
+def _slice(mix, start, n, samples):
+    lo, hi = max(start, 0), min(start + n, samples)
+    if hi <= lo:
+        return np.zeros((2, n), dtype=np.float32)
+    return np.pad(mix[:, lo:hi], ((0, 0), (lo - start, n - (hi - start))))
+
+
 class ConvTDFNetTrim:
     def __init__(
             self, device, model_name, target_name, L, dim_f, dim_t, n_fft, hop=1024
@@ -86,135 +94,150 @@ def get_models(device, dim_f, dim_t, n_fft):
     )
 
 
+# 已创建的 InferenceSession，以 (模型文件, 线程数) 为键，同一模型多次分离时不再重复加载
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(onnx_file, threads=0):
+    import onnxruntime as ort
+    key = (onnx_file, threads)
+    with _sessions_lock:
+        if key in _sessions:
+            return _sessions[key]
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # 0 为 onnxruntime 默认，即使用全部物理核
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        providers = [it for it in ["CUDAExecutionProvider", "DmlExecutionProvider", "CPUExecutionProvider"] if
+                     it in ort.get_available_providers()]
+        _sessions[key] = ort.InferenceSession(onnx_file, sess_options=opts, providers=providers)
+        return _sessions[key]
+
+
 class Predictor:
-    def __init__(self, args):
-        import onnxruntime as ort
+    """
+    以 batch_size 个帧为一批送入 onnx，相邻帧重叠一半，输出乘以 hann 窗后叠加(两帧权重之和恒为1)，
+    不再按 chunks 分段再裁掉 margin
+    输入通过 read(start, n) 按需读取，结果按顺序逐块产出，内存占用与音频长度无关
+    """
 
-        # logger.info(ort.get_available_providers())
+    def __init__(self, args):
         self.args = args
         self.model_ = get_models(
             device=cpu, dim_f=args.dim_f, dim_t=args.dim_t, n_fft=args.n_fft
         )
-        self.model = ort.InferenceSession(
+        self.batch_size = max(1, int(getattr(args, "batch_size", 4)))
+        self.model = get_session(
             os.path.join(args.onnx, self.model_.target_name + ".onnx"),
-            providers=[
-                "CUDAExecutionProvider",
-                "DmlExecutionProvider",
-                "CPUExecutionProvider",
-            ],
+            int(getattr(args, "threads", 0))
         )
-        # logger.info("ONNX load done")
-
-    def demix(self, mix):
-        samples = mix.shape[-1]
-        margin = self.args.margin
-        chunk_size = self.args.chunks * 44100
-        assert not margin == 0, "margin cannot be zero!"
-        if margin > chunk_size:
-            margin = chunk_size
-
-        segmented_mix = {}
-
-        if self.args.chunks == 0 or samples < chunk_size:
-            chunk_size = samples
-
-        counter = -1
-        for skip in range(0, samples, chunk_size):
-            counter += 1
+        model = self.model_
+        self.trim = model.n_fft // 2
+        # 每帧有效输出长度及帧移
+        self.hop = (model.chunk_size - 2 * self.trim) // 2
+        self.seg = self.hop * 2
+        self.weight = np.hanning(self.seg + 1)[:-1].astype(np.float32)
 
-            s_margin = 0 if counter == 0 else margin
-            end = min(skip + chunk_size + margin, samples)
-
-            start = skip - s_margin
+    def _run_batch(self, waves):
+        """
+        waves:(k,2,chunk_size) -> (k,2,seg)
+        """
+        model = self.model_
+        with torch.no_grad():
+            spek = model.stft(torch.from_numpy(waves).to(cpu)).cpu().numpy()
+            if self.args.denoise:
+                # 正反相位合并为一次推理
+                k = spek.shape[0]
+                out = self.model.run(None, {"input": np.concatenate([-spek, spek])})[0]
+                spec_pred = -out[:k] * 0.5 + out[k:] * 0.5
+            else:
+                spec_pred = self.model.run(None, {"input": spek})[0]
+            tar_waves = model.istft(torch.from_numpy(spec_pred).to(cpu)).cpu().numpy()
+        return tar_waves[:, :, self.trim: self.trim + self.seg]
 
-            segmented_mix[skip] = mix[:, start:end].copy()
-            if end == samples:
-                break
+    def demix_iter(self, read, samples):
+        """
+        read(start, n) 返回 (2,n) float32，超出 [0,samples) 的部分为0
+        依次产出 (start, (2,m)) 分离结果
+        """
+        chunk_size = self.model_.chunk_size
+        hop = self.hop
+        # 从 -hop 开始，保证每个采样点都被两帧覆盖
+        starts = list(range(-hop, samples, hop))
+        tail = np.zeros((2, hop), dtype=np.float32)
+        for b in range(0, len(starts), self.batch_size):
+            batch = starts[b: b + self.batch_size]
+            waves = np.stack([read(p - self.trim, chunk_size) for p in batch]).astype(np.float32)
+            for p, y in zip(batch, self._run_batch(waves)):
+                y = y * self.weight
+                done = tail + y[:, :hop]
+                tail = y[:, hop:]
+                lo, hi = max(p, 0), min(p + hop, samples)
+                if hi > lo:
+                    yield lo, done[:, lo - p: hi - p]
 
-        sources = self.demix_base(segmented_mix, margin_size=margin)
+    def demix(self, mix):
         """
         mix:(2,big_sample)
-        segmented_mix:offset->(2,small_sample)
         sources:(1,2,big_sample)
         """
-        return sources
-
-    def demix_base(self, mixes, margin_size):
-        chunked_sources = []
-        # progress_bar = tqdm(total=len(mixes))
-        # progress_bar.set_description("Processing")
-        for mix in mixes:
-            cmix = mixes[mix]
-            sources = []
-            n_sample = cmix.shape[1]
-            model = self.model_
-            trim = model.n_fft // 2
-            gen_size = model.chunk_size - 2 * trim
-            pad = gen_size - n_sample % gen_size
-            mix_p = np.concatenate(
-                (np.zeros((2, trim)), cmix, np.zeros((2, pad)), np.zeros((2, trim))), 1
-            )
-            mix_waves = []
-            i = 0
-            while i < n_sample + pad:
-                waves = np.array(mix_p[:, i: i + model.chunk_size])
-                mix_waves.append(waves)
-                i += gen_size
-            mix_waves = torch.tensor(mix_waves, dtype=torch.float32).to(cpu)
-            with torch.no_grad():
-                _ort = self.model
-                spek = model.stft(mix_waves)
-                if self.args.denoise:
-                    spec_pred = (
-                            -_ort.run(None, {"input": -spek.cpu().numpy()})[0] * 0.5
-                            + _ort.run(None, {"input": spek.cpu().numpy()})[0] * 0.5
-                    )
-                    tar_waves = model.istft(torch.tensor(spec_pred))
-                else:
-                    tar_waves = model.istft(
-                        torch.tensor(_ort.run(None, {"input": spek.cpu().numpy()})[0])
-                    )
-                tar_signal = (
-                    tar_waves[:, :, trim:-trim]
-                        .transpose(0, 1)
-                        .reshape(2, -1)
-                        .numpy()[:, :-pad]
-                )
-
-                start = 0 if mix == 0 else margin_size
-                end = None if mix == list(mixes.keys())[::-1][0] else -margin_size
-                if margin_size == 0:
-                    end = None
-                sources.append(tar_signal[:, start:end])
-
-                # progress_bar.update(1)
-
-            chunked_sources.append(sources)
-        _sources = np.concatenate(chunked_sources, axis=-1)
-        # del self.model
-        # progress_bar.close()
-        return _sources
+        samples = mix.shape[-1]
+
+        def read(start, n):
+            return _slice(mix, start, n, samples)
+
+        sources = [block for _, block in self.demix_iter(read, samples)]
+        return np.concatenate(sources, axis=-1)[None]
 
     def prediction(self, m, vocal_root, others_root, format):
         os.makedirs(vocal_root, exist_ok=True)
         os.makedirs(others_root, exist_ok=True)
         basename = os.path.basename(m)
-        mix, rate = librosa.load(m, mono=False, sr=44100)
-        if mix.ndim == 1:
-            mix = np.asfortranarray([mix, mix])
-        mix = mix.T
-        sources = self.demix(mix.T)
-        opt = sources[0].T
-        if format in ["wav", "flac"]:
-            sf.write(
-                "%s/%s_main_vocal.%s" % (vocal_root, basename, format), mix - opt, rate
-            )
-            sf.write("%s/%s_others.%s" % (others_root, basename, format), opt, rate)
+        rate = 44100
+        path_vocal = "%s/%s_main_vocal.wav" % (vocal_root, basename)
+        path_other = "%s/%s_others.wav" % (others_root, basename)
+        if format == "flac":
+            path_vocal, path_other = path_vocal[:-4] + ".flac", path_other[:-4] + ".flac"
+
+        info = sf.info(m) if m.lower().endswith(('.wav', '.flac')) else None
+        if info and info.samplerate == rate:
+            # 采样率一致时逐块读取，不整体载入
+            src = sf.SoundFile(m)
+            samples = src.frames
+
+            def read(start, n):
+                lo, hi = max(start, 0), min(start + n, samples)
+                if hi <= lo:
+                    return np.zeros((2, n), dtype=np.float32)
+                src.seek(lo)
+                data = src.read(hi - lo, dtype="float32", always_2d=True).T
+                if data.shape[0] == 1:
+                    data = np.repeat(data, 2, axis=0)
+                return np.pad(data[:2], ((0, 0), (lo - start, n - (lo - start) - data.shape[1])))
         else:
-            path_vocal = "%s/%s_main_vocal.wav" % (vocal_root, basename)
-            path_other = "%s/%s_others.wav" % (others_root, basename)
-            sf.write(path_vocal, mix - opt, rate)
-            sf.write(path_other, opt, rate)
+            src = None
+            mix, rate = librosa.load(m, mono=False, sr=44100)
+            if mix.ndim == 1:
+                mix = np.asfortranarray([mix, mix])
+            samples = mix.shape[-1]
+
+            def read(start, n):
+                return _slice(mix, start, n, samples)
+
+        try:
+            with sf.SoundFile(path_vocal, "w", rate, 2) as f_vocal, sf.SoundFile(path_other, "w", rate, 2) as f_other:
+                for start, opt in self.demix_iter(read, samples):
+                    mix_block = read(start, opt.shape[1])
+                    f_vocal.write((mix_block - opt).T)
+                    f_other.write(opt.T)
+        finally:
+            if src is not None:
+                src.close()
+        if format not in ["wav", "flac"]:
             opt_path_vocal = path_vocal[:-4] + ".%s" % format
             opt_path_other = path_other[:-4] + ".%s" % format
             if os.path.exists(path_vocal):
@@ -1,15 +1,17 @@
+import gc
 import hashlib
-import os
-import traceback
+import threading
+import time
 import requests
 import py7zr
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import librosa
+import numpy as np
 import soundfile as sf
 import torch
-from pydub import AudioSegment
 
 from videotrans.configure import config
 
@@ -80,53 +82,43 @@ def download_uvr5_model():
         return False
 
 
-def uvr(*, model_name=None, save_root=None, inp_path=None, source="logs", uuid=None, percent=[0, 1]):
-    infos = []
-    try:
+# 已加载的模型，以 (模型名, 设备) 为键，多次分离时无需重复 torch.load
+# 显存中的模型在每次分离结束后释放，供后续识别、配音使用，CPU 上的模型继续保留
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(model_name="HP2", source="logs"):
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    with _models_lock:
+        pre_fun = _models.get((model_name, device))
+        if pre_fun is not None:
+            return pre_fun
         # 检查模型文件是否存在，如果不存在则下载
         model_file = Path(config.ROOT_DIR) / "uvr5_weights" / f"{model_name}.pth"
-        if not model_file.exists():
-            download_success = download_uvr5_model()
-            if not download_success:
-                infos.append("模型文件下载失败，请手动下载UVR5模型文件")
-                yield "\n".join(infos)
-                return
-        
-        func = AudioPre
-        pre_fun = func(
+        if not model_file.exists() and not download_uvr5_model():
+            raise Exception("模型文件下载失败，请手动下载UVR5模型文件")
+        pre_fun = AudioPre(
             agg=10,
-            model_path=config.ROOT_DIR + f"/uvr5_weights/{model_name}.pth",
-            device="cuda" if torch.cuda.is_available() else "cpu",
+            model_path=model_file.as_posix(),
+            device=device,
             is_half=False,
             source=source
         )
-        done = 0
-        try:
-            y, sr = librosa.load(inp_path, sr=None)
-            info = sf.info(inp_path)
-            channels = info.channels
-            need_reformat = 0
-            pre_fun._path_audio_(
-                inp_path,
-                ins_root=save_root,
-                uuid=uuid,
-                percent=percent
-            )
-            done = 1
-        except  Exception:
-            traceback.print_exc()
-    except:
-        infos.append(traceback.format_exc())
-        yield "\n".join(infos)
-    finally:
-        try:
-            del pre_fun.model
-            del pre_fun
-        except Exception:
-            traceback.print_exc()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-    yield "\n".join(infos)
+        _models[(model_name, device)] = pre_fun
+        return pre_fun
+
+
+def release_models(device=None):
+    """
+    释放已加载的模型，device 为 None 时全部释放，否则只释放该设备上的
+    """
+    with _models_lock:
+        for key in [k for k in _models if device is None or k[1] == device]:
+            del _models[key]
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
 
 
 def convert_to_pure_eng_num(string):
@@ -137,76 +129,154 @@ def convert_to_pure_eng_num(string):
     return hex_digest
 
 
-def split_audio(file_path):
-    audio = AudioSegment.from_wav(file_path)
+def _read_window(sf_file, start, end, sr):
+    """
+    读取 [start, end) 采样点(以 sr 计)，返回 (2, n) float32
+    """
+    if sf_file.samplerate == sr:
+        sf_file.seek(start)
+        data = sf_file.read(end - start, dtype='float32', always_2d=True)
+    else:
+        ratio = sf_file.samplerate / sr
+        sf_file.seek(int(start * ratio))
+        data = sf_file.read(int(round((end - start) * ratio)), dtype='float32', always_2d=True)
+        data = librosa.resample(data.T, orig_sr=sf_file.samplerate, target_sr=sr).T
+    if data.shape[1] == 1:
+        data = np.repeat(data, 2, axis=1)
+    elif data.shape[1] > 2:
+        data = data[:, :2]
+    data = np.asfortranarray(data.T)
+    # 重采样后长度可能差几个采样点
+    n = end - start
+    if data.shape[1] < n:
+        data = np.pad(data, ((0, 0), (0, n - data.shape[1])))
+    return data[:, :n]
+
+
+def _fit(wav, n):
+    if wav.shape[0] >= n:
+        return wav[:n]
+    return np.pad(wav, ((0, n - wav.shape[0]), (0, 0)))
+
+
+# path 是需要保存vocal.wav的目录
+def start(audio, path, source="logs", uuid=None):
+    """
+    整个文件按 bgm_split_time 秒划分为相互重叠 overlap 秒的窗口，直接在内存中处理，不再写出分段文件
+    各窗口的重采样/STFT 以及 ISTFT 在线程池中并行，模型推理依次进行，
+    结果在重叠处线性交叉淡化后按顺序写入 instrument.wav 和 vocal.wav，内存中只保留少数几个窗口
+    """
+    try:
+        return _separate(audio, path, source, uuid)
+    finally:
+        release_models("cuda")
+
+
+def _separate(audio, path, source, uuid):
+    Path(path).mkdir(parents=True, exist_ok=True)
+    pre_fun = get_model("HP2", source)
+    sr = pre_fun.mp.param["sr"]
     segment_length = 300
     try:
-        segment_length = int(config.settings['bgm_split_time'])
+        segment_length = int(float(config.settings.get('bgm_split_time', 300)))
     except Exception:
         pass
-    output_folder = Path(config.TEMP_DIR) / "separate"
-    output_folder.mkdir(parents=True, exist_ok=True)
-    output_folder = output_folder.as_posix()
-
-    total_length = len(audio)  # Total length in milliseconds
-    segment_length_ms = segment_length * 1000  # Convert segment length to milliseconds
-    segments = []
-
-    for i in range(0, total_length, segment_length_ms):
-        start = i
-        end = min(i + segment_length_ms, total_length)
-        segment = audio[start:end]
-        segment_filename = os.path.join(output_folder, f"segment_{i // 1000}.wav")
-        # 如果音频不是2通道，16kHz，则进行转换
-        if segment.channels != 2:
-            segment = segment.set_channels(2)
-        if segment.frame_rate != 44100:
-            segment = segment.set_frame_rate(44100)
-        segment.export(segment_filename, format="wav")
-        segments.append(segment_filename)
-
-    return segments
-
-
-def concatenate_audio(input_wav_list, out_wav):
-    combined = AudioSegment.empty()
-    for wav_file in input_wav_list:
-        audio = AudioSegment.from_wav(wav_file)
-        if audio.channels != 2:
-            audio = audio.set_channels(2)
-        if audio.frame_rate != 44100:
-            audio = audio.set_frame_rate(44100)
-        combined += audio
-
-    combined.export(out_wav, format="wav")
+    workers = max(1, int(float(config.settings.get('separate_workers', 2))))
+    overlap = 2 * sr
 
+    # 先写入临时文件，全部完成后再改名，中途停止或出错时不留下不完整的结果
+    outputs = {name: Path(f"{path}/{name}.wav") for name in ["instrument", "vocal"]}
+    tmp_outputs = {name: file.with_name(f'{name}-{time.time()}.tmp.wav') for name, file in outputs.items()}
+    writers = {}
+    finished = False
+    try:
+        with sf.SoundFile(audio) as sf_file:
+            total = int(sf_file.frames * sr / sf_file.samplerate)
+            if total < 1:
+                raise Exception('separate bgm error')
+            step = max(segment_length * sr, overlap * 2)
+            windows = [(s, min(total, s + step + overlap)) for s in range(0, total, step)]
+            # 最后一个窗口过短时并入前一个，此后除最后一个外，每个窗口末尾与下一个窗口开头恰好重叠 overlap
+            if len(windows) > 1 and windows[-1][1] - windows[-1][0] <= overlap:
+                windows.pop()
+                windows[-1] = (windows[-1][0], total)
 
-# path 是需要保存vocal.wav的目录
-def start(audio, path, source="logs", uuid=None):
-    Path(path).mkdir(parents=True, exist_ok=True)
-    reslist = split_audio(audio)
-    vocal_list = []
-    instr_list = []
-    grouplen = len(reslist)
-    per = round(1 / grouplen, 2)
-    for i, audio_seg in enumerate(reslist):
-        if config.exit_soft or (uuid in config.stoped_uuid_set):
-            return
-        audio_path = Path(audio_seg)
-        path_dir = audio_path.parent / audio_path.stem
-        path_dir.mkdir(parents=True, exist_ok=True)
-        try:
-            gr = uvr(model_name="HP2", save_root=path_dir.as_posix(), inp_path=Path(audio_seg).as_posix(),
-                     source=source, uuid=uuid, percent=[i * per, per])
-            print(next(gr))
-            print(next(gr))
-        except StopIteration:
-            vocal_list.append((path_dir / 'vocal.wav').as_posix())
-            instr_list.append((path_dir / 'instrument.wav').as_posix())
-        except Exception as e:
-            raise
-
-    if len(vocal_list) < 1 or len(instr_list) < 1:
-        raise Exception('separate bgm error')
-    concatenate_audio(instr_list, Path(f"{path}/instrument.wav").as_posix())
-    concatenate_audio(vocal_list, Path(f"{path}/vocal.wav").as_posix())
+            fade_in = np.linspace(0, 1, overlap, dtype=np.float32)[:, None]
+            read_lock = threading.Lock()
+            for name, file in tmp_outputs.items():
+                writers[name] = sf.SoundFile(file.as_posix(), mode='w', samplerate=sr, channels=2,
+                                             subtype='PCM_16', format='WAV')
+            # 上一窗口末尾与下一窗口重叠的部分，等下一窗口完成后相加再写出
+            carry = {}
+
+            def _prepare(i):
+                s, e = windows[i]
+                with read_lock:
+                    wave = _read_window(sf_file, s, e, sr)
+                return pre_fun.to_spec(wave)
+
+            def _finish(i, y_spec_m, v_spec_m, input_high_end_h, input_high_end):
+                s, e = windows[i]
+                n = e - s
+                weight = np.ones((n, 1), dtype=np.float32)
+                if i > 0:
+                    weight[:overlap] = fade_in
+                if i < len(windows) - 1:
+                    weight[-overlap:] = fade_in[::-1]
+                # 重叠部分两个窗口的权重之和为1
+                ins = _fit(pre_fun.to_wave(y_spec_m, input_high_end_h, input_high_end), n) * weight
+                voc = _fit(pre_fun.to_wave(v_spec_m, input_high_end_h, input_high_end), n) * weight
+                return {"instrument": ins, "vocal": voc}
+
+            # 按窗口顺序写出，每个窗口只有与下一窗口重叠的末尾暂留在内存中
+            def _write(i, result):
+                last = i == len(windows) - 1
+                for name, wav in result.items():
+                    if name in carry:
+                        wav[:overlap] += carry.pop(name)
+                    if not last:
+                        carry[name] = wav[-overlap:].copy()
+                        wav = wav[:-overlap]
+                    writers[name].write(np.clip(wav, -1, 1))
+
+            per = 1 / len(windows)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # 只预取 workers 个窗口，避免频谱占用过多内存
+                pending = {i: pool.submit(_prepare, i) for i in range(min(workers, len(windows)))}
+                finishing = []
+                written = 0
+                for i in range(len(windows)):
+                    if config.exit_soft or (uuid in config.stoped_uuid_set):
+                        for f in list(pending.values()) + finishing:
+                            f.cancel()
+                        return
+                    X_spec_m, input_high_end_h, input_high_end = pending.pop(i).result()
+                    nxt = i + workers
+                    if nxt < len(windows):
+                        pending[nxt] = pool.submit(_prepare, nxt)
+                    res = pre_fun.predict(X_spec_m, source=source, uuid=uuid, percent=[i * per, per])
+                    if res is None:
+                        return
+                    del X_spec_m
+                    finishing.append(pool.submit(_finish, i, res[0], res[1], input_high_end_h, input_high_end))
+                    # 依次写出已完成的窗口，待写出的超过 workers 个时等待最早的一个
+                    while finishing and (finishing[0].done() or len(finishing) > workers):
+                        _write(written, finishing.pop(0).result())
+                        written += 1
+                while finishing:
+                    _write(written, finishing.pop(0).result())
+                    written += 1
+        for name, writer in writers.items():
+            writer.close()
+        for name, file in tmp_outputs.items():
+            file.replace(outputs[name])
+        finished = True
+    finally:
+        if not finished:
+            for name, writer in writers.items():
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            for file in tmp_outputs.values():
+                file.unlink(missing_ok=True)
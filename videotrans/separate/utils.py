@@ -1,4 +1,5 @@
 import json
+import time
 
 import numpy as np
 import torch
@@ -35,33 +36,41 @@ def inference(X_spec, device, model, aggressiveness, data, source="logs", uuid=N
     def _execute(
             X_mag_pad, roi_size, n_window, device, model, aggressiveness, is_half=True, source="logs"
     ):
+        # 每次前向传播处理 batch_size 个窗口，窗口拷贝到预分配(GPU时为锁页)的张量中再整体送入设备
+        batch_size = max(1, int(float(config.settings.get('separate_batch_size', 4))))
+        batch_size = min(batch_size, n_window)
+        window_size = data["window_size"]
+        use_cuda = str(device).startswith('cuda')
         model.eval()
         with torch.no_grad():
             preds = []
-
-            iterations = [n_window]
-
-            total_iterations = sum(iterations)
-            for i in range(n_window):
+            buf = torch.empty(
+                (batch_size, X_mag_pad.shape[0], X_mag_pad.shape[1], window_size),
+                dtype=torch.float32,
+                pin_memory=use_cuda
+            )
+            last_report = 0
+            for b in range(0, n_window, batch_size):
                 if config.exit_soft or (uuid in config.stoped_uuid_set):
-                    return
-                jd = (percent[0] + (percent[1] * (i + 1) / n_window)) * 100
-                jd = 100 if jd >= 100 else jd
-                tools.set_process(text=f"{config.transobj['Separating background music']} {round(jd, 1)}%", type=source,
-                                  uuid=uuid)
-                start = i * roi_size
-                X_mag_window = X_mag_pad[
-                               None, :, :, start: start + data["window_size"]
-                               ]
-                X_mag_window = torch.from_numpy(X_mag_window)
+                    return None
+                k = min(batch_size, n_window - b)
+                for j in range(k):
+                    start = (b + j) * roi_size
+                    buf[j].copy_(torch.from_numpy(X_mag_pad[:, :, start: start + window_size]))
+                X_mag_window = buf[:k].to(device, non_blocking=use_cuda)
                 if is_half:
                     X_mag_window = X_mag_window.half()
-                X_mag_window = X_mag_window.to(device)
 
                 pred = model.predict(X_mag_window, aggressiveness)
+                preds.extend(pred.detach().cpu().float().numpy())
 
-                pred = pred.detach().cpu().numpy()
-                preds.append(pred[0])
+                # 进度最多每秒报告一次
+                done = b + k
+                if done >= n_window or time.time() - last_report >= 1:
+                    last_report = time.time()
+                    jd = min(100, (percent[0] + (percent[1] * done / n_window)) * 100)
+                    tools.set_process(text=f"{config.transobj['Separating background music']} {round(jd, 1)}%",
+                                      type=source, uuid=uuid)
 
             pred = np.concatenate(preds, axis=2)
         return pred
@@ -90,6 +99,9 @@ def inference(X_spec, device, model, aggressiveness, data, source="logs", uuid=N
     pred = _execute(
         X_mag_pad, roi_size, n_window, device, model, aggressiveness, is_half, source
     )
+    # 已停止
+    if pred is None:
+        return None
     pred = pred[:, :, :n_frame]
 
     if data["tta"]:
@@ -102,6 +114,8 @@ def inference(X_spec, device, model, aggressiveness, data, source="logs", uuid=N
         pred_tta = _execute(
             X_mag_pad, roi_size, n_window, device, model, aggressiveness, is_half
         )
+        if pred_tta is None:
+            return None
         pred_tta = pred_tta[:, :, roi_size // 2:]
         pred_tta = pred_tta[:, :, :n_frame]
 
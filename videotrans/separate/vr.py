@@ -1,4 +1,5 @@
 import os
+import threading
 
 import librosa
 import numpy as np
@@ -38,38 +39,17 @@ class AudioPre:
 
         self.mp = mp
         self.model = model
+        self._lock = threading.Lock()
 
-    def _path_audio_(
-            self, music_file, ins_root=None, format="wav", is_hp3=False, uuid=None, percent=[0, 1]
-    ):
-
-        if ins_root is None:
-            return "No save root."
-        name = os.path.splitext(os.path.basename(music_file))[0]
-        if ins_root is not None:
-            os.makedirs(ins_root, exist_ok=True)
-        vocal_root = ins_root
-
-        X_wave, y_wave, X_spec_s, y_spec_s = {}, {}, {}, {}
+    # 高频段波形 (2, n) -> 合并后的频谱及高频镜像所需数据，不涉及模型，可在线程池中并行
+    def to_spec(self, wave):
+        X_wave, X_spec_s = {}, {}
+        input_high_end_h, input_high_end = None, None
         bands_n = len(self.mp.param["band"])
         for d in range(bands_n, 0, -1):
-            if config.exit_soft:
-                return
-
             bp = self.mp.param["band"][d]
             if d == bands_n:  # high-end band
-                (
-                    X_wave[d],
-                    _,
-                ) = librosa.core.load(
-                    music_file,
-                    sr=bp["sr"],
-                    mono=False,
-                    dtype=np.float32,
-                    res_type=bp["res_type"],
-                )
-                if X_wave[d].ndim == 1:
-                    X_wave[d] = np.asfortranarray([X_wave[d], X_wave[d]])
+                X_wave[d] = wave
             else:  # lower bands
                 X_wave[d] = librosa.core.resample(
                     X_wave[d + 1],
@@ -86,7 +66,6 @@ class AudioPre:
                 self.mp.param["mid_side_b2"],
                 self.mp.param["reverse"],
             )
-            # pdb.set_trace()
             if d == bands_n and self.data["high_end_process"] != "none":
                 input_high_end_h = (bp["n_fft"] // 2 - bp["crop_stop"]) + (
                         self.mp.param["pre_filter_stop"] - self.mp.param["pre_filter_start"]
@@ -96,70 +75,76 @@ class AudioPre:
                                  ]
 
         X_spec_m = spec_utils.combine_spectrograms(X_spec_s, self.mp)
+        return X_spec_m, input_high_end_h, input_high_end
+
+    # 模型推理，返回 (伴奏频谱, 人声频谱)，中止时返回 None
+    # 同一实例可能被多个任务共用，推理时加锁
+    def predict(self, X_spec_m, source=None, uuid=None, percent=[0, 1]):
         aggresive_set = float(self.data["agg"] / 100)
         aggressiveness = {
             "value": aggresive_set,
             "split_bin": self.mp.param["band"][1]["crop_stop"],
         }
-        with torch.no_grad():
-            pred, X_mag, X_phase = inference(
-                X_spec_m, self.device, self.model, aggressiveness, self.data, self.source,
+        with self._lock, torch.no_grad():
+            res = inference(
+                X_spec_m, self.device, self.model, aggressiveness, self.data, source or self.source,
                 uuid=uuid,
                 percent=percent
             )
+        if res is None:
+            return None
+        pred, X_mag, X_phase = res
         # Postprocess
         if self.data["postprocess"]:
             pred_inv = np.clip(X_mag - pred, 0, np.inf)
             pred = spec_utils.mask_silence(pred, pred_inv)
         y_spec_m = pred * X_phase
         v_spec_m = X_spec_m - y_spec_m
+        return y_spec_m, v_spec_m
 
-        if ins_root is not None:
-            if self.data["high_end_process"].startswith("mirroring"):
-                input_high_end_ = spec_utils.mirroring(
-                    self.data["high_end_process"], y_spec_m, input_high_end, self.mp
-                )
-                wav_instrument = spec_utils.cmb_spectrogram_to_wave(
-                    y_spec_m, self.mp, input_high_end_h, input_high_end_
-                )
-            else:
-                wav_instrument = spec_utils.cmb_spectrogram_to_wave(y_spec_m, self.mp)
-            config.logger.info("%s instruments done" % name)
-            if is_hp3 == True:
-                head = "vocal"
-            else:
-                head = "instrument"
-            if format in ["wav", "flac"]:
-                sf.write(
-                    os.path.join(
-                        ins_root,
-                        head + ".{}".format(format),
-                    ),
-                    (np.array(wav_instrument) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )  #
+    # 频谱转回波形 (n, 2)，可在线程池中并行
+    def to_wave(self, spec_m, input_high_end_h=None, input_high_end=None):
+        if self.data["high_end_process"].startswith("mirroring"):
+            input_high_end_ = spec_utils.mirroring(
+                self.data["high_end_process"], spec_m, input_high_end, self.mp
+            )
+            return spec_utils.cmb_spectrogram_to_wave(
+                spec_m, self.mp, input_high_end_h, input_high_end_
+            )
+        return spec_utils.cmb_spectrogram_to_wave(spec_m, self.mp)
 
-        if vocal_root is not None:
-            if is_hp3 == True:
-                head = "instrument"
-            else:
-                head = "vocal"
-            if self.data["high_end_process"].startswith("mirroring"):
-                input_high_end_ = spec_utils.mirroring(
-                    self.data["high_end_process"], v_spec_m, input_high_end, self.mp
-                )
-                wav_vocals = spec_utils.cmb_spectrogram_to_wave(
-                    v_spec_m, self.mp, input_high_end_h, input_high_end_
-                )
-            else:
-                wav_vocals = spec_utils.cmb_spectrogram_to_wave(v_spec_m, self.mp)
-            config.logger.info("%s vocals done" % name)
+    def _path_audio_(
+            self, music_file, ins_root=None, format="wav", is_hp3=False, uuid=None, percent=[0, 1]
+    ):
+
+        if ins_root is None:
+            return "No save root."
+        name = os.path.splitext(os.path.basename(music_file))[0]
+        os.makedirs(ins_root, exist_ok=True)
+        if config.exit_soft:
+            return
+        bp = self.mp.param["band"][len(self.mp.param["band"])]
+        wave, _ = librosa.core.load(
+            music_file,
+            sr=bp["sr"],
+            mono=False,
+            dtype=np.float32,
+            res_type=bp["res_type"],
+        )
+        if wave.ndim == 1:
+            wave = np.asfortranarray([wave, wave])
+        X_spec_m, input_high_end_h, input_high_end = self.to_spec(wave)
+        res = self.predict(X_spec_m, uuid=uuid, percent=percent)
+        if res is None:
+            return
+        y_spec_m, v_spec_m = res
+        heads = ("vocal", "instrument") if is_hp3 else ("instrument", "vocal")
+        for head, spec_m in zip(heads, (y_spec_m, v_spec_m)):
+            wav = self.to_wave(spec_m, input_high_end_h, input_high_end)
+            config.logger.info(f"{name} {head} done")
             if format in ["wav", "flac"]:
                 sf.write(
-                    os.path.join(
-                        vocal_root,
-                        head + ".{}".format(format),
-                    ),
-                    (np.array(wav_vocals) * 32768).astype("int16"),
+                    os.path.join(ins_root, head + ".{}".format(format)),
+                    (np.array(wav) * 32768).astype("int16"),
                     self.mp.param["sr"],
                 )
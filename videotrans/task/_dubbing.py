@@ -122,7 +122,7 @@ class DubbingSrt(BaseTask):
                 continue
             voice_role = self.cfg['voice_role']
             # 要保存到的文件
-            filename_md5=tools.get_md5(f"{self.cfg['tts_type']}-{it['start_time']}-{it['end_time']}-{voice_role}-{rate}-{self.cfg['volume']}-{self.cfg['pitch']}-{len(it['text'])}-{i}")
+            filename_md5=tools.get_md5(f"{self.cfg['tts_type']}-{it['start_time']}-{it['end_time']}-{voice_role}-{rate}-{self.cfg['volume']}-{self.cfg['pitch']}-{it['text']}-{i}")
             tmp_dict= {"text": it['text'], "role": voice_role, "start_time": it['start_time'],
                        "end_time": it['end_time'], "rate": rate, "startraw": it['startraw'], "endraw": it['endraw'],
                        "volume": self.cfg['volume'],
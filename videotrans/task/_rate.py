@@ -1,14 +1,18 @@
 import os
 import shutil
 import time
+import wave
 from pathlib import Path
 
-from pydub import AudioSegment
+import numpy as np
 from pydub.exceptions import CouldntDecodeError
 
 from videotrans.configure import config
 from videotrans.util import tools
+from videotrans.util.clip_cache import get_cache, release_cache, probe_duration
+from videotrans.util.time_stretch import speedup
 import concurrent.futures
+from functools import partial
 
 
 '''
@@ -18,69 +22,99 @@ import concurrent.futures
 '''
 
 
+# 并发处理切片时的最大工作数，设置 process_max 为0时根据cpu核心数自动决定
+def get_max_workers(total=0):
+    try:
+        num = int(float(config.settings.get('process_max', 0)))
+    except (TypeError, ValueError):
+        num = 0
+    if num < 1:
+        # ffmpeg 编码本身即是多线程，这里只取一半核心，避免相互争抢
+        num = max(1, min(8, (os.cpu_count() or 2) // 2))
+    return max(1, min(num, total)) if total > 0 else num
+
+
+def run_in_pool(func, items, *, uuid=None, text='', stop=None, use_process=False):
+    """
+    在有界线程池(或进程池)中并发执行 func(item)，结果列表与 items 顺序一致，失败的项为 None
+    stop: 无参函数，返回 True 时取消所有尚未开始的任务，并返回 None
+    每完成一项通过 tools.set_process 报告进度
+    """
+    total = len(items)
+    results = [None] * total
+    if total < 1:
+        return results
+    pool = concurrent.futures.ProcessPoolExecutor if use_process else concurrent.futures.ThreadPoolExecutor
+    executor = pool(max_workers=get_max_workers(total))
+    futures = {executor.submit(func, item): i for i, item in enumerate(items)}
+    pending = set(futures)
+    done_num = 0
+    try:
+        while pending:
+            if stop and stop():
+                for fu in pending:
+                    fu.cancel()
+                return None
+            done, pending = concurrent.futures.wait(pending, timeout=1,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            for fu in done:
+                done_num += 1
+                try:
+                    results[futures[fu]] = fu.result()
+                except Exception as e:
+                    config.logger.exception(f'并发任务出错:{e}', exc_info=True)
+                tools.set_process(text=f"{text} {done_num}/{total}", uuid=uuid)
+    finally:
+        # 已在执行的任务无法中断，取消时不再等待其结束
+        executor.shutdown(wait=not pending, cancel_futures=True)
+    return results
+
+
 def process_audio(item):
-    """处理单个音频文件"""
+    """
+    处理单个音频文件，可在子进程中执行
+    先移除首尾静音，仍超出目标时长时按 item['backend'] 指定的实现保持音调加速
+    返回 (文件名, 处理后真实时长ms 或 False, 错误信息)
+    """
+    input_file_path=item['filename']
     try:
-        from pydub import AudioSegment
-        from pydub.silence import detect_nonsilent
-        input_file_path=item['filename']
         target_duration_ms=item["target_duration_ms"]
-        
+
         if not Path(input_file_path).exists():
             return input_file_path,target_duration_ms,""
-        
-        format = input_file_path.split('.')[-1].lower()
-        audio = AudioSegment.from_file(input_file_path,format=format)
-        
+
+        cache = get_cache(item.get('uuid'))
+        audio = cache.get(input_file_path)
+
         current_duration_ms=len(audio)
 
         if target_duration_ms <= 0 or current_duration_ms <= target_duration_ms:
             return input_file_path,current_duration_ms,""
 
-
-        # Detect non-silent chunks
-        nonsilent_chunks = detect_nonsilent(
-            audio,
-            min_silence_len=10,
-            silence_thresh=50.0
-        )
-
-        # If we have nonsilent chunks, get the start and end of the last nonsilent chunk
-        if nonsilent_chunks:
-            start_index, end_index = nonsilent_chunks[-1]
-
-            # Remove the silence from the end by slicing the audio segment
-            trimmed_audio = audio[:end_index]
-            if is_start and nonsilent_chunks[0] and nonsilent_chunks[0][0] > 0:
-                trimmed_audio = audio[nonsilent_chunks[0][0]:end_index]
-            current_duration_ms=len(trimmed_audio)
+        # 移除首尾静音后若已不超出，则无需加速
+        trimmed_audio = tools.remove_silence_from_chunk(audio, silence_threshold=-50.0, chunk_size=10, is_start=True)
+        if len(trimmed_audio) != current_duration_ms:
+            audio = trimmed_audio
+            current_duration_ms = len(audio)
             if current_duration_ms <= target_duration_ms:
-                audio.export(input_file_path, format=format)
+                cache.export(audio, input_file_path)
                 return input_file_path,current_duration_ms,""
-            audio=trimmed_audio
-            
-            
-
-
-        
 
         # 计算速度变化率
-        speedup_ratio = current_duration_ms / target_duration_ms
-
-        if speedup_ratio <= 1:
-            return input_file_path,current_duration_ms,""
-        rate = min(100, speedup_ratio)
+        rate = min(100, current_duration_ms / target_duration_ms)
         # 变速处理
         try:
-            fast_audio = audio.speedup(playback_speed=rate)
-            # 如果处理后的音频时长稍长于目标时长，进行剪裁
-            if len(fast_audio) > target_duration_ms:
-                fast_audio = fast_audio[:target_duration_ms]
-        except Exception:
-            fast_audio = audio[:target_duration_ms]
-
-        fast_audio.export(input_file_path, format=format)
-        return input_file_path, len(fast_audio), ""  # 文件名, 成功标志, 错误信息
+            fast_audio = speedup(audio, rate, backend=item.get('backend'))
+        except Exception as e:
+            config.logger.exception(f'加速配音失败，直接截断:{e}', exc_info=True)
+            fast_audio = audio
+        # 如果处理后的音频时长稍长于目标时长，进行剪裁
+        if len(fast_audio) > target_duration_ms:
+            fast_audio = fast_audio[:target_duration_ms]
+
+        cache.export(fast_audio, input_file_path)
+        # 编码后的真实时长，可能和 len(fast_audio) 有数毫秒差异
+        return input_file_path, probe_duration(input_file_path) or len(fast_audio), ""
     except Exception as e:
         return input_file_path, False, str(e) # 文件名, 成功标志, 错误信息
 
@@ -166,6 +200,13 @@ class SpeedRate:
         config.logger.info(f'SpeedRate2:{self.cache_folder=},{self.noextname=}')
 
     def run(self):
+        try:
+            return self._run()
+        finally:
+            # 对齐为最后一个使用配音片段的阶段，结束后释放解码缓存
+            release_cache(self.uuid)
+
+    def _run(self):
         self._add_dubb_time()
         if config.settings['remove_srt_silence']:
             self._remove_srt_silence()
@@ -213,9 +254,9 @@ class SpeedRate:
 
             # 记录实际配音后，未经任何处理的真实配音时长
             if tools.vail_file(it['filename']):
-                the_ext = it['filename'].split('.')[-1]
                 try:
-                    it['dubb_time'] = len(AudioSegment.from_file(it['filename'], format="mp4" if the_ext == 'm4a' else the_ext))
+                    # 只读取文件头，不必解码
+                    it['dubb_time'] = get_cache(self.uuid).duration(it['filename'])
                 except CouldntDecodeError:
                     config.logger.exception(f'添加配音时长失败')
                     it['dubb_time'] = 0
@@ -336,45 +377,40 @@ class SpeedRate:
                     audio_extend = int(it['dubb_time'] / max_speed)
             if audio_extend<=0:
                 continue
-            should_speed.append({"filename":it['filename'],'target_duration_ms':audio_extend})
+            should_speed.append({"filename":it['filename'],'target_duration_ms':audio_extend,'uuid':self.uuid})
 
         
         total_files = len(should_speed)
         if total_files<1:
             return
-        results = []
-        """
-        with concurrent.futures.ProcessPoolExecutor(max_workers=min(2,total_files)  ) as executor:
-            futures = [executor.submit(process_audio, item.copy()) for item in should_speed]
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                if config.exit_soft:
-                    return
-                filename, success, error_message = future.result()
-                progress = (i + 1) / total_files * 100
-                tools.set_process(text=f"{config.transobj['dubbing speed up']}  {i + 1}/{total_files}",uuid=self.uuid)
-                print(f"进度: {progress:.2f}%, 状态: {'成功' if success else '失败'}")
-                if success is False or success is None:
-                    print(f"错误信息: {error_message}")
-                else:
-                    results.append({filename:success})
-        """
-        # 3.22 修改
-        for i,item in enumerate(should_speed):
-            if config.exit_soft:
-                return
-            filename, success, error_message=process_audio(item.copy())
-            progress = (i + 1) / total_files * 100
-            tools.set_process(text=f"{config.transobj['dubbing speed up']}  {i + 1}/{total_files}",uuid=self.uuid)
-            print(f"进度: {progress:.2f}%, 状态: {'成功' if success else '失败'}")
+        backend = config.settings.get('audio_stretch', 'ffmpeg')
+        for item in should_speed:
+            item['backend'] = backend
+        # 片段较少时进程启动开销大于收益，使用线程池
+        res_list = run_in_pool(
+            process_audio,
+            should_speed,
+            uuid=self.uuid,
+            text=config.transobj['dubbing speed up'],
+            stop=lambda: config.exit_soft,
+            use_process=total_files > 4
+        )
+        if res_list is None:
+            return
+        results = {}
+        for res in res_list:
+            if not res:
+                continue
+            filename, success, error_message = res
             if success is False or success is None:
-                print(f"错误信息: {error_message}")
+                config.logger.error(f'配音加速失败:{filename} {error_message}')
             else:
-                results.append({filename:success})
+                results[filename] = success
         for i, it in enumerate(self.queue_tts):
             # 获取实际加速完毕后的真实配音时长，因为精确度原因，未必和上述计算出的一致
             # 如果视频需要变化，更新视频时长需要变化的长度
-            if tools.vail_file(it['filename']) and it['filename'] in results:
-                it['dubb_time'] = int(results.get(it['filename']))
+            if it['filename'] in results:
+                it['dubb_time'] = int(results[it['filename']])
             self.queue_tts[i] = it
 
 
@@ -495,27 +531,40 @@ class SpeedRate:
 
         config.logger.info(should_speed)
       
-        # 0322 修改
-        for i,item in enumerate(should_speed):
-            if config.exit_soft or config.current_status!='ing':
+        stop_file = config.TEMP_DIR + '/stop_porcess.txt'
+        # 单次 filter_complex 渲染，失败时回退为逐段切割
+        rendered = False
+        if config.settings.get('videoslow_onepass', False):
+            try:
+                rendered = self._ajust_video_onepass(should_speed, stop_file=stop_file)
+            except Exception as e:
+                config.logger.exception(f'filter_complex 单次慢速渲染失败，回退为逐段切割:{e}', exc_info=True)
+            if config.exit_soft or config.current_status != 'ing' or Path(stop_file).exists():
                 return
-            success,error,extend_time,idx=process_video(
-                item.copy(),
-                config.settings.get('video_codec',264),
-                config.settings.get('crf',25),
-                config.settings.get('preset','fast'),
-                config.settings.get('videoslow_hard',False),
-                stop_file=config.TEMP_DIR+'/stop_porcess.txt'
+        if not rendered:
+            results = run_in_pool(
+                partial(process_video,
+                        codenum=config.settings.get('video_codec', 264),
+                        crf=config.settings.get('crf', 25),
+                        preset=config.settings.get('preset', 'fast'),
+                        video_hard=config.settings.get('videoslow_hard', False),
+                        stop_file=stop_file),
+                [item.copy() for item in should_speed],
+                uuid=self.uuid,
+                text=config.transobj['videodown..'],
+                stop=lambda: config.exit_soft or config.current_status != 'ing' or Path(stop_file).exists()
             )
-            print(f"sp进度: {i+1}/{total_files}, 状态: {'成功' if success else '失败'}")
-            tools.set_process(text=f"{config.transobj['videodown..']} {i+1}/{total_files}", uuid=self.uuid)
-            if success is False or success is None:
-                config.logger.error(f'[错误信息] {error}')
-                print(f"错误信息 {error}")
-            elif extend_time>0 and idx>-1:
-               self.queue_tts[idx]['video_extend']=extend_time
-               print(f'视频延长了 {extend_time} 毫秒')
-        
+            if results is None:
+                return
+            for res in results:
+                if not res:
+                    continue
+                success, error, extend_time, idx = res
+                if success is False or success is None:
+                    config.logger.error(f'[错误信息] {error}')
+                elif extend_time > 0 and idx > -1:
+                    self.queue_tts[idx]['video_extend'] = extend_time
+
         # 需要调整 原字幕时长，延长视频相当于延长了原字幕时长
         offset = 0
         for i, it in enumerate(self.queue_tts):
@@ -526,6 +575,8 @@ class SpeedRate:
                 offset += it['video_extend']
             self.queue_tts[i] = it
 
+        if rendered:
+            return
         # 将所有视频片段连接起来
         new_arr = []
         config.logger.info(f'所有待连接视频片段:{concat_txt_arr=}')
@@ -541,72 +592,135 @@ class SpeedRate:
             tools.concat_multi_mp4(out=self.novoice_mp4, concat_txt=concat_txt)
 
 
+    # 不切割为独立小片段，而是将所有区间构造为 trim+setpts+concat 的 filter_complex，单次渲染出 novoice.mp4
+    # 区间过多时按 videoslow_chunk 个区间一块分为几个大块，每块只解码一次，最后无损连接
+    def _ajust_video_onepass(self, should_speed, stop_file=None):
+        max_pts = config.settings.get('video_rate', 20)
+        # (开始ms, 结束ms 或 None=直到末尾, 慢速倍数, 字幕索引)
+        segments = []
+        for item in should_speed:
+            ss = tools.get_ms_from_hmsm(item['ss'])
+            to = tools.get_ms_from_hmsm(item['to']) if item['to'] else None
+            if to is not None and to <= ss:
+                continue
+            pts = 1
+            if item['pts'] and item.get('duration'):
+                pts = min(float(max_pts), max(round(0.1 + (item["pts"] / item['duration']), 2), 1))
+            segments.append((ss, to, pts, item.get('idx', -1)))
+        if len(segments) < 1:
+            return False
+
+        chunk_size = max(10, int(float(config.settings.get('videoslow_chunk', 200))))
+        chunks = [segments[i:i + chunk_size] for i in range(0, len(segments), chunk_size)]
+        video_codec = config.settings['video_codec']
+        crf = config.settings.get("crf", 25)
+        preset = config.settings.get('preset', 'fast')
+        chunk_files = []
+        for n, chunk in enumerate(chunks):
+            if config.exit_soft or config.current_status != 'ing' or (stop_file and Path(stop_file).exists()):
+                return False
+            tools.set_process(text=f"{config.transobj['videodown..']} {n + 1}/{len(chunks)}", uuid=self.uuid)
+            chunk_start = chunk[0][0]
+            chunk_end = chunk[-1][1]
+            # 本块慢速后的预计时长，末尾片段无结束时间时按原视频总时长估算
+            out_ms = sum(((to if to is not None else max(self.raw_total_time, ss)) - ss) * pts for ss, to, pts, _ in chunk)
+            graph = [f'[0:v]split={len(chunk)}' + ''.join(f'[s{i}]' for i in range(len(chunk)))] if len(chunk) > 1 else []
+            for i, (ss, to, pts, _) in enumerate(chunk):
+                src = f'[s{i}]' if len(chunk) > 1 else '[0:v]'
+                trim = f'trim=start={(ss - chunk_start) / 1000}' + (f':end={(to - chunk_start) / 1000}' if to is not None else '')
+                setpts = f'setpts={pts}*(PTS-STARTPTS)' if pts > 1 else 'setpts=PTS-STARTPTS'
+                graph.append(f'{src}{trim},{setpts}[v{i}]')
+            graph.append(''.join(f'[v{i}]' for i in range(len(chunk))) + f'concat=n={len(chunk)}:v=1:a=0[outv]')
+
+            out = self.cache_folder + f'/onepass-{n}.mp4'
+            cmd = ['-y', '-ss', tools.ms_to_time_string(ms=chunk_start).replace(',', '.')]
+            if chunk_end is not None:
+                cmd += ['-to', tools.ms_to_time_string(ms=chunk_end).replace(',', '.')]
+            cmd += ['-i', self.novoice_mp4, '-filter_complex', ';'.join(graph), '-map', '[outv]', '-an',
+                    '-c:v', f'libx{video_codec}']
+            if int(crf) < 10:
+                cmd += ['-crf', f'{crf}', '-preset', preset]
+            cmd.append(out)
+            tools.runffmpeg(cmd, force_cpu=not config.settings.get('videoslow_hard', False),
+                            on_progress=self._onepass_progress(n + 1, len(chunks), out_ms))
+            chunk_files.append(out)
+
+        if len(chunk_files) == 1:
+            shutil.copy2(chunk_files[0], self.novoice_mp4)
+        else:
+            tools.set_process(text=f"连接视频片段..." if config.defaulelang == 'zh' else 'concat multi mp4 ...',
+                              uuid=self.uuid)
+            concat_txt = self.cache_folder + f'/{time.time()}.txt'
+            tools.create_concat_txt(chunk_files, concat_txt=concat_txt)
+            # 各块编码参数一致，直接复制流连接
+            tools.runffmpeg(['-y', '-f', 'concat', '-safe', '0', '-i', concat_txt, '-c:v', 'copy', '-an', self.novoice_mp4])
+
+        # 单次渲染不再逐段探测时长，按慢速倍数计算每条字幕视频延长的时长
+        for ss, to, pts, idx in segments:
+            if pts > 1 and idx > -1 and to is not None:
+                self.queue_tts[idx]['video_extend'] = int((to - ss) * pts) - (to - ss)
+        return True
+
+    # 返回单次渲染的进度回调，ms 为 ffmpeg 已输出的毫秒数
+    def _onepass_progress(self, num, total, out_ms):
+        def _progress(ms):
+            if out_ms <= 0:
+                return
+            tools.set_process(text=f"{config.transobj['videodown..']} {num}/{total} {min(round(ms * 100 / out_ms, 2), 100)}%",
+                              uuid=self.uuid)
+
+        return _progress
+
+    # 解码一次配音片段，返回 AudioSegment，失败返回 None
+    def _load_segment(self, filename):
+        try:
+            return get_cache(self.uuid).get(filename)
+        except CouldntDecodeError:
+            return None
+
+    # 在预先分配好的整段 int16 数组时间轴上写入每条配音，不再反复 += 拼接 AudioSegment
+    # 开始结束时间的计算同逐段拼接时完全一致
     def _merge_audio_segments(self):
-        merged_audio = AudioSegment.empty()
+        # (时间轴上的开始毫秒, AudioSegment)
+        placed = []
+        total_ms = 0
         if len(self.queue_tts) == 1:
-            the_ext = self.queue_tts[0]['filename'].split('.')[-1]
+            segment = None
             try:
-                merged_audio += AudioSegment.from_file(self.queue_tts[0]['filename'],format="mp4" if the_ext == 'm4a' else the_ext)
-            except CouldntDecodeError:
-                merged_audio+=AudioSegment.silent(duration=3000)
+                segment = self._load_segment(self.queue_tts[0]['filename'])
             except Exception:
-                merged_audio+=AudioSegment.silent(duration=3000)
+                pass
+            if segment is None:
+                total_ms = 3000
+            else:
+                placed.append((0, segment))
+                total_ms = len(segment)
         else:
-            # start is not 0
-            if self.queue_tts[0]['start_time_source'] > 0:
-                silence = AudioSegment.silent(duration=self.queue_tts[0]['start_time_source'])
-                merged_audio += silence
-
-            # 开始时间
+            # 开始时间，之前为静音
             cur = self.queue_tts[0]['start_time_source']
             length = len(self.queue_tts)
             for i, it in enumerate(self.queue_tts):
                 if config.exit_soft:
                     return
-                # 存在有效配音文件则加入，否则配音时长大于0则加入静音
-                segment = None
-                the_ext = it['filename'].split('.')[-1]
-
                 # 原始字幕时长
                 raw_source = it['end_time_source'] - it['start_time_source']
                 if raw_source == 0:
                     continue
-                # 存在配音文件
-                if tools.vail_file(it['filename']):
-                    try:
-                        segment = AudioSegment.from_file(it['filename'], format="mp4" if the_ext == 'm4a' else the_ext)
-                        it['dubb_time'] = len(segment)
-                    except CouldntDecodeError:
-                        segment = AudioSegment.silent(duration=raw_source)
-                        it['dubb_time'] = raw_source
-                else:
-                    # 不存在配音文件
-                    segment = AudioSegment.silent(duration=raw_source)
-                    it['dubb_time'] = raw_source
+                # 存在配音文件则解码一次，否则为与原始字幕等长的静音
+                segment = self._load_segment(it['filename']) if tools.vail_file(it['filename']) else None
+                it['dubb_time'] = len(segment) if segment is not None else raw_source
 
-                if i == 0:
-                    it['start_time'] = it['start_time_source']
-                    it['end_time'] = it['start_time_source'] + it['dubb_time']
-                    cur = it['end_time']
-                    merged_audio += segment
+                # 如果开始时间和上一个结束片段重合，则从上一个结束处开始，否则中间为静音
+                if i > 0 and it['start_time_source'] < cur:
+                    it['start_time'] = cur
                 else:
-                    if it['start_time_source'] < cur:
-                        # 如果开始时间和上一个结束片段重合
-                        it['start_time'] = cur
-                        it['end_time'] = it['start_time'] + it['dubb_time']
-                        cur = it['end_time']
-                        merged_audio += segment
-                    elif it['start_time_source'] >= cur:
-                        # 如果当前开始时间和上一个结束时间之间有间隔，则添加静音
-                        if it['start_time_source'] > cur:
-                            merged_audio += AudioSegment.silent(duration=it['start_time_source'] - cur)
-                        it['start_time'] = it['start_time_source']
-                        it['end_time'] = it['start_time'] + it['dubb_time']
-                        merged_audio += segment
-                        cur = it['end_time']
+                    it['start_time'] = it['start_time_source']
+                it['end_time'] = it['start_time'] + it['dubb_time']
+                cur = it['end_time']
+                if segment is not None:
+                    placed.append((it['start_time'], segment))
 
                 if cur < it['end_time_source']:
-                    merged_audio += AudioSegment.silent(duration=it['end_time_source'] - cur)
                     cur = it['end_time_source']
                     it['end_time'] = cur
 
@@ -614,11 +728,27 @@ class SpeedRate:
                 it['endraw'] = tools.ms_to_time_string(ms=it['end_time'])
                 self.queue_tts[i] = it
                 tools.set_process(text=f"{config.transobj['audio_concat']}:{i + 1}/{length}", uuid=self.uuid)
+            total_ms = cur
+
+        # 与 pydub 拼接时一致，统一为所有片段中最高的采样率和声道数
+        frame_rate = max([seg.frame_rate for _, seg in placed], default=44100)
+        channels = max([seg.channels for _, seg in placed], default=1)
+        timeline = np.zeros((int(total_ms * frame_rate / 1000), channels), dtype=np.int16)
+        for start_ms, seg in placed:
+            seg = seg.set_frame_rate(frame_rate).set_channels(channels).set_sample_width(2)
+            samples = np.frombuffer(seg.raw_data, dtype=np.int16).reshape(-1, channels)
+            offset = int(start_ms * frame_rate / 1000)
+            samples = samples[:max(0, timeline.shape[0] - offset)]
+            timeline[offset:offset + samples.shape[0]] = samples
 
         # 创建配音后的文件
         try:
             wavfile = self.cache_folder + "/target.wav"
-            merged_audio.export(wavfile, format="wav")
+            with wave.open(wavfile, 'wb') as f:
+                f.setnchannels(channels)
+                f.setsampwidth(2)
+                f.setframerate(frame_rate)
+                f.writeframes(timeline.tobytes())
             ext = Path(self.target_audio).suffix.lower()
             if ext == '.wav':
                 shutil.copy2(wavfile, self.target_audio)
@@ -1,8 +1,8 @@
-import time
 from threading import Thread
 
 from videotrans.configure import config
 from videotrans.task._base import BaseTask
+from videotrans.util.clip_cache import release_cache
 from videotrans.util.tools import set_process
 
 
@@ -25,225 +25,177 @@ assemb_queue
 """
 
 
-class WorkerPrepare(Thread):
-    def __init__(self, *, parent=None):
-        super().__init__()
+# 各阶段默认并发线程数，可通过设置 stage_workers 覆盖，格式 trans=2,regcon=1，默认均为1
+_DEFAULT_WORKERS = {"prepare": 1, "regcon": 1, "trans": 1, "dubb": 1, "audio_align": 1, "align": 1, "assemb": 1}
 
-    def run(self) -> None:
-        while 1:
-            if config.exit_soft:
-                return
-            if len(config.prepare_queue) < 1:
-                time.sleep(0.5)
-                continue
-            try:
-                trk: BaseTask = config.prepare_queue.pop(0)
-            except:
-                continue
-            if task_is_stop(trk.uuid):
-                continue
-            try:
 
-                trk.prepare()
-                # 如果需要识别，则插入 recogn_queue队列，否则继续判断翻译队列、配音队列，都不吻合则插入最终队列
-                if trk.shoud_recogn:
-                    config.regcon_queue.append(trk)
-                elif trk.shoud_trans:
-                    config.trans_queue.append(trk)
-                elif trk.shoud_dubbing:
-                    config.dubb_queue.append(trk)
-                else:
-                    config.assemb_queue.append(trk)
-            except Exception as e:
-                config.logger.exception(e, exc_info=True)
-                set_process(text=f'{config.transobj["yuchulichucuo"]}:' + str(e), type='error', uuid=trk.uuid)
+def _stage_workers():
+    nums = dict(_DEFAULT_WORKERS)
+    for it in str(config.settings.get('stage_workers', '')).replace('，', ',').split(','):
+        if '=' not in it:
+            continue
+        name, num = [x.strip() for x in it.split('=', 1)]
+        if name not in nums:
+            continue
+        try:
+            nums[name] = max(1, int(float(num)))
+        except ValueError:
+            pass
+    return nums
+
 
+class StageWorker(Thread):
+    """
+    阶段工作线程基类，在对应队列上阻塞等待，任务入队后立即被唤醒
+    子类设置 queue_name、error_key 并实现 handle
+    """
+    queue_name = ''
+    error_key = ''
 
-class WorkerRegcon(Thread):
     def __init__(self, *, parent=None):
         super().__init__()
+        self.queue = config.STAGE_QUEUES[self.queue_name]
 
-    def run(self) -> None:
-        while 1:
-            if config.exit_soft:
-                return
-
-            if len(config.regcon_queue) < 1:
-                time.sleep(0.5)
-                continue
-            trk = config.regcon_queue.pop(0)
-            if task_is_stop(trk.uuid):
-                continue
-            try:
-                trk.recogn()
-                # 如果需要识翻译,则插入翻译队列，否则就行判断配音队列，都不吻合则插入最终队列
-                if trk.shoud_trans:
-                    config.trans_queue.append(trk)
-                elif trk.shoud_dubbing:
-                    config.dubb_queue.append(trk)
-                else:
-                    config.assemb_queue.append(trk)
-            except Exception as e:
-                config.logger.exception(e, exc_info=True)
-                set_process(text=f'{config.transobj["shibiechucuo"]}:' + str(e), type='error', uuid=trk.uuid)
+    def handle(self, trk):
+        raise NotImplementedError
 
-
-class WorkerTrans(Thread):
-    def __init__(self, *, parent=None):
-        super().__init__()
+    def error_msg(self, e):
+        return f'{config.transobj[self.error_key]}:' + str(e)
 
     def run(self) -> None:
         while 1:
             if config.exit_soft:
                 return
-            if len(config.trans_queue) < 1:
-                time.sleep(0.5)
+            trk = self.queue.get(timeout=1)
+            if trk is None:
                 continue
-            trk = config.trans_queue.pop(0)
             if task_is_stop(trk.uuid):
+                # 已停止的任务不会再进入对齐阶段，释放其配音片段缓存
+                release_cache(trk.uuid)
                 continue
             try:
-                trk.trans()
-                # 如果需要配音，则插入 dubb_queue 队列，否则插入最终队列
-                if trk.shoud_dubbing:
-                    config.dubb_queue.append(trk)
-                else:
-                    config.assemb_queue.append(trk)
+                self.handle(trk)
             except Exception as e:
-                msg = f'{config.transobj["fanyichucuo"]}:' + str(e)
+                release_cache(trk.uuid)
                 config.logger.exception(e, exc_info=True)
-                set_process(text=msg, type='error', uuid=trk.uuid)
-
+                set_process(text=self.error_msg(e), type='error', uuid=trk.uuid)
+
+
+class WorkerPrepare(StageWorker):
+    queue_name = 'prepare'
+    error_key = 'yuchulichucuo'
+
+    def handle(self, trk: BaseTask):
+        trk.prepare()
+        # 如果需要识别，则插入 recogn_queue队列，否则继续判断翻译队列、配音队列，都不吻合则插入最终队列
+        if trk.shoud_recogn:
+            config.regcon_queue.append(trk)
+        elif trk.shoud_trans:
+            config.trans_queue.append(trk)
+        elif trk.shoud_dubbing:
+            config.dubb_queue.append(trk)
+        else:
+            config.assemb_queue.append(trk)
+
+
+class WorkerRegcon(StageWorker):
+    queue_name = 'regcon'
+    error_key = 'shibiechucuo'
+
+    def handle(self, trk: BaseTask):
+        trk.recogn()
+        # 如果需要识翻译,则插入翻译队列，否则就行判断配音队列，都不吻合则插入最终队列
+        if trk.shoud_trans:
+            config.trans_queue.append(trk)
+        elif trk.shoud_dubbing:
+            config.dubb_queue.append(trk)
+        else:
+            config.assemb_queue.append(trk)
+
+
+class WorkerTrans(StageWorker):
+    queue_name = 'trans'
+    error_key = 'fanyichucuo'
+
+    def handle(self, trk: BaseTask):
+        trk.trans()
+        # 如果需要配音，则插入 dubb_queue 队列，否则插入最终队列
+        if trk.shoud_dubbing:
+            config.dubb_queue.append(trk)
+        else:
+            config.assemb_queue.append(trk)
+
+
+class WorkerDubb(StageWorker):
+    queue_name = 'dubb'
+    error_key = 'peiyinchucuo'
 
-class WorkerDubb(Thread):
     def __init__(self, *, parent=None):
-        super().__init__()
+        super().__init__(parent=parent)
         self.name = "配音处理线程"  # 设置线程名称
 
-    def run(self) -> None:
-        while 1:
-            if config.exit_soft:
-                return
-            if len(config.dubb_queue) < 1:
-                time.sleep(0.5)
-                continue
-            trk = config.dubb_queue.pop(0)
-            if task_is_stop(trk.uuid):
-                continue
-            try:
-                trk.dubbing()
-                # 如果启用了AI自动对齐，则先进行音频对齐
-                is_auto_align = config.params.get('auto_align', False)
-                config.logger.info(f"任务{trk.uuid}配音完成，auto_align参数值: {is_auto_align}")
-                
-                if is_auto_align:
-                    config.logger.info(f"任务{trk.uuid}将进入AI自动对齐队列")
-                    # 确保audio_align_queue已初始化
-                    if not hasattr(config, 'audio_align_queue'):
-                        config.audio_align_queue = []
-                    config.audio_align_queue.append(trk)
-                else:
-                    config.logger.info(f"任务{trk.uuid}将跳过AI自动对齐，直接进入对齐队列")
-                    config.align_queue.append(trk)
-            except Exception as e:
-                msg = f'{config.transobj["peiyinchucuo"]}: {str(e)}'
-                config.logger.exception(e, exc_info=True)
-                set_process(text=msg, type='error', uuid=trk.uuid)
+    def handle(self, trk: BaseTask):
+        trk.dubbing()
+        # 如果启用了AI自动对齐，则先进行音频对齐
+        is_auto_align = config.params.get('auto_align', False)
+        config.logger.info(f"任务{trk.uuid}配音完成，auto_align参数值: {is_auto_align}")
+        if is_auto_align:
+            config.logger.info(f"任务{trk.uuid}将进入AI自动对齐队列")
+            config.audio_align_queue.append(trk)
+        else:
+            config.logger.info(f"任务{trk.uuid}将跳过AI自动对齐，直接进入对齐队列")
+            config.align_queue.append(trk)
 
 
-class WorkerAudioAlign(Thread):
+class WorkerAudioAlign(StageWorker):
     """AI自动对齐线程"""
+    queue_name = 'audio_align'
+
     def __init__(self, *, parent=None):
-        super().__init__()
+        super().__init__(parent=parent)
         config.logger.info("AI自动对齐线程已初始化")
         self.name = "AI自动对齐线程"  # 设置线程名称
 
-    def run(self) -> None:
-        config.logger.info("AI自动对齐线程已启动")
-        while 1:
-            if config.exit_soft:
-                config.logger.info("AI自动对齐线程退出")
-                return
-            if len(config.audio_align_queue) < 1:
-                time.sleep(0.5)
-                continue
-                
-            config.logger.info(f"AI自动对齐队列中有{len(config.audio_align_queue)}个任务")
-            trk = config.audio_align_queue.pop(0)
-            
-            if task_is_stop(trk.uuid):
-                config.logger.info(f"任务{trk.uuid}已停止，跳过AI自动对齐")
-                continue
-                
-            try:
-                config.logger.info(f"开始处理任务{trk.uuid}的AI自动对齐")
-                # 检查auto_align参数是否已设置
-                is_auto_align = config.params.get('auto_align', False)
-                config.logger.info(f"auto_align参数值: {is_auto_align}")
-                
-                # 执行音频对齐
-                trk.audio_align()
-                
-                config.logger.info(f"任务{trk.uuid}的AI自动对齐处理完成")
-                config.align_queue.append(trk)
-            except Exception as e:
-                msg = f'AI自动对齐失败: {str(e)}'
-                config.logger.exception(e, exc_info=True)
-                set_process(text=msg, type='error', uuid=trk.uuid)
+    def error_msg(self, e):
+        return f'AI自动对齐失败: {str(e)}'
 
+    def handle(self, trk: BaseTask):
+        config.logger.info(f"开始处理任务{trk.uuid}的AI自动对齐")
+        # 执行音频对齐
+        trk.audio_align()
+        config.logger.info(f"任务{trk.uuid}的AI自动对齐处理完成")
+        config.align_queue.append(trk)
 
-class WorkerAlign(Thread):
-    def __init__(self, *, parent=None):
-        super().__init__()
 
-    def run(self) -> None:
-        while 1:
-            if config.exit_soft:
-                return
-            if len(config.align_queue) < 1:
-                time.sleep(0.5)
-                continue
-            trk = config.align_queue.pop(0)
-            if task_is_stop(trk.uuid):
-                continue
-            try:
-                trk.align()
-            except Exception as e:
-                msg = f'{config.transobj["peiyinchucuo"]}:' + str(e)
-                config.logger.exception(e, exc_info=True)
-                set_process(text=msg, type='error', uuid=trk.uuid)
-            else:
-                config.assemb_queue.append(trk)
+class WorkerAlign(StageWorker):
+    queue_name = 'align'
+    error_key = 'peiyinchucuo'
 
+    def handle(self, trk: BaseTask):
+        trk.align()
+        config.assemb_queue.append(trk)
 
-class WorkerAssemb(Thread):
-    def __init__(self, *, parent=None):
-        super().__init__()
 
-    def run(self) -> None:
-        while 1:
-            if config.exit_soft:
-                return
-            if len(config.assemb_queue) < 1:
-                time.sleep(0.5)
-                continue
-            trk = config.assemb_queue.pop(0)
-            if task_is_stop(trk.uuid):
-                continue
-            try:
-                trk.assembling()
-                trk.task_done()
-            except Exception as e:
-                msg = f'{config.transobj["hebingchucuo"]}:' + str(e)
-                config.logger.exception(e, exc_info=True)
-                set_process(text=msg, type='error', uuid=trk.uuid)
+class WorkerAssemb(StageWorker):
+    queue_name = 'assemb'
+    error_key = 'hebingchucuo'
+
+    def handle(self, trk: BaseTask):
+        try:
+            trk.assembling()
+            trk.task_done()
+        finally:
+            # 最后一个阶段，跳过了对齐阶段的任务也在此释放
+            release_cache(trk.uuid)
+
+
+# 各阶段排队深度和等待时长
+def queue_stats():
+    return {name: q.stats() for name, q in config.STAGE_QUEUES.items()}
 
 
 def start_thread(parent=None):
-    WorkerPrepare(parent=parent).start()
-    WorkerRegcon(parent=parent).start()
-    WorkerTrans(parent=parent).start()
-    WorkerDubb(parent=parent).start()
-    WorkerAudioAlign(parent=parent).start()  # 新增AI自动对齐线程
-    WorkerAlign(parent=parent).start()
-    WorkerAssemb(parent=parent).start()
+    nums = _stage_workers()
+    for worker in [WorkerPrepare, WorkerRegcon, WorkerTrans, WorkerDubb, WorkerAudioAlign, WorkerAlign, WorkerAssemb]:
+        for _ in range(nums[worker.queue_name]):
+            worker(parent=parent).start()
@@ -1,6 +1,4 @@
-# 从日志队列获取日志
-import threading
-
+# 从日志总线获取日志
 from PySide6.QtCore import QThread, Signal as pyqtSignal
 
 from videotrans.configure import config
@@ -18,21 +16,10 @@ class SeparateWorker(QThread):
         self.out = out
         self.uuid = uuid
 
-    def getqueulog(self):
-        while 1:
-            if config.exit_soft:
-                return
-            if self.uuid in config.stoped_uuid_set:
-                return
-            q = config.uuid_logs_queue.get(self.uuid)
-            if not q:
-                continue
-            try:
-                data = q.get(True, 0.5)
-                if data:
-                    self.finish_event.emit('logs:' + data['text'])
-            except Exception:
-                pass
+    # 分离过程中的进度消息，发布时在发布线程中直接发出 Qt 信号
+    def _on_log(self, data):
+        if data and data.get('text'):
+            self.finish_event.emit('logs:' + data['text'])
 
     def run(self):
         try:
@@ -54,10 +41,12 @@ class SeparateWorker(QThread):
                 tools.runffmpeg(cmd)
                 self.file = newfile
             tools.set_process(uuid=self.uuid)
-            threading.Thread(target=self.getqueulog).start()
+            config.log_bus.subscribe(self.uuid, self._on_log)
             st.start(self.file, self.out, "win", uuid=self.uuid)
         except Exception as e:
             msg = f"separate vocal and background music:{str(e)}"
             self.finish_event.emit(msg)
         else:
             self.finish_event.emit('succeed')
+        finally:
+            config.log_bus.unsubscribe(self.uuid, self._on_log)
@@ -587,17 +587,22 @@ class TransCreate(BaseTask):
 
 
     # 分离音频 和 novoice.mp4
+    # 视频可直接复制时，无声视频与 m4a、分离用 wav、16k 识别音频在同一次 ffmpeg 中输出，源文件只读取一遍
+    # 视频需要转码时耗时较长，仍在后台线程中单独处理，不阻塞音频提取
     def _split_wav_novicemp4(self) -> None:
+        novoice_mp4 = None
         # 不是 提取字幕时，需要分离出视频
         if self.cfg['app_mode'] not in ['tiqu']:
             config.queue_novice[self.cfg['noextname']] = 'ing'
-            threading.Thread(
-                target=tools.split_novoice_byraw,
-                args=(self.cfg['name'],
-                      self.cfg['novoice_mp4'],
-                      self.cfg['noextname'],
-                      "copy" if self.is_copy_video else f"libx{self.video_codec_num}")).start()
-            if not self.is_copy_video:
+            if self.is_copy_video:
+                novoice_mp4 = self.cfg['novoice_mp4']
+            else:
+                threading.Thread(
+                    target=tools.split_novoice_byraw,
+                    args=(self.cfg['name'],
+                          self.cfg['novoice_mp4'],
+                          self.cfg['noextname'],
+                          f"libx{self.video_codec_num}")).start()
                 self.status_text = '视频需要转码，耗时可能较久..' if config.defaulelang == 'zh' else 'Video needs transcoded and take a long time..'
         else:
             config.queue_novice[self.cfg['noextname']] = 'end'
@@ -611,10 +616,15 @@ class TransCreate(BaseTask):
                     self.cfg['name'],
                     self.cfg['source_wav'],
                     True,
-                    uuid=self.uuid)
+                    uuid=self.uuid,
+                    novoice_mp4=novoice_mp4,
+                    noextname=self.cfg['noextname'])
             except Exception as e:
                 pass
             finally:
+                # 无声视频已随之输出，后续无需再次输出
+                if novoice_mp4 and config.queue_novice.get(self.cfg['noextname']) == 'end':
+                    novoice_mp4 = None
                 if not tools.vail_file(self.cfg['vocal']):
                     # 分离失败
                     self.cfg['instrument'] = None
@@ -629,10 +639,11 @@ class TransCreate(BaseTask):
         if not self.cfg['is_separate']:
             try:
                 self.status_text = config.transobj['kaishitiquyinpin']
-                tools.split_audio_byraw(self.cfg['name'], self.cfg['source_wav'])
-                # 需要识别
-                if self.shoud_recogn:
-                    tools.conver_to_16k(self.cfg['source_wav'], self.cfg['shibie_audio'])
+                # 需要识别时，同一次解码中同时输出16k待识别音频
+                tools.split_audio_byraw(self.cfg['name'], self.cfg['source_wav'], uuid=self.uuid,
+                                        recogn_audio=self.cfg['shibie_audio'] if self.shoud_recogn else None,
+                                        novoice_mp4=novoice_mp4,
+                                        noextname=self.cfg['noextname'])
             except Exception as e:
                 self._signal(text=str(e), type='error')
                 raise
@@ -666,7 +677,7 @@ class TransCreate(BaseTask):
             voice_role = self.cfg['voice_role']
             if line_roles and f'{it["line"]}' in line_roles:
                 voice_role = line_roles[f'{it["line"]}']
-            filename_md5=tools.get_md5(f"{self.cfg['tts_type']}-{it['start_time']}-{it['end_time']}-{voice_role}-{rate}-{self.cfg['volume']}-{self.cfg['pitch']}-{len(it['text'])}-{i}")
+            filename_md5=tools.get_md5(f"{self.cfg['tts_type']}-{it['start_time']}-{it['end_time']}-{voice_role}-{rate}-{self.cfg['volume']}-{self.cfg['pitch']}-{it['text']}-{i}")
             tmp_dict = {
                 "text": it['text'],
                 "ref_text": source_subs[i]['text'] if source_subs and i<len(source_subs) else '',
@@ -768,6 +779,7 @@ class TransCreate(BaseTask):
                 self.cfg['background_music']):
             try:
                 self.status_text = '添加背景音频' if config.defaulelang == 'zh' else 'Adding background audio'
+                tools.probe_files([self.cfg['target_wav'], self.cfg['background_music']])
                 # 获取视频长度
                 vtime = tools.get_audio_time(self.cfg['target_wav'])
                 # 获取背景音频长度
@@ -816,6 +828,7 @@ class TransCreate(BaseTask):
             try:
                 self.status_text = '重新嵌入背景音' if config.defaulelang == 'zh' else 'Re-embedded background sounds'
                 # 原始背景音乐 wav,和配音后的文件m4a合并
+                tools.probe_files([self.cfg['target_wav'], self.cfg['instrument']])
                 # 获取视频长度
                 vtime = tools.get_audio_time(self.cfg['target_wav'])
                 # 获取音频长度
@@ -991,9 +1004,6 @@ class TransCreate(BaseTask):
 
         self.precent = min(max(90, self.precent), 90)
 
-        protxt = config.TEMP_DIR + f"/compose{time.time()}.txt"
-        threading.Thread(target=self._hebing_pro, args=(protxt,)).start()
-
         # 字幕嵌入时进入视频目录下
         os.chdir(Path(self.cfg['novoice_mp4']).parent.resolve())
         if tools.vail_file(self.cfg['target_wav']):
@@ -1007,8 +1017,6 @@ class TransCreate(BaseTask):
                     # 需要配音+硬字幕
                     tools.runffmpeg([
                         "-y",
-                        "-progress",
-                        protxt,
                         "-i",
                         self.cfg['novoice_mp4'],
                         "-i",
@@ -1028,14 +1036,12 @@ class TransCreate(BaseTask):
                         '-preset',
                         config.settings['preset'],
                         Path(self.cfg['targetdir_mp4']).as_posix()
-                    ])
+                    ], on_progress=self._hebing_pro)
                 else:
                     # 配音+软字幕
                     self._signal(text=config.transobj['peiyin-ruanzimu'])
                     tools.runffmpeg([
                         "-y",
-                        "-progress",
-                        protxt,
                         "-i",
                         self.cfg['novoice_mp4'],
                         "-i",
@@ -1055,14 +1061,12 @@ class TransCreate(BaseTask):
                         "-movflags",
                         "+faststart",
                         Path(self.cfg['targetdir_mp4']).as_posix()
-                    ])
+                    ], on_progress=self._hebing_pro)
             elif self.cfg['voice_role'] != 'No':
                 # 有配音无字幕
                 self._signal(text=config.transobj['onlypeiyin'])
                 tools.runffmpeg([
                     "-y",
-                    "-progress",
-                    protxt,
                     "-i",
                     self.cfg['novoice_mp4'],
                     "-i",
@@ -1076,14 +1080,12 @@ class TransCreate(BaseTask):
                     "-movflags",
                     "+faststart",
                     Path(self.cfg['targetdir_mp4']).as_posix()
-                ])
+                ], on_progress=self._hebing_pro)
             # 硬字幕无配音  原始 wav 合并
             elif self.cfg['subtitle_type'] in [1, 3]:
                 self._signal(text=config.transobj['onlyyingzimu'])
                 cmd = [
                     "-y",
-                    "-progress",
-                    protxt,
                     "-i",
                     self.cfg['novoice_mp4']
                 ]
@@ -1109,15 +1111,13 @@ class TransCreate(BaseTask):
                     config.settings['preset'],
                     Path(self.cfg['targetdir_mp4']).as_posix(),
                 ]
-                tools.runffmpeg(cmd)
+                tools.runffmpeg(cmd, on_progress=self._hebing_pro)
             elif self.cfg['subtitle_type'] in [2, 4]:
                 # 无配音软字幕
                 self._signal(text=config.transobj['onlyruanzimu'])
                 # 原视频
                 cmd = [
                     "-y",
-                    "-progress",
-                    protxt,
                     "-i",
                     self.cfg['novoice_mp4']
                 ]
@@ -1148,7 +1148,7 @@ class TransCreate(BaseTask):
                     config.settings['preset']
                 ]
                 cmd.append(Path(self.cfg['targetdir_mp4']).as_posix())
-                tools.runffmpeg(cmd)
+                tools.runffmpeg(cmd, on_progress=self._hebing_pro)
         except Exception as e:
             msg = f'最后一步字幕配音嵌入时出错:{e}' if config.defaulelang == 'zh' else f'Error in embedding the final step of the subtitle dubbing:{e}'
             self._signal(text=msg, type='error')
@@ -1162,39 +1162,13 @@ class TransCreate(BaseTask):
         return True
 
     # ffmpeg进度日志
-    def _hebing_pro(self, protxt) -> None:
-        basenum = 100 - self.precent
-        video_time = self.video_time
-        while 1:
-            if self.precent >= 100:
-                return
-            if not os.path.exists(protxt):
-                time.sleep(1)
-                continue
-            with open(protxt, 'r', encoding='utf-8') as f:
-                content = f.read().strip().split("\n")
-                if content[-1] == 'progress=end':
-                    return
-                idx = len(content) - 1
-                end_time = "00:00:00"
-                while idx > 0:
-                    if content[idx].startswith('out_time='):
-                        end_time = content[idx].split('=')[1].strip()
-                        break
-                    idx -= 1
-                try:
-                    h, m, s = end_time.split(':')
-                except Exception:
-                    time.sleep(1)
-                    continue
-                else:
-                    h, m, s = end_time.split(':')
-                    precent = round((int(h) * 3600000 + int(m) * 60000 + int(s[:2]) * 1000) * basenum / video_time, 2)
-                    if self.precent + 0.1 < 99:
-                        self.precent += 0.1
-                    else:
-                        self._signal(text=config.transobj['kaishihebing'] + f' -> {precent * 100}%')
-                    time.sleep(1)
+    # 合成进度回调，ms 为 ffmpeg 已处理的毫秒数，映射到 90~99%
+    def _hebing_pro(self, ms) -> None:
+        if not self.video_time or self.precent >= 100:
+            return
+        precent = min(round(ms * 100 / self.video_time, 2), 100)
+        self.precent = max(self.precent, min(90 + precent * 0.09, 99))
+        self._signal(text=config.transobj['kaishihebing'] + f' -> {precent}%')
 
     # 创建说明txt
     def _create_txt(self) -> None:
@@ -2,7 +2,6 @@
 import re
 from typing import Union, List
 
-import requests
 
 from videotrans.configure import config
 from videotrans.translator._base import BaseTrans
@@ -31,7 +30,7 @@ class AI302(BaseTrans):
                  'content': self.prompt.replace('<INPUT></INPUT>',f'<INPUT>{text}</INPUT>')},
             ]
         }
-        response = requests.post('https://api.302.ai/v1/chat/completions', headers={
+        response = self._http_session().post('https://api.302.ai/v1/chat/completions', headers={
                 'Accept': 'application/json',
                 'Authorization': f'Bearer {config.params["ai302_key"]}',
                 'User-Agent': 'pyvideotrans',
@@ -63,7 +62,7 @@ class AI302(BaseTrans):
                  'content': prompt},
             ]
         }
-        response = requests.post('https://api.302.ai/v1/chat/completions', headers={
+        response = self._http_session().post('https://api.302.ai/v1/chat/completions', headers={
                 'Accept': 'application/json',
                 'Authorization': f'Bearer {config.params["ai302_key"]}',
                 'User-Agent': 'pyvideotrans',
@@ -2,7 +2,7 @@
 import re
 from typing import Union, List
 
-import httpx,requests
+import requests
 from openai import AzureOpenAI, APIConnectionError
 
 from videotrans.configure import config
@@ -22,10 +22,9 @@ class AzureGPT(BaseTrans):
         
     def _check_proxy(self):
         try:
-            c=httpx.Client(proxy=None)
-            c.get(config.params["azure_api"])
+            self._http_client().get(config.params["azure_api"])
         except Exception as e:
-            pro = self._set_proxy(type='set')
+            pro = self._get_proxy()
             if pro:
                 self.proxies = pro
 
@@ -36,7 +35,7 @@ class AzureGPT(BaseTrans):
             api_key=config.params["azure_key"],
             api_version=config.params['azure_version'],
             azure_endpoint=config.params["azure_api"],
-            http_client=httpx.Client(proxy=self.proxies)
+            http_client=self._http_client(self.proxies)
         )
         text="\n".join([i.strip() for i in data]) if isinstance(data,list) else data
         message = [
@@ -77,7 +76,7 @@ class AzureGPT(BaseTrans):
             api_key=config.params["azure_key"],
             api_version=config.params['azure_version'],
             azure_endpoint=config.params["azure_api"],
-            http_client=httpx.Client(proxy=self.proxies)
+            http_client=self._http_client(self.proxies)
         )
         message = [
             {'role': 'system',
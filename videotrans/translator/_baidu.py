@@ -3,7 +3,6 @@ import hashlib
 import time
 from typing import Union, List
 
-import requests
 
 from videotrans.configure import config
 from videotrans.translator._base import BaseTrans
@@ -31,7 +30,7 @@ class Baidu(BaseTrans):
         requrl = f"http://api.fanyi.baidu.com/api/trans/vip/translate?q={text}&from=auto&to={tocode}&appid={config.params['baidu_appid']}&salt={salt}&sign={sign}"
 
         config.logger.info(f'[Baidu]请求数据:{requrl=}')
-        resraw = requests.get(requrl, proxies={"http": "", "https": ""})
+        resraw = self._http_session().get(requrl, proxies={"http": "", "https": ""})
         if resraw.status_code != 200:
             raise Exception(f'Baidu status_code={resraw.status_code} {resraw.reason}')
         res = resraw.json()
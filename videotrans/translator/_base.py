@@ -1,5 +1,6 @@
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 from typing import Union, List
 
@@ -8,7 +9,9 @@ import requests
 from videotrans.configure import config
 from videotrans.configure._base import BaseCon
 from videotrans.configure._except import IPLimitExceeded
+from videotrans.translator._cache import get_trans_cache, make_key
 from videotrans.util import tools
+from videotrans.util.rate_limit import get_bucket
 
 
 class BaseTrans(BaseCon):
@@ -59,6 +62,14 @@ class BaseTrans(BaseCon):
         self.split_source_text = []
         self.proxies = None
         self.model_name=""
+        self.trans_cache = get_trans_cache()
+        self._cache_ns = ''
+        # 同时请求的组数
+        self.concurrency = int(float(config.settings.get('trans_concurrency', 1)))
+        # 同一渠道共用的令牌桶，trans_rpm 为每分钟最多请求数，0不限制
+        self.bucket = get_bucket(self.__class__.__name__,
+                                 rate=float(config.settings.get('trans_rpm', 0)) / 60,
+                                 capacity=max(1, self.concurrency))
 
     # 发出请求获取内容 data=[text1,text2,text] | text
     def _item_task(self, data: Union[List[str], str]) -> str:
@@ -73,121 +84,65 @@ class BaseTrans(BaseCon):
     def run(self) -> Union[List, str, None]:
         # 开始对分割后的每一组进行处理
         self._signal(text="")
-        if self.is_srt:
-            source_text = [t['text'] for t in self.text_list] if not self.aisendsrt else self.text_list
-            self.split_source_text = [source_text[i:i + self.trans_thread] for i in  range(0, len(self.text_list), self.trans_thread)]
-        else:
-            source_text = self.text_list.strip().split("\n")
-            self.split_source_text = [source_text[i:i + self.trans_thread] for i in  range(0, len(source_text), self.trans_thread)]
-
         if self.is_srt and self.aisendsrt:
+            self.split_source_text = [self.text_list[i:i + self.trans_thread] for i in  range(0, len(self.text_list), self.trans_thread)]
             return self.runsrt()
-            """
-            return_raw_list=self.runsrt()
-            if len(return_raw_list)!=len(self.text_list) and self.trans_thread>1:
-                self.trans_thread=1
-                source_text = [t['text'] for t in self.text_list] if not self.aisendsrt else self.text_list
-                self.split_source_text = [source_text[i:i + self.trans_thread] for i in  range(0, len(self.text_list), self.trans_thread)]
-                return_raw_list=self.runsrt()
-            return return_raw_list
-            """
 
-        for i, it in enumerate(self.split_source_text):
-            # 失败后重试 self.retry 次
-            while 1:
-                if self._exit():
-                    return
-                if self.iter_num > self.retry:
-                    msg = f'{"字幕翻译失败" if config.defaulelang == "zh" else " Translation Subtitles error"},{self.error}'
-                    self._signal(text=msg, type="error")
-                    raise Exception(msg)
+        if self.is_srt:
+            source_text = [t['text'] for t in self.text_list]
+        else:
+            source_text = self.text_list.strip().split("\n")
 
-                self.iter_num += 1
-                if self.iter_num > 1:
-                    if self.error_code==429:
-                        msg='429 超出api每分钟频率限制，暂停60s后重试' if config.defaulelang=='zh' else '429 Exceeded the frequency limit of the api per minute, pause for 60s and retry'
-                        self._signal(text=msg)
-                        if self.inst and self.inst.status_text:
-                            self.inst.status_text=msg
-                        time.sleep(60)
-                    else:
-                        self._signal(
-                            text=f"第{self.iter_num}次出错，{self.wait_sec}s后重试," if config.defaulelang == 'zh' else f'{self.iter_num} retries occurs, {self.wait_sec}s later retry')
-                        time.sleep(self.wait_sec)
+        # 逐行查询缓存，只发送未命中的行
+        keys = [self._cache_key(t) for t in source_text]
+        cached = {} if self.is_test else self.trans_cache.get_many(keys)
+        missing = [i for i, k in enumerate(keys) if k not in cached]
+        if cached:
+            self._signal(text="\n".join(cached[k] for k in keys if k in cached) + "\n", type='subtitle')
+        # 各组对应的原始行号
+        group_index = [missing[i:i + self.trans_thread] for i in range(0, len(missing), self.trans_thread)]
+        self.split_source_text = [[source_text[j] for j in idx] for idx in group_index]
+        translated = {}
 
-                try:
-                    result = self._get_cache(it)
-                    if not result:
-                        result = tools.cleartext(self._item_task(it))
-                        self._set_cache(it, result)
-                    if self.inst and self.inst.precent < 75:
-                        self.inst.precent += 0.01
-                    # 非srt直接break
-                    if not self.is_srt:
-                        self.target_list.append(result)
-                        self.iter_num = 0
-                        self.error = ''
-                        break
-                    sep_res = result.split("\n")
-                    raw_len = len(it)
-                    sep_len = len(sep_res)
+        def _task(it):
+            result = tools.cleartext(self._item_task(it))
+            if self.inst and self.inst.precent < 75:
+                self.inst.precent += 0.01
+            return result
 
-                    # 如果返回数量和原始语言数量不一致，则重新切割
-                    '''
-                    if sep_len + 1 < raw_len:
-                        sep_res = []
-                        for it_n in it:
-                            time.sleep(self.wait_sec)
-                            t = self._get_cache(it_n)
-                            if not t:
-                                t = tools.cleartext(self._item_task(it_n))
-                                self._set_cache(it_n, t)
-                            self._signal(
-                                text=t + "\n",
-                                type='subtitle')
-                            sep_res.append(t)
-                    '''
+        def _on_result(i, it, result):
+            sep_res = result.split("\n")
+            idx = group_index[i]
+            # 返回行数与发送行数不一致时无法逐行对应，不写入缓存
+            if len(sep_res) != len(it):
+                if not self.is_srt:
+                    # 非字幕直接保留整段
+                    translated[idx[0]] = result
+                    for j in idx[1:]:
+                        translated[j] = None
+                    return
+            elif not self.is_test:
+                self.trans_cache.set_many([(keys[j], sep_res[x].strip()) for x, j in enumerate(idx)])
+            for x, j in enumerate(idx):
+                translated[j] = sep_res[x].strip() if x < len(sep_res) else ""
+                if x < len(sep_res) and self.is_srt:
+                    self._signal(
+                        text=sep_res[x] + "\n",
+                        type='subtitle')
+                    self._signal(
+                        text=config.transobj['starttrans'] + f' {j + 1} ')
 
-                    for x, result_item in enumerate(sep_res):
-                        if x < len(it):
-                            self.target_list.append(result_item.strip())
-                            self._signal(
-                                text=result_item + "\n",
-                                type='subtitle')
-                            self._signal(
-                                text=config.transobj['starttrans'] + f' {i * self.trans_thread + x + 1} ')
-                    if len(sep_res) < len(it):
-                        tmp = ["" for x in range(len(it) - len(sep_res))]
-                        self.target_list += tmp
-                except requests.exceptions.ProxyError as e:
-                    proxy=None if not self.proxies else f'{list(self.proxies.values())[0]}'
-                    raise Exception(f'代理错误请检查:{proxy=} {e}')
-                except (requests.ConnectionError, requests.exceptions.RetryError, requests.Timeout) as e:
-                    msg=''
-                    if self.api_url:
-                        msg = f'无法连接当前API:{self.api_url} ' if config.defaulelang == 'zh' else f'Check API:{self.api_url} '
-                    raise IPLimitExceeded(msg=msg+str(e), name=self.__class__.__name__)
-                except Exception as e:
-                    self.error = f'{e}'
-                    config.logger.exception(e, exc_info=True)
-                else:
-                    # 成功 未出错
-                    self.error = ''
-                    self.error_code=0
-                    self.iter_num = 0
-                    if self.inst and self.inst.status_text:
-                        self.inst.status_text='字幕翻译中' if config.defaulelang=='zh' else 'Translation of subtitles'
-                finally:
-                    time.sleep(self.wait_sec)
-                if self.iter_num == 0:
-                    # 未出错跳过while
-                    break
+        if not self._dispatch(_task, _on_result, f'{"字幕翻译失败" if config.defaulelang == "zh" else " Translation Subtitles error"}'):
+            return
+        if not self.is_test:
+            config.logger.info(f'翻译缓存:命中{len(cached)}行，请求{len(missing)}行，{self.trans_cache.stats()}')
+        self.target_list = [cached[k] if k in cached else translated.get(i, "") for i, k in enumerate(keys)]
         # 恢复原代理设置
         if self.shound_del:
             self._set_proxy(type='del')
         # text_list是字符串
         if not self.is_srt:
-            return "\n".join(self.target_list)
+            return "\n".join(t for t in self.target_list if t is not None)
 
         max_i = len(self.target_list)
         # 出错次数大于原一半
@@ -206,81 +161,35 @@ class BaseTrans(BaseCon):
     # 发送完整字幕格式内容进行翻译
     def runsrt(self):
         result_srt_str_list = []
-        for i, it in enumerate(self.split_source_text):
-            # 失败后重试 self.retry 次
-            while 1:
-                if self._exit():
-                    return
-                if self.iter_num > self.retry:
-                    msg = f'{"字幕翻译阶段失败" if config.defaulelang == "zh" else " Translate subtitles error "},{self.error}'
-                    self._signal(text=msg, type="error")
-                    raise Exception(msg)
 
-                self.iter_num += 1
-                if self.iter_num > 1:
-                    if self.error_code==429:
-                        msg='429 超出api每分钟频率限制，暂停60s后重试' if config.defaulelang=='zh' else '429 Exceeded the frequency limit of the api per minute, pause for 60s and retry'
-                        self._signal(text=msg)
-                        if self.inst and self.inst.status_text:
-                            self.inst.status_text=msg
-                        time.sleep(60)
-                    else:
-                        self._signal(
-                            text=f"第{self.iter_num}次出错，{self.wait_sec} s后重试," if config.defaulelang == 'zh' else f'{self.iter_num} retries occurs, {self.wait_sec}s later retry')
-                        time.sleep(self.wait_sec)
+        def _task(it):
+            for j,srt in enumerate(it):
+                srt['text']=srt['text'].strip().replace("\n"," ")
+                it[j]=srt
+            srt_str = "\n\n".join(
+                [f"{srtinfo['line']}\n{srtinfo['time']}\n{srtinfo['text'].strip()}" for srtinfo in it])
+            result = self._get_cache(srt_str)
+            if not result:
+                result = tools.cleartext(self._item_task(srt_str))
+                if not result.strip():
+                    raise Exception('无返回翻译结果' if config.defaulelang == 'zh' else 'Translate result is empty')
+                self._set_cache(srt_str, result)
 
-                try:
-                    for j,srt in enumerate(it):
-                        srt['text']=srt['text'].strip().replace("\n"," ")
-                        it[j]=srt
-                    srt_str = "\n\n".join(
-                        [f"{srtinfo['line']}\n{srtinfo['time']}\n{srtinfo['text'].strip()}" for srtinfo in it])
-                    result = self._get_cache(srt_str)
-                    if not result:                        
-                        result = tools.cleartext(self._item_task(srt_str))
-                        if not result.strip():
-                            raise Exception('无返回翻译结果' if config.defaulelang == 'zh' else 'Translate result is empty')
-                        self._set_cache(it, result)
+            if self.inst and self.inst.precent < 75:
+                self.inst.precent += 0.1
+            return result
 
-                    if self.inst and self.inst.precent < 75:
-                        self.inst.precent += 0.1
+        def _on_result(i, it, result):
+            self._signal(text=result, type='subtitle')
+            result_srt_str_list.append(result)
 
-                    self._signal(text=result, type='subtitle')
-                    result_srt_str_list.append(result)
-                except requests.exceptions.ProxyError as e:
-                    proxy=None if not self.proxies else f'{list(self.proxies.values())[0]}'
-                    raise Exception(f'代理错误请检查:{proxy=} {e}')
-                except (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError) as e:
-                    msg=''
-                    if self.api_url:
-                        msg = f'无法连接当前API:{self.api_url} ' if config.defaulelang == 'zh' else f'Check API:{self.api_url} '
-                    raise IPLimitExceeded(msg=msg+str(e), name=self.__class__.__name__)
-                except Exception as e:
-                    self.error = f'{e}'
-                    config.logger.exception(e, exc_info=True)
-                else:
-                    # 成功 未出错
-                    self.error = ''
-                    self.error_code=0
-                    self.iter_num = 0
-                    if self.inst and self.inst.status_text:
-                        self.inst.status_text='字幕翻译中' if config.defaulelang=='zh' else 'Translation of subtitles'
-                finally:
-                    time.sleep(self.wait_sec)
-                if self.iter_num == 0:
-                    # 未出错跳过while
-                    break
+        if not self._dispatch(_task, _on_result, f'{"字幕翻译阶段失败" if config.defaulelang == "zh" else " Translate subtitles error "}'):
+            return
 
         # 恢复原代理设置
         if self.shound_del:
             self._set_proxy(type='del')
         raws_list=tools.get_subtitle_from_srt("\n\n".join(result_srt_str_list), is_file=False)
-        ## new 
-        
-            
-        
-        #if not self.refine3:
-        #    return raws_list
         config.logger.info(f'{raws_list=}\n{result_srt_str_list=}\n')
         for i,it in enumerate(raws_list):
             it['text']=it['text'].strip().split("\n")
@@ -292,10 +201,97 @@ class BaseTrans(BaseCon):
                 it['text']=it['text'][:-1]
             raws_list[i]=it
         return raws_list
-        
 
+    def _dispatch(self, task, on_result, error_title) -> bool:
+        """
+        并发发送 split_source_text 中的各组，同时最多 trans_concurrency 组在请求中
+        同一渠道共用令牌桶限速，结果按原顺序依次交给 on_result(i, it, result)
+        停止时返回 False，某组重试 retry 次后仍失败则抛出异常
+        """
+        total = len(self.split_source_text)
+        workers = max(1, min(self.concurrency, total))
+        if workers == 1:
+            for i, it in enumerate(self.split_source_text):
+                result = self._run_batch(task, it, error_title)
+                if result is None:
+                    return False
+                on_result(i, it, result)
+            return True
 
+        results = {}
+        next_i = 0
+        pool = ThreadPoolExecutor(max_workers=workers)
+        futures = {pool.submit(self._run_batch, task, it, error_title): i for i, it in enumerate(self.split_source_text)}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for fu in done:
+                    result = fu.result()
+                    if result is None:
+                        return False
+                    results[futures[fu]] = result
+                # 按顺序输出已完成的连续部分
+                while next_i in results:
+                    on_result(next_i, self.split_source_text[next_i], results.pop(next_i))
+                    next_i += 1
+            return True
+        finally:
+            for fu in pending:
+                fu.cancel()
+            pool.shutdown(wait=False)
+
+    # 发送一组，失败后重试 self.retry 次，停止时返回 None
+    def _run_batch(self, task, it, error_title):
+        iter_num = 0
+        error = ''
+        while 1:
+            if self._exit():
+                return None
+            if iter_num > self.retry:
+                msg = f'{error_title},{error}'
+                self._signal(text=msg, type="error")
+                raise Exception(msg)
 
+            iter_num += 1
+            if iter_num > 1:
+                self._signal(
+                    text=f"第{iter_num}次出错，{self.wait_sec}s后重试," if config.defaulelang == 'zh' else f'{iter_num} retries occurs, {self.wait_sec}s later retry')
+                time.sleep(self.wait_sec)
+            if not self.bucket.acquire(stop=self._exit):
+                return None
+
+            try:
+                result = task(it)
+            except requests.exceptions.ProxyError as e:
+                proxy=None if not self.proxies else f'{list(self.proxies.values())[0]}'
+                raise Exception(f'代理错误请检查:{proxy=} {e}')
+            except (requests.ConnectionError, requests.exceptions.RetryError, requests.Timeout) as e:
+                msg=''
+                if self.api_url:
+                    msg = f'无法连接当前API:{self.api_url} ' if config.defaulelang == 'zh' else f'Check API:{self.api_url} '
+                raise IPLimitExceeded(msg=msg+str(e), name=self.__class__.__name__)
+            except Exception as e:
+                error = f'{e}'
+                self.error = error
+                config.logger.exception(e, exc_info=True)
+                if self.error_code == 429 or str(e).find('429') > -1:
+                    # 频率限制，暂停该渠道所有请求
+                    self.error_code = 0
+                    sec = self.bucket.backoff()
+                    msg=f'429 超出api每分钟频率限制，暂停{sec}s后重试' if config.defaulelang=='zh' else f'429 Exceeded the frequency limit of the api per minute, pause for {sec}s and retry'
+                    self._signal(text=msg)
+                    if self.inst and self.inst.status_text:
+                        self.inst.status_text=msg
+            else:
+                # 成功 未出错
+                self.error = ''
+                self.bucket.success()
+                if self.inst and self.inst.status_text:
+                    self.inst.status_text='字幕翻译中' if config.defaulelang=='zh' else 'Translation of subtitles'
+                return result
+            finally:
+                time.sleep(self.wait_sec)
 
     def _refine3_prompt(self):
         glossary=''
@@ -314,25 +310,25 @@ class BaseTrans(BaseCon):
         
         return prompt
 
+    # 缓存命名空间，渠道、模型、语言、提示词任一变化都不会命中旧结果
+    def _cache_namespace(self):
+        prompt = getattr(self, 'prompt', '') or ''
+        return json.dumps([self.__class__.__name__, self.model_name, self.source_code, self.target_code,
+                           self.target_language_name, self.is_srt, self.aisendsrt, self.refine3,
+                           tools.get_md5(prompt)], ensure_ascii=False)
+
+    def _cache_key(self, it):
+        if not self._cache_ns:
+            self._cache_ns = self._cache_namespace()
+        return make_key(self._cache_ns, it if isinstance(it, str) else json.dumps(it, ensure_ascii=False))
+
+    # 整组的缓存，发送完整字幕时使用
     def _set_cache(self, it, res_str):
-        if not res_str.strip():
+        if self.is_test or not res_str.strip():
             return
-        key_cache = self._get_key(it)
-
-        file_cache = config.TEMP_DIR + f'/translate_cache/{key_cache}.txt'
-        if not Path(config.TEMP_DIR + f'/translate_cache').is_dir():
-            Path(config.TEMP_DIR + f'/translate_cache').mkdir(parents=True, exist_ok=True)
-        Path(file_cache).write_text(res_str, encoding='utf-8')
+        self.trans_cache.set(self._cache_key(it), res_str)
 
     def _get_cache(self, it):
         if self.is_test:
             return None
-        key_cache = self._get_key(it)
-        file_cache = config.TEMP_DIR + f'/translate_cache/{key_cache}.txt'
-        if Path(file_cache).exists():
-            return Path(file_cache).read_text(encoding='utf-8')
-        return None
-
-    def _get_key(self, it):
-        Path(config.TEMP_DIR + '/translate_cache').mkdir(parents=True, exist_ok=True)
-        return tools.get_md5(f'{self.__class__.__name__}-{self.api_url}-{self.trans_thread}-{self.retry}-{self.wait_sec}-{self.iter_num}-{self.is_srt}-{self.aisendsrt}-{self.refine3}-{self.proxies}-{self.model_name}-{self.source_code}-{self.target_code}-{it if isinstance(it, str) else json.dumps(it)}')
+        return self.trans_cache.get(self._cache_key(it))
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+翻译结果缓存，单个 SQLite 文件 cache/translate_cache.db，不随退出时清理 tmp 而删除
+
+以 渠道/模型/源语言/目标语言/提示词哈希 + 规范化后的原文 为键，逐行保存译文，
+重新翻译部分修改过的字幕时，只有改动的行需要请求
+超过 trans_cache_days 天未使用的条目、以及超过 trans_cache_mb 上限时最久未使用的条目会被删除
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+from videotrans.configure import config
+
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', str(text)).strip()
+
+
+def make_key(namespace, text):
+    return hashlib.md5(f'{namespace}\n{normalize(text)}'.encode('utf-8')).hexdigest()
+
+
+class TransCache:
+    # 每写入多少条检查一次淘汰
+    EVICT_EVERY = 500
+
+    def __init__(self, path=None):
+        self.path = path or config.CACHE_DIR + '/translate_cache.db'
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS trans (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS trans_accessed ON trans(accessed)')
+        self._conn.commit()
+        self.evict()
+
+    def get_many(self, keys):
+        """
+        批量查询，返回 {key: value}，只包含命中的
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f'SELECT key, value FROM trans WHERE key IN ({",".join("?" * len(part))})', part).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany('UPDATE trans SET accessed=? WHERE key=?', [(now, k) for k in found])
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items):
+        now = time.time()
+        rows = [(k, v, len(v.encode('utf-8')), now) for k, v in items if v and v.strip()]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO trans (key, value, size, accessed) VALUES (?,?,?,?)', rows)
+            self._conn.commit()
+            self._writes += len(rows)
+            need_evict = self._writes >= self.EVICT_EVERY
+        if need_evict:
+            self.evict()
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def evict(self):
+        days = float(config.settings.get('trans_cache_days', 30))
+        max_bytes = float(config.settings.get('trans_cache_mb', 200)) * 1024 * 1024
+        with self._lock:
+            self._writes = 0
+            if days > 0:
+                self._conn.execute('DELETE FROM trans WHERE accessed<?', (time.time() - days * 86400,))
+            if max_bytes > 0:
+                total = self._conn.execute('SELECT COALESCE(SUM(size),0) FROM trans').fetchone()[0]
+                if total > max_bytes:
+                    # 删除最久未用的，直到降到上限的 90%
+                    removed = 0
+                    drop = []
+                    for key, size in self._conn.execute('SELECT key, size FROM trans ORDER BY accessed'):
+                        if total - removed <= max_bytes * 0.9:
+                            break
+                        drop.append((key,))
+                        removed += size
+                    self._conn.executemany('DELETE FROM trans WHERE key=?', drop)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM trans')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size),0) FROM trans').fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_trans_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TransCache()
+        return _cache
+
+
+# 退出时关闭连接，避免 Windows 下文件被占用
+def close_trans_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            try:
+                _cache.close()
+            except Exception:
+                pass
+            _cache = None
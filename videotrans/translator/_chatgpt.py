@@ -3,7 +3,7 @@ import re,math,time
 from pathlib import Path
 from typing import Union, List
 
-import httpx,requests,json
+import requests,json
 from openai import OpenAI, APIConnectionError, APIError,RateLimitError
 
 from videotrans.configure import config
@@ -43,7 +43,7 @@ class ChatGPT(BaseTrans):
             ]
             #config.logger.info(f'{prompts=}')
             model = OpenAI(api_key=config.params['chatgpt_key'], base_url=self.api_url,
-                           http_client=httpx.Client(proxy=self.proxies,timeout=7200))
+                           http_client=self._http_client(self.proxies, timeout=7200))
             try:
                 msg=f'第{batch_num}批次 LLM断句，每批次 {chunk_size} 个字或单词' if config.defaulelang=='zh' else f'Start sending {batch_num} batches of LLM segments, {chunk_size} words per batch'
                 config.logger.info(msg)
@@ -113,7 +113,7 @@ class ChatGPT(BaseTrans):
         if re.search('localhost', self.api_url) or re.match(r'^https?://(\d+\.){3}\d+(:\d+)?', self.api_url):
             self.proxies=None
             return
-        pro = self._set_proxy(type='set')
+        pro = self._get_proxy()
         if pro:
             self.proxies = pro
 
@@ -151,7 +151,7 @@ class ChatGPT(BaseTrans):
 
         config.logger.info(f"\n[chatGPT]发送请求数据:{message=}")
         model = OpenAI(api_key=config.params['chatgpt_key'], base_url=self.api_url,
-                       http_client=httpx.Client(proxy=self.proxies,timeout=7200))
+                       http_client=self._http_client(self.proxies, timeout=7200))
         try:
             response = model.chat.completions.create(
                 model='gpt-4o-mini' if config.params['chatgpt_model'].lower().find('gpt-3.5') > -1 else config.params['chatgpt_model'],
@@ -197,7 +197,7 @@ class ChatGPT(BaseTrans):
 
         config.logger.info(f"\n[chatGPT]发送请求数据:{message=}")
         model = OpenAI(api_key=config.params['chatgpt_key'], base_url=self.api_url,
-                       http_client=httpx.Client(proxy=self.proxies,timeout=7200))
+                       http_client=self._http_client(self.proxies, timeout=7200))
         try:
             response = model.chat.completions.create(
                 model=config.params['chatgpt_model'],
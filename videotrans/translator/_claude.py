@@ -3,7 +3,6 @@ import re
 from typing import Union, List
 
 import anthropic
-import httpx
 from videotrans.configure import config
 from videotrans.translator._base import BaseTrans
 from videotrans.util import tools
@@ -28,7 +27,7 @@ class Claude(BaseTrans):
         if re.search('localhost', self.api_url) or re.match(r'^https?://(\d+\.){3}\d+(:\d+)?', self.api_url):
             return
 
-        pro = self._set_proxy(type='set')
+        pro = self._get_proxy()
         if pro:
             self.proxies =  pro
 
@@ -65,7 +64,7 @@ class Claude(BaseTrans):
         client = anthropic.Anthropic(
             base_url=self._get_url(),
             api_key=config.params['claude_key'],
-            http_client=httpx.Client(proxy=self.proxies)
+            http_client=self._http_client(self.proxies)
         )
         try:
             response = client.messages.create(
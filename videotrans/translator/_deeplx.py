@@ -3,7 +3,6 @@ import json
 import re
 from typing import Union, List
 
-import requests
 
 from videotrans.configure import config
 from videotrans.translator._base import BaseTrans
@@ -27,7 +26,7 @@ class DeepLX(BaseTrans):
                 self.api_url+=f"?key={key}"
             
         if not re.search(r'localhost', url) and not re.match(r'https?://(\d+\.){3}\d+', url):
-            pro = self._set_proxy(type='set')
+            pro = self._get_proxy()
             if pro:
                 self.proxies = {"https": pro, "http": pro}
         else:
@@ -49,7 +48,7 @@ class DeepLX(BaseTrans):
             "target_lang": target_code
         }
         config.logger.info(f'[DeepLX]发送请求数据,{jsondata=}')
-        response = requests.post(url=self.api_url, json=jsondata, proxies=self.proxies)
+        response = self._http_session().post(url=self.api_url, json=jsondata, proxies=self.proxies)
         if response.status_code != 200:
             raise Exception(f'DeepLx: status_code={response.status_code} {response.reason} {response.text}')
         config.logger.info(f'[DeepLX]返回响应,{response.text=}')
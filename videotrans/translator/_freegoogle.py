@@ -4,7 +4,6 @@ import time
 from typing import Union, List
 from urllib.parse import quote
 
-import requests
 
 from videotrans.configure import config
 from videotrans.translator._base import BaseTrans
@@ -17,7 +16,7 @@ class FreeGoogle(BaseTrans):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # self.aisendsrt=False
-        pro = self._set_proxy(type='set')
+        pro = self._get_proxy()
         if pro:
             self.proxies = {"https": pro, "http": pro}
 
@@ -29,7 +28,7 @@ class FreeGoogle(BaseTrans):
             'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1'
         }
 
-        response = requests.get(url, headers=headers, timeout=300, proxies=self.proxies, verify=False)
+        response = self._http_session().get(url, headers=headers, timeout=300, proxies=self.proxies, verify=False)
         config.logger.info(f'[Google]返回数据:{response.text=}')
         if response.status_code == 429:
             self._signal(text='Google 429 hold on retry')
@@ -52,7 +51,7 @@ class FreeGoogle(BaseTrans):
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=300, proxies=self.proxies)
+        response = self._http_session().get(url, headers=headers, timeout=300, proxies=self.proxies)
         config.logger.info(f'[Google]返回数据:{response.text=}')
         if response.status_code == 429:
             self._signal(text='Google 429 hold on retry')
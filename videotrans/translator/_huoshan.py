@@ -2,7 +2,6 @@
 import re
 from typing import Union, List
 
-import requests
 from requests import JSONDecodeError
 
 from videotrans.configure import config
@@ -36,7 +35,7 @@ class HuoShan(BaseTrans):
                 "model": config.params['zijiehuoshan_model'],
                 "messages": message
             }
-            resp = requests.post("https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+            resp = self._http_session().post("https://ark.cn-beijing.volces.com/api/v3/chat/completions",
                                  proxies=self.proxies, json=req, headers={
                     "Accept": "application/json",
                     "Content-Type": "application/json",
@@ -77,7 +76,7 @@ class HuoShan(BaseTrans):
                 "model": config.params['zijiehuoshan_model'],
                 "messages": message
             }
-            resp = requests.post("https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+            resp = self._http_session().post("https://ark.cn-beijing.volces.com/api/v3/chat/completions",
                                  proxies=self.proxies, json=req, headers={
                     "Accept": "application/json",
                     "Content-Type": "application/json",
@@ -3,7 +3,6 @@ import json
 import re
 from typing import Union, List
 
-import requests
 
 from videotrans.configure import config
 from videotrans.translator._base import BaseTrans
@@ -23,7 +22,7 @@ class Libre(BaseTrans):
 
             
         if not re.search(r'localhost', url) and not re.match(r'https?://(\d+\.){3}\d+', url):
-            pro = self._set_proxy(type='set')
+            pro = self._get_proxy()
             if pro:
                 self.proxies = {"https": pro, "http": pro}
         else:
@@ -38,7 +37,7 @@ class Libre(BaseTrans):
         }
         config.logger.info(f'[Libre]发送请求数据,{jsondata=}')
 
-        response = requests.post(url=self.api_url, json=jsondata, proxies=self.proxies)
+        response = self._http_session().post(url=self.api_url, json=jsondata, proxies=self.proxies)
         config.logger.info(f'[libre]返回响应,{response.text=}')
         if response.status_code != 200:
             raise Exception(f'Libre: status_code={response.status_code} {response.reason} {response.text}')
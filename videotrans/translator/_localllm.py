@@ -2,7 +2,7 @@
 import re
 from typing import Union, List
 
-import httpx,requests
+import requests
 from openai import OpenAI, APIConnectionError, APIError
 
 from videotrans.configure import config
@@ -27,16 +27,15 @@ class LocalLLM(BaseTrans):
         if re.search('localhost', self.api_url) or re.match(r'^https?://(\d+\.){3}\d+(:\d+)?', self.api_url):
             return
         try:
-            c=httpx.Client(proxy=None)
-            c.get(self.api_url)
+            self._http_client().get(self.api_url)
         except Exception as e:
-            pro = self._set_proxy(type='set')
+            pro = self._get_proxy()
             if pro:
                 self.proxies =  pro
                 
     def _item_task(self, data: Union[List[str], str]) -> str:
         model = OpenAI(api_key=config.params['localllm_key'], base_url=self.api_url,
-                       http_client=httpx.Client(proxy=self.proxies))
+                       http_client=self._http_client(self.proxies))
         text="\n".join([i.strip() for i in data]) if isinstance(data,list) else data
         message = [
             {'role': 'system',
@@ -14,7 +14,7 @@ class Microsoft(BaseTrans):
         super().__init__(*args, **kwargs)
         self.aisendsrt=False
         self.auth = ""
-        pro = self._set_proxy(type='set')
+        pro = self._get_proxy()
         if pro:
             self.proxies = {"https": pro, "http": pro}
 
@@ -27,7 +27,7 @@ class Microsoft(BaseTrans):
             auth_num -= 1
             try:
                 if not self.auth:
-                    self.auth = requests.get('https://edge.microsoft.com/translate/auth', headers=headers,
+                    self.auth = self._http_session().get('https://edge.microsoft.com/translate/auth', headers=headers,
                                              proxies=self.proxies,verify=False)
                     if self.auth.status_code!=200:
                         raise Exception(f'[Mircosoft]:status_code={self.auth.status_code} {self.auth.reason}')
@@ -48,7 +48,7 @@ class Microsoft(BaseTrans):
         url = f"https://api-edge.cognitive.microsofttranslator.com/translate?from=&to={tocode}&api-version=3.0&includeSentenceLength=true"
         headers['Authorization'] = f"Bearer {self.auth.text}"
         config.logger.info(f'[Mircosoft]请求数据:{url=},{self.auth.text=}')
-        response = requests.post(url, json=[{"Text": "\n".join(data)}], proxies=self.proxies, headers=headers,verify=False,  timeout=300)
+        response = self._http_session().post(url, json=[{"Text": "\n".join(data)}], proxies=self.proxies, headers=headers,verify=False,  timeout=300)
         config.logger.info(f'[Mircosoft]返回:{response.text=}')
         if response.status_code != 200:
             raise Exception(f'[Mircosoft] status={response.status_code=}')
@@ -2,7 +2,6 @@
 import time
 from typing import Union, List
 
-import requests
 
 from videotrans.configure import config
 from videotrans.translator._base import BaseTrans
@@ -13,7 +12,7 @@ class MyMemory(BaseTrans):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.aisendsrt=False
-        pro = self._set_proxy(type='set')
+        pro = self._get_proxy()
         if pro:
             self.proxies = {"https": pro, "http": pro}
 
@@ -26,7 +25,7 @@ class MyMemory(BaseTrans):
         text="\n".join(data)
         url = f"https://api.mymemory.translated.net/get?q={quote(text)}&langpair={self.source_code}|{self.target_code}"
         config.logger.info(f'[mymemory]请求数据:{url=}')
-        response = requests.get(url, proxies=self.proxies, headers=headers,verify=False,  timeout=300)
+        response = self._http_session().get(url, proxies=self.proxies, headers=headers,verify=False,  timeout=300)
         config.logger.info(f'[mymemory]返回:{response.text=}')
         if response.status_code != 200:
             raise Exception(f'[mymemory] status={response.status_code=}')
@@ -1,6 +1,5 @@
 from typing import Union, List
 
-import requests
 
 from videotrans.configure import config
 from videotrans.translator._base import BaseTrans
@@ -16,7 +15,7 @@ class OTT(BaseTrans):
         if not url.startswith('http'):
             url = f"http://{url}"
         self.api_url = url
-        pro = self._set_proxy(type='set')
+        pro = self._get_proxy()
         if pro:
             self.proxies = {"https": pro, "http": pro}
 
@@ -27,7 +26,7 @@ class OTT(BaseTrans):
             "source": "auto",
             "target": self.target_code[:2]
         }
-        response = requests.post(url=self.api_url, json=jsondata, proxies=self.proxies)
+        response = self._http_session().post(url=self.api_url, json=jsondata, proxies=self.proxies)
         if response.status_code != 200:
             raise Exception(f'status_code={response.status_code} {response.reason}')
         result = response.json()
@@ -15,6 +15,9 @@ class AzureTTS(BaseTTS):
         super().__init__(*args, **kwargs)
         self.con_num = int(float(config.settings.get('azure_lines',1)))
 
+    def _cache_params(self, it):
+        return {**super()._cache_params(it), "region": config.params.get('azure_speech_region', '')}
+
     def _item_task_pl(self, items: list = None):
         if self._exit():
             return
@@ -155,9 +158,13 @@ class AzureTTS(BaseTTS):
         else:
             language = self.language.split("-", maxsplit=1)
             self.language = language[0].lower() + ("" if len(language) < 2 else '-' + language[1].upper())
-            if self.len == 1:
-                return self._item_task_pl(self.queue_tts)
-            split_queue = [self.queue_tts[i:i + self.con_num] for i in range(0, self.len, self.con_num)]
+            # 已从缓存取得的无需请求
+            queue_tts = [it for it in self.queue_tts if it['filename'] not in self.cached_files]
+            if not queue_tts:
+                return
+            if len(queue_tts) == 1:
+                return self._item_task_pl(queue_tts)
+            split_queue = [queue_tts[i:i + self.con_num] for i in range(0, len(queue_tts), self.con_num)]
             for idx, items in enumerate(split_queue):
                 if self._exit():
                     return
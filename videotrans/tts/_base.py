@@ -12,7 +12,9 @@ import requests
 from videotrans.configure import config
 from videotrans.configure._base import BaseCon
 from videotrans.configure._except import IPLimitExceeded
-from videotrans.util import tools
+from videotrans.util import tools, silence
+from videotrans.util.clip_cache import get_cache, release_cache
+from videotrans.tts._cache import TTSCache, get_tts_cache
 
 
 class BaseTTS(BaseCon):
@@ -50,6 +52,8 @@ class BaseTTS(BaseCon):
         self.dub_nums = int(float(config.settings.get('dubbing_thread', 1))) if self.len > 1 else 1
         self.error = ''
         self.api_url = ''
+        self.cached_files = set()
+        self.cache_keys = {}
         self._fomat_vrp()
 
     # 语速、音量、音调规范化为 edge-tts/azure-tts 格式
@@ -80,6 +84,7 @@ class BaseTTS(BaseCon):
         self._signal(text="")
         if len(self.queue_tts)<1:
             raise Exception('无需要配音的字幕' if config.defaulelang=='zh' else 'No subtitles required')
+        self._fetch_cache()
         try:
             print('a1==')
             self._exec()
@@ -102,6 +107,7 @@ class BaseTTS(BaseCon):
                 self._set_proxy(type='del')
             if self.error:
                 config.logger.error(f'{self.__class__.__name__}: {self.error=}')
+            self._store_cache()
 
         print('a2==')
         # 是否播放
@@ -123,11 +129,93 @@ class BaseTTS(BaseCon):
             msg = (self.error if self.error else '')+ config.transobj["peiyindayu31"]
             self._signal(text= msg, type="error")
             raise Exception(msg)
-        # 去除末尾静音
+        # 去除末尾静音，解码结果存入任务片段缓存，对齐阶段无需再次解码
         if config.settings['remove_silence']:
+            cache = get_cache(self.uuid)
+            files, segments = [], []
             for it in self.queue_tts:
-                if tools.vail_file(it['filename']):
-                    tools.remove_silence_from_end(it['filename'])
+                if not tools.vail_file(it['filename']):
+                    continue
+                try:
+                    segments.append(cache.get(it['filename']))
+                    files.append(it['filename'])
+                except Exception as e:
+                    config.logger.exception(f'移除配音静音失败:{e}', exc_info=True)
+            # 一次算出所有片段的保留区间，片段较多时在进程池中计算
+            try:
+                bounds = silence.trim_bounds_many(segments, use_process=len(segments) > 50)
+            except Exception as e:
+                config.logger.exception(f'移除配音静音失败:{e}', exc_info=True)
+                bounds = []
+            for filename, segment, bound in zip(files, segments, bounds):
+                if not bound or (bound[0] == 0 and bound[1] >= len(segment)):
+                    continue
+                try:
+                    cache.export(segment[bound[0]:bound[1]], filename)
+                except Exception as e:
+                    config.logger.exception(f'移除配音静音失败:{e}', exc_info=True)
+            # 测试及不属于任务的配音，后面没有对齐阶段来释放片段缓存
+            if self.uuid is None or self.is_test:
+                release_cache(self.uuid)
+
+    # 配音缓存键中，文字、角色、语速、音量、音调之外影响配音结果的参数
+    # 子类覆盖时在此基础上补充所用模型、参考音频等，返回值需可 json 序列化
+    def _cache_params(self, it):
+        return {"api_url": self.api_url, "language": self.language}
+
+    # 参考音频等本地文件，以路径、大小、修改时间标识，文件被替换后缓存失效
+    @staticmethod
+    def _file_sig(file):
+        try:
+            st = Path(file).stat()
+        except (OSError, TypeError, ValueError):
+            return str(file)
+        return [Path(file).as_posix(), st.st_size, st.st_mtime_ns]
+
+    # 配音缓存键，克隆音色依赖参考音频，不缓存
+    def _tts_cache_key(self, it):
+        if self.is_test or not config.settings.get('tts_cache', True):
+            return None
+        if not it.get('text', '').strip() or it.get('role') == 'clone' or it.get('ref_wav'):
+            return None
+        try:
+            params = self._cache_params(it)
+        except Exception as e:
+            # 无法确定渠道参数时不使用缓存，以免取到其他配置下的配音
+            config.logger.exception(f'配音缓存参数获取失败:{e}', exc_info=True)
+            return None
+        return TTSCache.make_key(text=it['text'], tts_type=it.get('tts_type', ''), role=it.get('role', ''),
+                                 rate=it.get('rate', self.rate), volume=it.get('volume', self.volume),
+                                 pitch=it.get('pitch', self.pitch), params=params)
+
+    # 已缓存的配音直接复制到目标文件，后续不再请求
+    def _fetch_cache(self):
+        self.cached_files = set()
+        # 在文本规范化之前计算键，filename -> key
+        self.cache_keys = {}
+        cache = get_tts_cache()
+        for it in self.queue_tts:
+            key = self._tts_cache_key(it)
+            if not key:
+                continue
+            self.cache_keys[it['filename']] = key
+            if not tools.vail_file(it['filename']) and cache.fetch(key, it['filename']):
+                self.cached_files.add(it['filename'])
+
+    def _store_cache(self):
+        cache = get_tts_cache()
+        for it in self.queue_tts:
+            if it['filename'] in self.cached_files or not tools.vail_file(it['filename']):
+                continue
+            key = self.cache_keys.get(it['filename'])
+            if key:
+                cache.store(key, it['filename'])
+        try:
+            cache.flush()
+        except Exception as e:
+            config.logger.exception(f'保存配音缓存索引失败:{e}', exc_info=True)
+        config.logger.info(f'配音缓存:本次命中{len(self.cached_files)}条，{cache.stats()}')
+
     # 实际业务逻辑 子类实现 在此创建线程池，或单线程时直接创建逻辑
     # 抛出异常则停止
     def _exec(self) -> None:
@@ -154,8 +242,10 @@ class BaseTTS(BaseCon):
             from videotrans.util.en_tn import EnglishNormalizer
             normalizer = EnglishNormalizer()
             
-        if len(self.queue_tts)==1 or self.dub_nums==1:
-            for k, item in enumerate(self.queue_tts):
+        # 已从缓存取得的无需请求
+        queue_tts = [it for it in self.queue_tts if it['filename'] not in self.cached_files]
+        if len(queue_tts)==1 or self.dub_nums==1:
+            for k, item in enumerate(queue_tts):
                 if k>0:
                     print(f'{self.wait_sec=}')
                     time.sleep(self.wait_sec)
@@ -165,7 +255,7 @@ class BaseTTS(BaseCon):
                 self._item_task(item)
         else:
             with ThreadPoolExecutor(max_workers=self.dub_nums) as pool:
-                for k, item in enumerate(self.queue_tts):
+                for k, item in enumerate(queue_tts):
                     if normalizer:
                         item['text']=normalizer(item['text'])
                         print(f'normalizer:{item["text"]}')
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+配音结果缓存，跨任务复用
+
+以 配音渠道/角色/语速/音量/音调 + 渠道参数(模型、接口地址、语言、参考音频等) + 规范化后的文字 为键，
+配音文件保存在 cache/tts_store 下，不随退出时清理 tmp 而删除，
+manifest.json 记录每个键对应的文件、大小、最后使用时间
+同一句话(片头、口头禅等)在任何任务、任何时间位置再次出现时直接复制，无需请求
+总大小超过 tts_cache_mb 时按最久未使用淘汰，启动后首次使用时也会检查
+任务中的配音文件会被去静音、加速等操作改写，因此缓存中保存的是独立副本
+"""
+import hashlib
+import json
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from videotrans.configure import config
+
+
+class TTSCache:
+
+    def __init__(self, root=None):
+        self.root = Path(root or config.CACHE_DIR + '/tts_store')
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_file = self.root / 'manifest.json'
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            self._index = json.loads(self.manifest_file.read_text(encoding='utf-8'))
+        except Exception:
+            self._index = {}
+        # 上次退出后 tts_cache_mb 可能已调小
+        self.flush()
+
+    @staticmethod
+    def make_key(*, text, tts_type, role, rate, volume, pitch, params=None):
+        """
+        params: 渠道相关参数，见 BaseTTS._cache_params
+        """
+        text = re.sub(r'\s+', ' ', str(text)).strip()
+        raw = json.dumps([str(tts_type), role, rate, volume, pitch, params, text], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+    # 命中时复制到 filename 并返回 True
+    def fetch(self, key, filename):
+        with self._lock:
+            entry = self._index.get(key)
+            src = self.root / entry['file'] if entry else None
+            if not entry or not src.is_file():
+                if entry:
+                    del self._index[key]
+                    self._dirty = True
+                self.misses += 1
+                return False
+            entry['accessed'] = time.time()
+            self.hits += 1
+            self._dirty = True
+        try:
+            shutil.copy2(src, filename)
+        except OSError:
+            return False
+        return True
+
+    def store(self, key, filename):
+        src = Path(filename)
+        if not src.is_file() or src.stat().st_size < 1:
+            return
+        name = key + src.suffix
+        try:
+            shutil.copy2(src, self.root / name)
+        except OSError:
+            return
+        with self._lock:
+            self._index[key] = {"file": name, "size": src.stat().st_size, "accessed": time.time()}
+            self._dirty = True
+
+    # 超过上限时淘汰最久未使用的，并写入 manifest
+    def flush(self):
+        max_bytes = float(config.settings.get('tts_cache_mb', 1024)) * 1024 * 1024
+        with self._lock:
+            total = sum(v['size'] for v in self._index.values())
+            if max_bytes > 0 and total > max_bytes:
+                for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]['accessed']):
+                    if total <= max_bytes * 0.9:
+                        break
+                    (self.root / entry['file']).unlink(missing_ok=True)
+                    total -= entry['size']
+                    del self._index[key]
+                    self._dirty = True
+            if not self._dirty:
+                return
+            tmp = self.manifest_file.with_suffix('.tmp')
+            tmp.write_text(json.dumps(self._index), encoding='utf-8')
+            tmp.replace(self.manifest_file)
+            self._dirty = False
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self._index),
+                "bytes": sum(v['size'] for v in self._index.values()),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSCache()
+        return _cache
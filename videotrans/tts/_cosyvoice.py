@@ -23,6 +23,12 @@ class CosyVoice(BaseTTS):
         self.api_url = 'http://' + api_url.replace('http://', '')
         self.proxies={"http": "", "https": ""}
 
+    # 角色对应的参考音频
+    def _cache_params(self, it):
+        ref = (tools.get_cosyvoice_role() or {}).get(it.get('role'))
+        return {**super()._cache_params(it), "ref": ref,
+                "ref_file": self._file_sig(ref.get('reference_audio', '')) if isinstance(ref, dict) else ''}
+
     def _exec(self):
         self._local_mul_thread()
 
@@ -1,6 +1,5 @@
 import asyncio
-import threading
-import time
+import inspect
 from pathlib import Path
 
 
@@ -9,62 +8,126 @@ from aiohttp import ClientError, WSServerHandshakeError
 from edge_tts.exceptions import NoAudioReceived
 
 from videotrans.configure import config
-from videotrans.configure._except import IPLimitExceeded
 from videotrans.tts._base import BaseTTS
 from videotrans.util import tools
 from edge_tts import Communicate
 
-# asyncio 异步并发
+# asyncio 异步并发，同时最多 dubbing_thread 个 Communicate 会话
+
+# 旧版 edge-tts 不支持 connector 参数
+_SUPPORT_CONNECTOR = 'connector' in inspect.signature(Communicate.__init__).parameters
+
+
+async def _noop():
+    pass
+
+
+class _SharedConnector(aiohttp.TCPConnector):
+    """
+    Communicate 内部每次 async with ClientSession 退出时都会关闭 connector，
+    共享的连接器在此忽略这些关闭，所有配音结束后由 shutdown 真正关闭
+    """
+
+    def close(self, *args, **kwargs):
+        return _noop()
+
+    async def shutdown(self):
+        await super().close()
+
 
 class EdgeTTS(BaseTTS):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        pro = self._set_proxy(type='set')        
+        pro = self._set_proxy(type='set')
         if pro:
             self.proxies= pro
+        # 每条字幕出错后的重试次数
+        self.retry = int(float(config.settings.get('retries', 2)))
+        self._done = 0
+        # 被限流时所有会话暂停到该时间点，暂停时长逐次翻倍
+        self._pause_until = 0.0
+        self._backoff = 0
 
+    # 限流后等待暂停结束
+    async def _wait_throttle(self):
+        loop = asyncio.get_running_loop()
+        while not self._exit():
+            wait = self._pause_until - loop.time()
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, 0.5))
+
+    def _throttled(self):
+        loop = asyncio.get_running_loop()
+        self._backoff = 2 if not self._backoff else min(60, self._backoff * 2)
+        self._pause_until = max(self._pause_until, loop.time() + self._backoff)
+        msg = f'可能被edge限流，暂停{self._backoff}s后重试' if config.defaulelang == 'zh' else f'Edge-TTS may be throttling, retry after {self._backoff}s'
+        self._signal(text=msg)
+        return msg
+
+    async def _item(self, it, sem, connector, length):
+        if not it['text'].strip() or it['filename'] in self.cached_files or tools.vail_file(it['filename']):
+            self._done += 1
+            return
+        kw = {"connector": connector} if connector else {}
+        error = ''
+        for attempt in range(self.retry + 1):
+            if self._exit():
+                return
+            await self._wait_throttle()
+            async with sem:
+                if self._exit():
+                    return
+                try:
+                    communicate = Communicate(
+                        it['text'],
+                        voice=it['role'],
+                        rate=self.rate,
+                        volume=self.volume,
+                        proxy=self.proxies,
+                        pitch=self.pitch,
+                        **kw)
+                    await communicate.save(it['filename'])
+                except aiohttp.client_exceptions.ClientHttpProxyError as e:
+                    config.logger.exception(e, exc_info=True)
+                    raise Exception(f'代理错误，请检查 {e}')
+                except NoAudioReceived as e:
+                    error = '请检查字幕文本和所选语言是否一致' if config.defaulelang == 'zh' else 'Please check that the subtitle text matches the selected language'
+                    config.logger.warning(f'{error}:{it["text"]} {e}')
+                except WSServerHandshakeError as e:
+                    error = self._throttled() if e.status in [403, 429] else str(e)
+                except (ClientError, asyncio.TimeoutError) as e:
+                    error = str(e) if str(e).find('Invalid response status') == -1 else self._throttled()
+                else:
+                    self._backoff = 0
+                    self._done += 1
+                    if self.inst and self.inst.precent < 80:
+                        self.inst.precent += 0.05
+                    self._signal(text=f'{config.transobj["kaishipeiyin"]} [{self._done}/{length}]')
+                    if self.wait_sec > 0:
+                        await asyncio.sleep(self.wait_sec)
+                    return
+                Path(it['filename']).unlink(missing_ok=True)
+            if attempt < self.retry:
+                await asyncio.sleep(1)
+        self.error = error
+        config.logger.error(f'EdgeTTS 配音失败 {it["text"]=}:{error}')
 
     async def _task_queue(self):
-        
-        task_end=False
-        
-        def process():
-            if task_end:
-                return        
+        sem = asyncio.Semaphore(max(1, self.dub_nums))
+        connector = _SharedConnector(limit=max(1, self.dub_nums)) if _SUPPORT_CONNECTOR else None
+        length = len(self.queue_tts)
+        tasks = [asyncio.create_task(self._item(it, sem, connector, length)) for it in self.queue_tts]
         try:
-            length=len(self.queue_tts)
-            for i,it in enumerate(self.queue_tts):
-                if task_end or self._exit():
-                    return
-                if self.inst and self.inst.precent < 80:
-                    self.inst.precent += 0.05
-                self._signal(text=f'{config.transobj["kaishipeiyin"]} [{i+1}/{length}]')
-                time.sleep(self.wait_sec if self.wait_sec>0 else 0.1)
-                communicate = Communicate(
-                    it['text'],
-                    voice=it['role'],
-                    rate=self.rate, 
-                    volume=self.volume,
-                    proxy=self.proxies,
-                    pitch=self.pitch)
-                await communicate.save(it['filename'])
-        except NoAudioReceived as e:
-            config.logger.exception(e, exc_info=True)
-            raise Exception(f'请检查字幕文本和所选语言是否一致')
-        except aiohttp.client_exceptions.ClientHttpProxyError as e:
-            config.logger.exception(e, exc_info=True)
-            raise Exception(f'代理错误，请检查 {e}')
-        except Exception as e:
-            config.logger.exception(e, exc_info=True)
-            if str(e).find('Invalid response status'):
-                raise Exception('可能被edge限流，请尝试使用或切换代理节点')
-            print(f"异步合成出错: {e}")
-            raise
+            await asyncio.gather(*tasks)
         finally:
-            task_end=True
+            for t in tasks:
+                t.cancel()
+            if connector:
+                await connector.shutdown()
         print('配音完毕')
-    
+
     def _exec(self) -> None:
         # 防止出错，重试一次
         if self._exit():
@@ -73,4 +136,3 @@ class EdgeTTS(BaseTTS):
             self.proxies='http://'+Path(config.ROOT_DIR+'/edgetts.txt').read_text(encoding='utf-8').strip()
             print(f'{self.proxies=}')
         asyncio.run(self._task_queue())
-        
\ No newline at end of file
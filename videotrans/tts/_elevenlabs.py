@@ -20,10 +20,13 @@ class ElevenLabsC(BaseTTS):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.copydata = copy.deepcopy(self.queue_tts)
-        pro = self._set_proxy(type='set')
+        pro = self._get_proxy()
         if pro:
             self.proxies = pro
 
+    def _cache_params(self, it):
+        return {**super()._cache_params(it), "model": config.params.get('elevenlabstts_models', '')}
+
     # 强制单个线程执行，防止频繁并发失败
     def _exec(self):
         prev_text = None
@@ -53,7 +56,7 @@ class ElevenLabsC(BaseTTS):
 
                 client = ElevenLabs(
                     api_key=config.params['elevenlabstts_key'],
-                    httpx_client=httpx.Client(proxy=self.proxies) if self.proxies else None
+                    httpx_client=self._http_client(self.proxies)
                 )
 
                 response = client.text_to_speech.convert(
@@ -33,6 +33,14 @@ class F5TTS(BaseTTS):
     
 
     
+    # 所用模型类型及角色对应的参考音频
+    def _cache_params(self, it):
+        role = it.get('role')
+        return {**super()._cache_params(it), "ttstype": config.params.get('f5tts_ttstype', ''),
+                "is_whisper": config.params.get('f5tts_is_whisper'),
+                "ref": (tools.get_f5tts_role() or {}).get(role),
+                "ref_file": self._file_sig(config.ROOT_DIR + f"/f5-tts/{role}")}
+
     def _exec(self):
         self._local_mul_thread()
     
@@ -22,6 +22,12 @@ class FishTTS(BaseTTS):
         self.api_url = 'http://' + api_url.replace('http://', '')
         self.proxies={"http": "", "https": ""}
 
+    # 角色对应的参考音频及其文字
+    def _cache_params(self, it):
+        ref = (tools.get_fishtts_role() or {}).get(it.get('role')) or {}
+        return {**super()._cache_params(it), "ref": ref,
+                "ref_file": self._file_sig(f'{config.ROOT_DIR}/{ref.get("reference_audio", "")}')}
+
     def _exec(self):
         self._local_mul_thread()
 
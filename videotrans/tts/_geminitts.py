@@ -25,6 +25,9 @@ class GEMINITTS(BaseTTS):
         self.proxies = self._set_proxy(type='set')
 
 
+    def _cache_params(self, it):
+        return {**super()._cache_params(it), "model": config.params.get('gemini_ttsmodel', '')}
+
     # 强制单个线程执行，防止频繁并发失败
     def _exec(self):
         self._local_mul_thread()
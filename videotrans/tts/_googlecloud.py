@@ -52,6 +52,10 @@ class GoogleCloudTTS(BaseTTS):
         """Dispara threads conforme BaseTTS."""
         self._local_mul_thread()
 
+    def _cache_params(self, it):
+        return {**super()._cache_params(it), "language_code": self.language_code, "voice_name": self.voice_name,
+                "encoding": self.encoding, "gender": config.params.get("gcloud_ssml_gender", "")}
+
     def _item_task(self, data_item: dict):
         """
         Executa síntese para cada segmento de texto.
@@ -27,6 +27,13 @@ class GPTSoVITS(BaseTTS):
         self.splits = {"，", "。", "？", "！", ",", ".", "?", "!", "~", ":", "：", "—", "…", }
         self.proxies={"http": "", "https": ""}
 
+    # 角色对应的参考音频及其文字
+    def _cache_params(self, it):
+        ref = (tools.get_gptsovits_role() or {}).get(it.get('role')) or {}
+        return {**super()._cache_params(it), "isv2": config.params.get('gptsovits_isv2'),
+                "extra": config.params.get('gptsovits_extra', ''), "ref": ref,
+                "ref_file": self._file_sig(ref.get('refer_wav_path', ''))}
+
     def _exec(self):
         self._local_mul_thread()
 
@@ -2,7 +2,7 @@ import copy
 import re
 import time
 
-import httpx,requests
+import requests
 from openai import OpenAI, RateLimitError, APIConnectionError
 
 from videotrans.configure import config
@@ -20,11 +20,15 @@ class OPENAITTS(BaseTTS):
         self.api_url = self._get_url(config.params['openaitts_api'])
         self.pro=None
         if not re.search('localhost', self.api_url) and not re.match(r'^https?://(\d+\.){3}\d+(:\d+)?', self.api_url):
-            pro = self._set_proxy(type='set')
+            pro = self._get_proxy()
             if pro:
                 self.proxies =  pro 
 
 
+    def _cache_params(self, it):
+        return {**super()._cache_params(it), "model": config.params.get('openaitts_model', ''),
+                "instructions": config.params.get('openaitts_instructions', '')}
+
     # 强制单个线程执行，防止频繁并发失败
     def _exec(self):
         if not config.params['openaitts_key']:
@@ -44,7 +48,7 @@ class OPENAITTS(BaseTTS):
             speed += rate
         try:
             client = OpenAI(api_key=config.params.get('openaitts_key',''), base_url=self.api_url,
-                            http_client=httpx.Client(proxy=self.proxies,timeout=7200))
+                            http_client=self._http_client(self.proxies, timeout=7200))
             with client.audio.speech.with_streaming_response.create(
                 model=config.params['openaitts_model'],
                 voice=role,
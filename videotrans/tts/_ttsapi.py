@@ -25,6 +25,11 @@ class TTSAPI(BaseTTS):
             self.api_url=api_url
         self.proxies=None
 
+    def _cache_params(self, it):
+        return {**super()._cache_params(it), "extra": config.params.get('ttsapi_extra', ''),
+                "emotion": config.params.get('ttsapi_emotion', ''),
+                "language_boost": config.params.get('ttsapi_language_boost', '')}
+
     def _exec(self) -> None:
         self._local_mul_thread()
 
@@ -41,6 +41,9 @@ class VolcEngineTTS(BaseTTS):
             "广西":"zh_guangxi"
         }
         self.voice_type=None
+    def _cache_params(self, it):
+        return {**super()._cache_params(it), "cluster": config.params.get('volcenginetts_cluster', '')}
+
     def _exec(self):
         # 并发限制为1，防止限流
         self.dub_nums=1
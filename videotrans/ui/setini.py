@@ -93,9 +93,12 @@ class Ui_setini(object):
             "common": {
                 "lang": "设置软件界面语言，修改后需要重启软件",
                 "countdown_sec": "当单个视频翻译时，暂停时倒计时秒数",
+                "separate_workers": "分离背景音时同时进行频谱变换的线程数，越大越快但占用内存越多，默认2",
+                "separate_batch_size": "分离背景音时每次推理同时处理的窗口数，仅CPU时可适当调大，默认4",
                 "bgm_split_time": "设置分离背景音时切割片段，防止视频过长卡死，默认300s",
                 "homedir": "家目录，用于保存视频分离、字幕配音、字幕翻译等结果的位置，默认用户家目录",
                 "is_queue":"视频翻译任务默认交叉并发执行，以提高速度，选中该项则排队挨个翻译,速度会降低",
+                "stage_workers": "流水线各阶段并发线程数，格式 阶段=数量，逗号分隔，可用阶段 prepare,regcon,trans,dubb,audio_align,align,assemb，未填写的为1，重启后生效",
                 "llm_chunk_size":"LLM大模型重新断句时，每次发送多少个字或单词，该值越大断句效果越好，一次性发送全部字幕最佳，但受限于大模型输出token，过长输入可能导致失败"
             },
 
@@ -104,6 +107,10 @@ class Ui_setini(object):
                 "cuda_qp": "是否在 NVIDIA cuda上使用 qp代替crf",
                 "preset": "主要调节编码速度和质量的平衡，有ultrafast、superfast、veryfast、faster、fast、medium、slow、slower、veryslow 选项，编码速度从快到慢、压缩率从低到高、视频尺寸从大到小。 ",
                 "videoslow_hard":"视频慢速处理时是否尝试硬件加速(速度快但易出错)",
+                "videoslow_onepass": "视频慢速时不再逐段切割再连接，而是构造一个filter_complex单次渲染，可大幅减少编码次数和临时文件，出错时自动回退为逐段切割",
+                "videoslow_chunk": "视频慢速单次渲染时每块包含的字幕区间数，区间过多时分为多块渲染后连接，默认200",
+                "ffmpeg_jobs": "同时运行的ffmpeg进程数上限，超出的排队等待，0为根据CPU核数自动",
+                "ffmpeg_timeout": "单个ffmpeg命令最长运行秒数，超时后结束，0为不限制",
                 "ffmpeg_cmd": "自定义ffmpeg命令参数， 将添加在倒数第二个位置上,例如  -bf 7 -b_ref_mode middle",
                 "cuda_decode":"使用cuda解码视频",
                 "video_codec": "采用 libx264 编码或 libx265编码，264兼容性更好，265压缩比更大清晰度更高"
@@ -120,6 +127,11 @@ class Ui_setini(object):
             "trans": {
                 "trans_thread": "传统翻译每次发送字幕行数",
                 "aitrans_thread": "AI翻译每次发送字幕行数",
+                "trans_concurrency": "同时发送的翻译请求数，大于1时多组字幕并发翻译，结果仍按原顺序输出，默认1",
+                "trans_rpm": "同一翻译渠道每分钟最多请求次数，0=不限制；遇到429时该渠道所有请求暂停，暂停时长从5s起翻倍，最长60s",
+                "http_pool_size": "每个翻译/识别/配音渠道复用的HTTP连接数上限，连接保持不断开，避免每条字幕重新握手，默认20",
+                "trans_cache_days": "翻译缓存中超过该天数未被使用的条目将被删除，0=不按时间删除，默认30",
+                "trans_cache_mb": "翻译缓存文件大小上限MB，超出后删除最久未使用的条目，0=不限制，默认200",
                 "retries": "翻译出错时的重试次数",
                 "translation_wait": "每次翻译后暂停时间/秒,用于限制请求频率",
                 "google_trans_newadd": "批量字幕翻译功能当选择Google渠道时，可在此填写新的目标语言代码，请填写ISO-639 代码,多个以英文逗号分隔，语言代码在此查看  https://cloud.google.com/translate/docs/languages",
@@ -130,6 +142,10 @@ class Ui_setini(object):
             "dubbing": {
                 "dubbing_thread": "同时配音的字幕条数",
                 "dubbing_wait": "每次配音后暂停时间/秒,用于限制请求频率",
+                "tts_cache": "相同文字、角色、语速、音量、音调且模型、接口地址、参考音频相同的配音结果跨任务复用，保存在 cache 目录，重启后仍有效，克隆音色不缓存",
+                "tts_cache_mb": "配音缓存大小上限MB，超出后删除最久未使用的，0=不限制，默认1024",
+                "api_threads": "api.py 服务的工作线程数，每个 /task_events 推送连接在任务结束前占用一个线程，默认16，重启API后生效",
+                "api_sse_max": "同时保持的 /task_events 推送连接上限，超出时返回503，请改用 /task_status 查询，至少为其他接口保留2个线程，默认8",
                 "save_segment_audio":"保留每条字幕的配音文件",
                 "azure_lines": "azureTTS一次配音行数",
                 "chattts_voice": "chatTTS 音色值"
@@ -141,6 +157,9 @@ class Ui_setini(object):
                 "remove_silence": "是否移除配音末尾空白",
                 "remove_srt_silence": "是否移除原始字幕时长大于配音时长 的静音，比如原时长5s，配音后3s，是否移除这2s静音",
                 "remove_white_ms": "移除2条字幕间的静音长度ms，比如100ms，即如果两条字幕间的间隔大于100ms时，将移除100ms, -1=完全移除",
+                "process_max": "视频慢速切片、音频加速等操作同时执行的最大任务数，0=根据CPU核心数自动设置",
+                "clip_cache_mb": "同一任务中已解码配音片段的内存缓存上限MB，去静音、加速、合并时复用，避免重复解码，默认512",
+                "audio_stretch": "配音加速的实现方式：ffmpeg=atempo滤镜(默认，保持音调)，pydub=旧方式分块交叉淡化(有断续感)，librosa=相位声码器(需安装librosa)，wsola=NumPy波形相似叠加",
                 "force_edit_srt": "是否强制修改字幕时间轴以便匹配声音，若不选中则保持原始字幕时间轴，可能导致字幕和声音不匹配"
             },
             "whisper": {
@@ -153,10 +172,15 @@ class Ui_setini(object):
 
                 "overall_maxsecs": "字幕最大时长秒数，超过则强制断句",
 
+                "recogn_concurrency": "Gemini/OpenAI语音识别API/Google识别等云端渠道同时发送的请求数，多个key时在各key间轮换，结果仍按时间顺序输出，默认2",
+                "recogn_rpm": "云端识别渠道每个key每分钟最多请求次数，0=不限制；某key遇到429时只暂停该key，暂停时长从5s起翻倍，最长60s",
                 "voice_silence": "Google识别api静音片段/ms",
                 "interval_split": "均等分割模式下每个片段时长秒数",
                 "model_list": "faster模式和openai模式下的模型名字列表，英文逗号分隔",
                 "cuda_com_type": "faster模式时cuda数据类型，int8=消耗资源少，速度快，精度低，float32=消耗资源多，速度慢，精度高，int8_float16=设备自选",
+                "whisper_server": "faster-whisper整体识别时使用常驻的识别进程，已加载的模型保留在内存中供后续任务复用，省去每次重新加载模型的时间",
+                "whisper_server_idle": "常驻识别进程空闲多少秒后释放模型并退出，默认300",
+                "average_batch_size": "faster-whisper均等分割模式下每次批量推理的片段数，1=逐段识别，需 faster-whisper>=1.1，默认8",
                 "whisper_threads": "faster模式下，字幕识别时，cpu进程数",
                 "whisper_worker": "faster模式下，字幕识别时，同时工作进程数",
                 "beam_size": "字幕识别时精度调整，1-5，1=消耗显存最低，5=消耗显存最多",
@@ -198,6 +222,7 @@ class Ui_setini(object):
         # 中文左侧label
         self.titles = {
             "ai302_models": "302.ai翻译模型列表",
+            "stage_workers": "各阶段并发线程数",
             "llm_chunk_size":"LLM重新断句每批次发送字或单词数",
             "ai302tts_models": "302.aiTTS模型列表",
             "openairecognapi_model": "OpenAI语音识别模型",
@@ -205,11 +230,19 @@ class Ui_setini(object):
             "is_queue": "视频翻译排队处理(默认交叉)",
             "videoslow_hard":"视频慢速时尝试硬件加速(速度快易出错)",
             "lang": "界面语言",
+            "tts_cache": "复用配音缓存",
+            "tts_cache_mb": "配音缓存上限MB",
+            "api_threads": "API工作线程数",
+            "api_sse_max": "API推送连接上限",
             "save_segment_audio":"保留每条字幕的配音文件",
             "crf": "视频转码损失控制",
             "cuda_decode":"使用cuda解码视频",
             "cuda_qp": "NVIDIA使用qp代替crf",
             "preset": "输出视频质量压缩率控制",
+            "videoslow_onepass": "视频慢速单次渲染(filter_complex)",
+            "videoslow_chunk": "单次渲染每块区间数",
+            "ffmpeg_jobs": "ffmpeg并发进程数",
+            "ffmpeg_timeout": "ffmpeg超时秒数",
             "ffmpeg_cmd": "自定义ffmpeg命令参数",
             "video_codec": "264或265视频编码",
             "chatgpt_model": "ChatGPT模型列表",
@@ -224,7 +257,12 @@ class Ui_setini(object):
             "remove_silence": "移除配音末尾空白",
             "remove_srt_silence": "移除字幕时长大于配音时长",
             "remove_white_ms": "移除2条字幕间的静音长度",
+            "process_max": "并发处理切片数(0=自动)",
+            "clip_cache_mb": "配音片段解码缓存MB",
+            "audio_stretch": "配音加速方式",
             "force_edit_srt": "强制修改字幕时间轴",
+            "separate_workers": "背景音分离并行线程数",
+            "separate_batch_size": "背景音分离推理批大小",
             "bgm_split_time": "背景音分离切割片段/s",
             "vad": "启用VAD",
 
@@ -239,16 +277,26 @@ class Ui_setini(object):
 
             "overall_maxsecs": "字幕最大时长持续秒数/s",
 
+            "recogn_concurrency": "云端识别并发请求数",
+            "recogn_rpm": "云端识别每key每分钟请求上限",
             "voice_silence": "Google识别api静音片段/ms",
             "interval_split": "均等分割时片段时长/s",
             "trans_thread": "传统翻译每次发送字幕行数",
             "aitrans_thread": "AI翻译每次发送字幕行数",
+            "trans_concurrency": "翻译并发请求数",
+            "trans_rpm": "翻译每分钟请求上限",
+            "http_pool_size": "每渠道HTTP连接池大小",
+            "trans_cache_days": "翻译缓存保留天数",
+            "trans_cache_mb": "翻译缓存上限MB",
             "retries": "翻译出错重试数",
             "dubbing_thread": "同时配音字幕数",
             "countdown_sec": "暂停倒计时/s",
             "backaudio_volume": "背景音量倍数",
             "loop_backaudio": "循环播放背景音",
             "cuda_com_type": "CUDA数据类型",
+            "whisper_server": "常驻识别进程",
+            "whisper_server_idle": "常驻识别进程空闲秒数",
+            "average_batch_size": "均等分割批量数",
             "whisper_threads": "faster-whisper cpu进程",
             "whisper_worker": "faster-whisper工作进程",
             "beam_size": "字幕识别准确度控制beam_size",
@@ -316,8 +364,11 @@ class Ui_setini(object):
                     "lang": "Set the software interface language, a restart is required after modification",
                     "countdown_sec": "Countdown seconds when pausing during single video translation",
                     "is_queue":"Video translation tasks are cross-executed concurrently by default to increase speed, checking this item queues the translations one by one.",
+                    "separate_workers": "Number of threads doing spectrogram transforms during background separation, larger is faster but uses more memory, default 2",
+                    "separate_batch_size": "Number of windows per inference pass during background separation, may be raised on CPU, default 4",
                     "bgm_split_time": "Set the segment length for splitting background audio to prevent freezing on long videos, default is 300s",
                     "homedir": "Home directory, used to save the results of video separation, subtitle dubbing, subtitle translation, etc. Default user home directory",
+                    "stage_workers": "Concurrent worker threads per pipeline stage, format stage=count separated by commas; stages: prepare,regcon,trans,dubb,audio_align,align,assemb; unlisted stages use 1; takes effect after restart",
                     "llm_chunk_size":"When the LLM large model re-segmentation, how many words to send each time to prevent the subtitles from being too long and exceeding the LLM output limit"
                 },
                 "video": {
@@ -326,6 +377,10 @@ class Ui_setini(object):
                     "cuda_decode":"Decode the video using cuda",
                     "preset": "Mainly adjust the balance of encoding speed and quality, there are ultrafast, superfast, veryfast, fast, fast, medium, slow, slow, veryslow options, encoding speed from fast to slow, compression rate from low to high, video size from large to small.",
                     "videoslow_hard":"Whether to try hardware acceleration when video is processed slowly (fast but error prone)",
+                    "videoslow_onepass": "When slowing down video, build one filter_complex graph and render in a single pass instead of cutting and concatenating every clip; falls back to per-clip cutting on error",
+                    "videoslow_chunk": "Number of intervals per chunk in single-pass video slow-down, long inputs are split into several chunks, default 200",
+                    "ffmpeg_jobs": "Maximum number of ffmpeg processes running at once, extra jobs wait in queue, 0 = auto from CPU cores",
+                    "ffmpeg_timeout": "Maximum seconds a single ffmpeg command may run before it is killed, 0 = unlimited",
                     "ffmpeg_cmd": "Custom ffmpeg command parameters, added at the penultimate position, e.g., -bf 7 -b_ref_mode middle",
                     "video_codec": "Use libx264 or libx265 encoding, 264 has better compatibility, 265 has higher compression ratio and clarity"
                 },
@@ -340,6 +395,11 @@ class Ui_setini(object):
                 "trans": {
                     "trans_thread": "Number of subtitles translated simultaneously",
                     "aitrans_thread": "Number of subtitles AI translated simultaneously",
+                    "trans_concurrency": "Number of translation requests in flight at once; above 1, subtitle groups are translated concurrently and results are still assembled in order; default 1",
+                    "trans_rpm": "Maximum requests per minute per translation channel, 0 = unlimited; on 429 all requests to that channel pause, starting at 5s and doubling up to 60s",
+                    "http_pool_size": "Maximum pooled HTTP connections kept alive per translation/recognition/TTS channel, so TLS handshakes are reused across subtitle requests; default 20",
+                    "trans_cache_days": "Translation cache entries unused for more than this many days are removed; 0 = no time-based expiry; default 30",
+                    "trans_cache_mb": "Size limit of the translation cache in MB; least recently used entries are removed beyond it; 0 = unlimited; default 200",
                     "retries": "Number of retries when translation fails",
                     "translation_wait": "Pause time in seconds after each translation, used to limit request frequency",
                     "google_trans_newadd": "Batch Subtitle Translation Function When selecting Google channel, you can fill in the new target language code here, please fill in the ISO-639 code, the language code can be viewed here.  https://cloud.google.com/translate/docs/languages",
@@ -349,6 +409,10 @@ class Ui_setini(object):
                 "dubbing": {
                     "dubbing_thread": "Number of subtitles dubbed simultaneously",
                     "dubbing_wait": "Pause time in seconds after each dubbing, used to limit request frequency",
+                    "tts_cache": "Reuse dubbing results across tasks for the same text, voice, rate, volume and pitch with the same model, API address and reference audio; stored in the cache folder and kept across restarts; cloned voices are not cached",
+                    "tts_cache_mb": "Size limit of the dubbing cache in MB; least recently used clips are removed beyond it; 0 = unlimited; default 1024",
+                    "api_threads": "Worker threads of the api.py server; each /task_events stream holds one thread until its task ends; default 16; takes effect after restarting the API",
+                    "api_sse_max": "Maximum concurrent /task_events streams; extra requests get 503 and should poll /task_status instead; at least 2 threads are always left for other endpoints; default 8",
                     "save_segment_audio":"Save the dubbing file of each subtitle",
                     "azure_lines": "Number of lines dubbed at once by azureTTS",
                     "chattts_voice": "chatTTS voice tone"
@@ -360,6 +424,9 @@ class Ui_setini(object):
                     "remove_silence": "Whether to remove silence at the end of the dubbing",
                     "remove_srt_silence": "Whether to remove silence when the original subtitle duration is longer than the dubbing duration, e.g., the original duration is 5s, and the dubbing is 3s, should the 2s silence be removed",
                     "remove_white_ms": "Silence length in ms between two subtitles to be removed, e.g., 100ms, if the interval between two subtitles is greater than 100ms, 100ms will be removed, -1 = remove completely",
+                    "process_max": "Maximum number of video slices / audio speed-up jobs processed at the same time, 0 = decided automatically by CPU cores",
+                    "clip_cache_mb": "Memory budget in MB for decoded dubbing clips shared by silence removal, speed-up and merging within one task, default 512",
+                    "audio_stretch": "How dubbing is sped up: ffmpeg = atempo filter (default, pitch preserving), pydub = legacy chunk crossfade (choppy), librosa = phase vocoder (requires librosa), wsola = NumPy waveform-similarity overlap-add",
                     "force_edit_srt": "force subtitle timeline adjustment to match the audio, do not adjust, keep the original subtitle timeline, no adjustment may cause subtitles and audio to be out of sync"
                 },
                 "whisper": {
@@ -371,11 +438,16 @@ class Ui_setini(object):
                 "max_speech_duration_s": "The default is infinity (unlimited), so if you need to process longer voice clips, you can keep the default value; however, if you wish to control the clip length, such as processing a dialog or segmented output, you can set it according to your specific needs, such as 10 seconds or 30 seconds. ",
                 "speech_pad_ms":"Buffer time (in milliseconds) added before and after detected speech segments",
                     "overall_maxsecs": "Maximum duration of a sentence in seconds",
+                    "recogn_concurrency": "Number of requests in flight for cloud recognition channels (Gemini, OpenAI speech API, Google); requests rotate across multiple keys and results are still emitted in time order; default 2",
+                    "recogn_rpm": "Maximum requests per minute per key for cloud recognition channels, 0 = unlimited; on 429 only that key pauses, starting at 5s and doubling up to 60s",
                     "voice_silence": "Silence segment for Google api/ms",
                     "interval_split": "Segment duration in seconds in equal split mode",
 
                     "model_list": "Model names list for faster mode and openai mode, separated by commas",
                     "cuda_com_type": "Data type for cuda in faster mode, int8 = less resource usage, faster speed, lower precision, float32 = more resource usage, slower speed, higher precision, int8_float16 = device auto-select",
+                    "whisper_server": "Use a persistent recognition process for faster-whisper overall mode, keeping loaded models in memory for subsequent jobs instead of reloading them each time",
+                    "whisper_server_idle": "Seconds of idleness after which the persistent recognition process unloads models and exits, default 300",
+                    "average_batch_size": "Number of chunks per batched inference call in faster-whisper average split mode; 1 = one chunk at a time; requires faster-whisper>=1.1; default 8",
                     "whisper_threads": "Number of CPU processes for subtitle recognition in faster mode",
                     "whisper_worker": "Number of concurrent workers for subtitle recognition in faster mode",
                     "beam_size": "Precision adjustment during subtitle recognition, 1-5, 1 = lowest memory usage, 5 = highest memory usage",
@@ -428,11 +500,16 @@ class Ui_setini(object):
 
             self.titles = {
                 "homedir": "Set Home directory",
+                "stage_workers": "Workers per Stage",
                 "llm_chunk_size":"LLM re-segmentation sends each batch of words",
                 "is_queue":"Video Translation Task Queuing Translation",
                 "ai302_models": "302.ai Translation Models",
                 "ai302tts_models": "302.ai TTS Models",
                 "openairecognapi_model": "OpenAI Speech",
+                "tts_cache": "Reuse Dubbing Cache",
+                "tts_cache_mb": "Dubbing Cache Size MB",
+                "api_threads": "API Worker Threads",
+                "api_sse_max": "Max API Event Streams",
                 "save_segment_audio":"Save the dubbing file of each subtitle",
                 "lang": "Software Interface Language",
                 "aisendsrt":"Sending full subtitle content when ai translation",
@@ -441,6 +518,10 @@ class Ui_setini(object):
                 "cuda_qp": "NVIDIA Use QP Instead of CRF",
                 "cuda_decode":"Decode the video using cuda",
                 "preset": "Output Video Quality compression rate",
+                "videoslow_onepass": "Single-pass Video Slow-down",
+                "videoslow_chunk": "Intervals per Single-pass Chunk",
+                "ffmpeg_jobs": "ffmpeg concurrent jobs",
+                "ffmpeg_timeout": "ffmpeg timeout/s",
                 "ffmpeg_cmd": "Custom FFmpeg Command Parameters",
                 "video_codec": "H.264 or H.265 Video Encoding",
                 "chatgpt_model": "ChatGPT Model List",
@@ -455,7 +536,12 @@ class Ui_setini(object):
                 "remove_silence": "Remove End Silence in Dubbing",
                 "remove_srt_silence": "Remove Silence Exceeding Dubbing Duration",
                 "remove_white_ms": "Remove Silence Between Subtitles",
+                "process_max": "Parallel Slice Jobs (0=auto)",
+                "clip_cache_mb": "Decoded Clip Cache MB",
+                "audio_stretch": "Audio Speed-up Backend",
                 "force_edit_srt": "Force Edit Subtitle Timing",
+                "separate_workers": "bgm separation threads",
+                "separate_batch_size": "bgm separation batch size",
                 "bgm_split_time": "bgm segment time/s",
                 
                 "max_speech_duration_s": "max speech duration sec.",
@@ -469,16 +555,26 @@ class Ui_setini(object):
 
                  "refine3":"When AI translation is enabled and the above options are enabled, use reflective translation",
 
+                "recogn_concurrency": "Cloud Recognition Concurrency",
+                "recogn_rpm": "Cloud Recognition Requests per Minute per Key",
                 "voice_silence": "Silence Segment for Google api/ms",
                 "interval_split": "Segment Duration in Equal Division",
                 "trans_thread": "Number of Subtitles Translated Simultaneously",
                 "aitrans_thread": "Number of Subtitles AI Translated Simultaneously",
+                "trans_concurrency": "Concurrent Translation Requests",
+                "trans_rpm": "Translation Requests per Minute",
+                "http_pool_size": "HTTP Pool Size per Channel",
+                "trans_cache_days": "Translation Cache Days",
+                "trans_cache_mb": "Translation Cache Size MB",
                 "retries": "Number of Retries on Translation Failure",
                 "dubbing_thread": "Number of Subtitles Dubbed Simultaneously",
                 "countdown_sec": "Countdown Seconds on Pause",
                 "backaudio_volume": "Background Volume Multiplier",
                 "loop_backaudio": "Loop Background Audio",
                 "cuda_com_type": "CUDA Data Type",
+                "whisper_server": "Persistent Whisper Process",
+                "whisper_server_idle": "Whisper Process Idle Seconds",
+                "average_batch_size": "Average Mode Batch Size",
                 "whisper_threads": "Faster-Whisper CPU Threads",
                 "whisper_worker": "Faster-Whisper Working Threads",
                 "beam_size": "Subtitle Recognition Accuracy Control 1",
@@ -583,6 +679,17 @@ class Ui_setini(object):
                     tmp.addStretch(1)
                     box.layout().addLayout(tmp)
                     continue
+                if key=='audio_stretch':
+                    backends = ['ffmpeg','pydub','librosa','wsola']
+                    tmp1 = QtWidgets.QComboBox()
+                    tmp1.addItems(backends)
+                    if val in backends:
+                        tmp1.setCurrentText(val)
+                    tmp1.setObjectName(key)
+                    tmp.addWidget(tmp1)
+                    tmp.addStretch(1)
+                    box.layout().addLayout(tmp)
+                    continue
                 if key=='subtitle_position':
                     pos = ['bottom','top','center']
                     tmp1 = QtWidgets.QComboBox()
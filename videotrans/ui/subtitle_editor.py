@@ -96,23 +96,15 @@ class SignThread(QThread):
             if self.uuid in config.stoped_uuid_set:
                 self.uuid=None
                 return
-            q = config.uuid_logs_queue.get(self.uuid)
-            if not q:
-                return
-            try:
-                if q.empty():
-                    time.sleep(0.5)
-                    continue
-                data = q.get(block=False)
-                if not data:
-                    continue
-                self.post(data)
-                if data['type'] in ['error', 'succeed']:
-                    self.uuid=None
-                    config.stoped_uuid_set.add(self.uuid)
-                    del config.uuid_logs_queue[self.uuid]
-            except:
-                pass
+            # 阻塞等待消息，最多 0.5s 后重新检查是否已停止
+            data = config.log_bus.get(self.uuid, timeout=0.5)
+            if not data:
+                continue
+            self.post(data)
+            if data.get('type') in ['error', 'succeed']:
+                config.stoped_uuid_set.add(self.uuid)
+                config.log_bus.remove(self.uuid)
+                self.uuid=None
 
 
 
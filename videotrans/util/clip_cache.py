@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+配音片段解码缓存
+
+同一个任务中，一条配音文件会在 BaseTTS.run 去除静音、SpeedRate._add_dubb_time 获取时长、
+process_audio 加速、_merge_audio_segments 合并时被反复 AudioSegment.from_file 解码
+这里按任务 uuid 各建一个缓存，以 (路径, mtime_ns, 文件尺寸) 为键保存解码后的 AudioSegment，
+文件被重写后键自然失效，超出字节预算时按 LRU 淘汰
+只需时长时优先读取文件头，不做解码
+"""
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+
+from videotrans.configure import config
+
+
+# pydub 需要的格式名，m4a 需以 mp4 读写
+def _format(filename):
+    ext = Path(filename).suffix.lower()[1:]
+    return 'mp4' if ext == 'm4a' else ext
+
+
+# 只读取文件头获取时长毫秒，无法获取时返回 None
+def probe_duration(filename):
+    ext = Path(filename).suffix.lower()
+    try:
+        if ext == '.wav':
+            with wave.open(filename, 'rb') as f:
+                return round(1000 * f.getnframes() / f.getframerate())
+        if ext in ['.mp3', '.flac', '.ogg']:
+            import soundfile as sf
+            info = sf.info(filename)
+            return round(1000 * info.frames / info.samplerate)
+    except Exception:
+        pass
+    return None
+
+
+class ClipCache:
+
+    def __init__(self, max_bytes=0):
+        if not max_bytes:
+            max_bytes = int(float(config.settings.get('clip_cache_mb', 512))) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        # key -> AudioSegment
+        self._data = OrderedDict()
+        # 路径 -> 当前 key，文件被改写后用于删掉旧条目
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(filename):
+        p = Path(filename)
+        st = p.stat()
+        return p.as_posix(), st.st_mtime_ns, st.st_size
+
+    def _put(self, key, segment):
+        size = len(segment.raw_data)
+        with self._lock:
+            old = self._keys.get(key[0])
+            if old is not None and old in self._data:
+                self._bytes -= len(self._data.pop(old).raw_data)
+            if size > self.max_bytes:
+                self._keys.pop(key[0], None)
+                return
+            self._data[key] = segment
+            self._keys[key[0]] = key
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                k, seg = self._data.popitem(last=False)
+                self._bytes -= len(seg.raw_data)
+                if self._keys.get(k[0]) == k:
+                    del self._keys[k[0]]
+
+    def _cached(self, key):
+        with self._lock:
+            segment = self._data.get(key)
+            if segment is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return segment
+
+    # 返回解码后的 AudioSegment，解码失败抛出 CouldntDecodeError
+    def get(self, filename):
+        from pydub import AudioSegment
+        key = self._key(filename)
+        segment = self._cached(key)
+        if segment is not None:
+            return segment
+        with self._lock:
+            self.misses += 1
+        segment = AudioSegment.from_file(filename, format=_format(filename))
+        self._put(key, segment)
+        return segment
+
+    # 写入文件，并以新的 mtime 保存到缓存，后续阶段无需再次解码
+    def export(self, segment, filename):
+        segment.export(filename, format=_format(filename))
+        self._put(self._key(filename), segment)
+        return filename
+
+    # 获取时长毫秒，已解码的直接返回，否则只读文件头，都不行时才解码
+    def duration(self, filename):
+        segment = self._cached(self._key(filename))
+        if segment is not None:
+            return len(segment)
+        ms = probe_duration(filename)
+        if ms is not None:
+            return ms
+        return len(self.get(filename))
+
+    def clear(self):
+        with self._lock:
+            if self.hits or self.misses:
+                config.logger.info(f'配音片段缓存 {self.hits=},{self.misses=},{self._bytes=}')
+            self._data.clear()
+            self._keys.clear()
+            self._bytes = 0
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+# 获取某个任务的片段缓存，uuid 为空时为全局共用
+def get_cache(uuid=None):
+    with _caches_lock:
+        if uuid not in _caches:
+            _caches[uuid] = ClipCache()
+        return _caches[uuid]
+
+
+# 任务结束后释放
+def release_cache(uuid=None):
+    with _caches_lock:
+        cache = _caches.pop(uuid, None)
+    if cache:
+        cache.clear()
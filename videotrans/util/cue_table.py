@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+字幕解析与紧凑存储
+
+一次遍历解析 SRT/VTT/ASS，每行只做一次时间行匹配，
+结果存入 CueTable: 起止毫秒为 array('q')，所有字幕文字拼接为一个字符串，按偏移取出
+同一字幕文件在一个任务中被多次读取(配音、对齐、校验目标字幕等)，
+ParseCache 以 (路径, 文件尺寸, mtime_ns) 为键缓存 CueTable，文件被改写后键自然失效
+调用方会修改返回的字典，缓存中只保存 CueTable，每次取用时重新生成字典列表
+"""
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+# 与原 srt_str_to_listdict 相同，时:分:秒 必须齐全
+_SRT_TIME = re.compile(r'\s?(\d+):(\d+):(\d+)([,.]\d+)?\s*?-{1,2}>\s*?(\d+):(\d+):(\d+)([,.]\d+)?\n?')
+# VTT 允许省略小时
+_VTT_TIME = re.compile(r'\s?(?:(\d+):)?(\d+):(\d+)([,.]\d+)?\s*?-{1,2}>\s*?(?:(\d+):)?(\d+):(\d+)([,.]\d+)?')
+_DIGITS = re.compile(r'\d+')
+_HTML_TAG = re.compile(r'</?[a-zA-Z]+>')
+_MULTI_NL = re.compile(r'\n{2,}')
+_ASS_OVERRIDE = re.compile(r'\{[^}]*\}')
+
+
+def format_ms(ms):
+    """
+    整数毫秒 -> 时:分:秒,毫秒，与 tools.ms_to_time_string 结果相同(小时按24取余)
+    """
+    sec = (ms // 1000) % 86400
+    return f"{sec // 3600:02}:{sec % 3600 // 60:02}:{sec % 60:02},{ms % 1000:03}"
+
+
+def _to_ms(h, m, s, ms):
+    # 与原解析相同，毫秒部分按数字原样计算，",5" 为 5 毫秒
+    return int(h or 0) * 3600000 + int(m) * 60000 + int(s) * 1000 + (int(ms[1:]) if ms else 0)
+
+
+def _clean(text_lines):
+    text = '\n'.join(text_lines).strip()
+    text = _HTML_TAG.sub('', text.replace("\r", '').strip())
+    text = _MULTI_NL.sub('\n', text).strip()
+    if text and text[0] in ['-', '[']:
+        text = text[1:]
+    if text and len(text) > 0 and text[-1] in ['-', ']']:
+        text = text[:-1]
+    return text
+
+
+class CueTable:
+    __slots__ = ('starts', 'ends', '_text', '_offsets')
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        # 全部字幕文字及每条的起始偏移，最后多一个结束偏移
+        self._text = ''
+        self._offsets = array('q', [0])
+
+    @classmethod
+    def from_cues(cls, cues):
+        """
+        cues: 可迭代的 (start_ms, end_ms, text)
+        """
+        table = cls()
+        texts = []
+        pos = 0
+        for start, end, text in cues:
+            table.starts.append(start)
+            table.ends.append(end)
+            texts.append(text)
+            pos += len(text)
+            table._offsets.append(pos)
+        table._text = ''.join(texts)
+        return table
+
+    def __len__(self):
+        return len(self.starts)
+
+    def text(self, i):
+        return self._text[self._offsets[i]:self._offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self.starts)):
+            yield self.starts[i], self.ends[i], self.text(i)
+
+    def to_list(self):
+        """
+        生成 srt_str_to_listdict 格式的字典列表，每次返回新的列表，可随意修改
+        """
+        result = []
+        for i, (start, end, text) in enumerate(self):
+            startraw = format_ms(start)
+            endraw = format_ms(end)
+            result.append({
+                "line": i + 1,
+                "start_time": start,
+                "end_time": end,
+                "text": text,
+                "startraw": startraw,
+                "endraw": endraw,
+                "time": f"{startraw} --> {endraw}",
+            })
+        return result
+
+    def to_srt(self):
+        return ''.join(f"{i + 1}\n{format_ms(start)} --> {format_ms(end)}\n{text}\n\n"
+                       for i, (start, end, text) in enumerate(self))
+
+
+def _iter_srt(lines, pattern):
+    """
+    逐行遍历，遇到时间行时结束上一条字幕
+    紧挨着时间行的纯数字行是下一条的序号，不计入上一条文字
+    连续两个时间行时，第一条为空字幕，第二个时间行开始新的一条，不再作为上一条的文字
+    """
+    current = None
+    text_lines = []
+    last_text_idx = -1
+    for i, raw in enumerate(lines):
+        line = raw.strip()
+        m = pattern.match(line)
+        if not m:
+            if current is not None and line:
+                text_lines.append(line)
+                last_text_idx = i
+            continue
+        if current is not None:
+            if text_lines and last_text_idx == i - 1 and _DIGITS.fullmatch(text_lines[-1]):
+                text_lines.pop()
+            yield current[0], current[1], _clean(text_lines)
+        g = m.groups()
+        current = (_to_ms(*g[0:4]), _to_ms(*g[4:8]))
+        text_lines = []
+    if current is not None:
+        yield current[0], current[1], _clean(text_lines)
+
+
+def _ass_time(t):
+    # H:MM:SS.cc 百分之一秒
+    h, m, s = t.strip().split(':')
+    sec, _, cs = s.partition('.')
+    return int(h) * 3600000 + int(m) * 60000 + int(sec) * 1000 + int((cs + '00')[:2]) * 10
+
+
+def _iter_ass(lines):
+    fields = ['Layer', 'Start', 'End', 'Style', 'Name', 'MarginL', 'MarginR', 'MarginV', 'Effect', 'Text']
+    in_events = False
+    for raw in lines:
+        line = raw.strip()
+        if line.startswith('['):
+            in_events = line.lower() == '[events]'
+            continue
+        if not in_events:
+            continue
+        if line.startswith('Format:'):
+            fields = [f.strip() for f in line[7:].split(',')]
+            continue
+        if not line.startswith('Dialogue:'):
+            continue
+        # Text 为最后一个字段，其中可能含有逗号
+        values = line[9:].split(',', len(fields) - 1)
+        if len(values) < len(fields):
+            continue
+        item = dict(zip(fields, values))
+        try:
+            start, end = _ass_time(item['Start']), _ass_time(item['End'])
+        except (KeyError, ValueError):
+            continue
+        text = _ASS_OVERRIDE.sub('', item.get('Text', '')).replace('\\N', '\n').replace('\\n', '\n')
+        yield start, end, _clean([t.strip() for t in text.split('\n') if t.strip()])
+
+
+def parse(content):
+    """
+    解析字幕字符串为 CueTable，根据内容识别 ASS、VTT，其余按 SRT 解析
+    """
+    lines = content.splitlines()
+    head = content.lstrip('\ufeff \t\r\n')[:16]
+    if head.startswith('[Script Info]') or re.search(r'^\[Events\]', content, re.M | re.I):
+        return CueTable.from_cues(_iter_ass(lines))
+    pattern = _VTT_TIME if head.upper().startswith('WEBVTT') else _SRT_TIME
+    return CueTable.from_cues(_iter_srt(lines, pattern))
+
+
+class ParseCache:
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(filename):
+        p = Path(filename)
+        try:
+            st = p.stat()
+        except OSError:
+            return None
+        return p.resolve().as_posix(), st.st_size, st.st_mtime_ns
+
+    def load(self, filename, parse_file):
+        """
+        命中时直接返回缓存的 CueTable，否则调用 parse_file(filename) 解析
+        键在读取文件前取得，读取期间文件被改写时下次会重新解析；空结果不缓存
+        """
+        key = self._key(filename)
+        if key is not None:
+            with self._lock:
+                table = self._data.get(key)
+                if table is not None:
+                    self._data.move_to_end(key)
+                    return table
+        table = parse_file(filename)
+        if key is not None and len(table) > 0:
+            with self._lock:
+                self._data[key] = table
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        return table
+
+    # 文件被改写后主动移除，避免 mtime 精度不足时读到旧结果
+    def forget(self, filename):
+        path = Path(filename).resolve().as_posix()
+        with self._lock:
+            for key in [k for k in self._data if k[0] == path]:
+                del self._data[key]
+
+
+_cache = ParseCache()
+
+
+def get_parse_cache():
+    return _cache
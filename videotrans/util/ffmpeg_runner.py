@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+ffmpeg 执行层，tools.runffmpeg 最终都在这里启动进程
+
+同时运行的 ffmpeg 进程数不超过 ffmpeg_jobs(0 为根据 cpu 核数自动)，超出的在此排队等待
+stderr 边运行边读取，只保留最后若干行用于出错提示，不再整体缓存在内存中
+传入 on_progress 时追加 -progress pipe:1，解析出已处理的毫秒数回调
+超过 timeout 秒，或软件退出、任务停止时结束 ffmpeg 进程
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from videotrans.configure import config
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def _get_slots():
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            try:
+                num = int(float(config.settings.get('ffmpeg_jobs', 0)))
+            except (TypeError, ValueError):
+                num = 0
+            if num < 1:
+                num = max(2, os.cpu_count() or 2)
+            _slots = threading.BoundedSemaphore(num)
+        return _slots
+
+
+def _drain_stderr(stream, tail):
+    for line in stream:
+        line = line.rstrip()
+        if line:
+            tail.append(line)
+
+
+def _read_progress(stream, on_progress):
+    for line in stream:
+        key, _, value = line.strip().partition('=')
+        # out_time_us 与 out_time_ms 的值均为微秒
+        if key in ('out_time_us', 'out_time_ms') and value.isdigit():
+            try:
+                on_progress(int(value) // 1000)
+            except Exception:
+                pass
+
+
+def run(cmd, *, timeout=None, on_progress=None, stop=None):
+    """
+    cmd: 完整命令行列表，cmd[0] 为 ffmpeg 路径
+    失败时抛出 subprocess.CalledProcessError，stderr 为最后若干行输出
+    超时抛出 subprocess.TimeoutExpired，被停止时抛出 Exception
+    """
+    if timeout is None:
+        timeout = float(config.settings.get('ffmpeg_timeout', 0) or 0)
+    cmd = list(cmd)
+    if on_progress:
+        cmd = cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:]
+    with _get_slots():
+        p = subprocess.Popen(cmd,
+                             stdin=subprocess.DEVNULL,
+                             stdout=subprocess.PIPE if on_progress else subprocess.DEVNULL,
+                             stderr=subprocess.PIPE,
+                             encoding="utf-8",
+                             errors='replace',
+                             text=True,
+                             creationflags=0 if sys.platform != 'win32' else subprocess.CREATE_NO_WINDOW)
+        tail = deque(maxlen=60)
+        readers = [threading.Thread(target=_drain_stderr, args=(p.stderr, tail), daemon=True)]
+        if on_progress:
+            readers.append(threading.Thread(target=_read_progress, args=(p.stdout, on_progress), daemon=True))
+        for t in readers:
+            t.start()
+        deadline = time.time() + timeout if timeout and timeout > 0 else 0
+        try:
+            while 1:
+                try:
+                    p.wait(timeout=0.5)
+                    break
+                except subprocess.TimeoutExpired:
+                    if deadline and time.time() > deadline:
+                        p.kill()
+                        p.wait()
+                        raise subprocess.TimeoutExpired(cmd, timeout, stderr='\n'.join(tail)) from None
+                    if config.exit_soft or (stop and stop()):
+                        p.kill()
+                        p.wait()
+                        raise Exception('ffmpeg stopped') from None
+        finally:
+            for t in readers:
+                t.join(timeout=2)
+    if p.returncode != 0:
+        raise subprocess.CalledProcessError(p.returncode, cmd, stderr='\n'.join(tail))
+    return True
+
+
+def multi_output(source, outputs, input_args=None):
+    """
+    一次解码写出多个输出，返回 runffmpeg 参数
+    outputs: [(输出参数列表, 输出文件), ...]
+    """
+    args = ['-y'] + (input_args or []) + ['-i', source]
+    for opts, out in outputs:
+        args += list(opts) + [out]
+    return args
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+按渠道复用的 HTTP 连接
+
+以往每次请求都新建 httpx.Client 或直接 requests.get，无法复用连接，每条字幕都要重新 TLS 握手
+且代理通过修改进程环境变量 http_proxy/https_proxy 传递，不同代理的任务并发时互相覆盖
+这里以 (渠道, 代理, 超时) 为键保存长期存在的 httpx.Client / requests.Session:
+代理显式传入，trust_env=False 不再读取环境变量，连接池上限为 http_pool_size
+httpx.Client 可在多线程间共用，OpenAI、Anthropic 等 SDK 通过 http_client 参数传入
+"""
+import threading
+
+from videotrans.configure import config
+
+_clients = {}
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _pool_size():
+    try:
+        return max(1, int(float(config.settings.get('http_pool_size', 20))))
+    except (TypeError, ValueError):
+        return 20
+
+
+def get_client(provider, *, proxy=None, timeout=None, verify=True):
+    """
+    httpx.Client，proxy 为代理地址字符串，None 为直连
+    timeout 为 None 时使用 httpx 默认超时
+    """
+    key = (provider, proxy or None, timeout, verify)
+    with _lock:
+        client = _clients.get(key)
+        if client is None or client.is_closed:
+            import httpx
+            size = _pool_size()
+            kwargs = {} if timeout is None else {"timeout": timeout}
+            client = _clients[key] = httpx.Client(
+                proxy=proxy or None,
+                verify=verify,
+                trust_env=False,
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=60),
+                **kwargs)
+        return client
+
+
+def get_session(provider, *, proxy=None):
+    """
+    requests.Session，调用时仍可传入 proxies/timeout/verify 覆盖
+    """
+    key = (provider, proxy or None)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.trust_env = False
+            if proxy:
+                session.proxies = {"http": proxy, "https": proxy}
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_pool_size())
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+        return session
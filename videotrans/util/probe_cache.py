@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+ffprobe 结果缓存
+
+同一个文件在 TransCreate.__init__、_append_video、_back_music、_separate、process_video 等处被反复探测，
+每次启动 ffprobe 进程耗时 50-200ms
+这里以 (路径, 文件尺寸, mtime_ns) 为键保存 -show_format -show_streams 的完整 json，
+get_video_info/get_audio_time 等均从中取值，文件被改写后键自然失效
+ffprobe 每次只能探测一个输入，probe_many 对未命中的文件并发启动 ffprobe
+"""
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from videotrans.configure import config
+
+
+class ProbeCache:
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # key -> ffprobe json
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(filename):
+        p = Path(filename)
+        try:
+            st = p.stat()
+        except OSError:
+            return None
+        return p.resolve().as_posix(), st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def _run(filename):
+        from videotrans.util.tools import runffprobe
+        out = runffprobe(['-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', filename])
+        if not out:
+            raise Exception(f'ffprobe error:dont get video information')
+        return json.loads(out)
+
+    def probe(self, filename):
+        """
+        返回 ffprobe json，{"format":{}, "streams":[]}，调用方不可修改返回值
+        """
+        filename = Path(filename).as_posix() if Path(filename).is_file() else filename
+        key = self._key(filename)
+        if key is not None:
+            with self._lock:
+                data = self._data.get(key)
+                if data is not None:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return data
+                self.misses += 1
+        data = self._run(filename)
+        if key is not None:
+            with self._lock:
+                self._data[key] = data
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        return data
+
+    def probe_many(self, files, workers=4):
+        """
+        批量探测，返回 {文件: json}，探测失败的文件不在结果中
+        """
+        files = list(dict.fromkeys(files))
+        result = {}
+        if not files:
+            return result
+
+        def _one(f):
+            try:
+                return f, self.probe(f)
+            except Exception as e:
+                config.logger.warning(f'ffprobe {f} 失败:{e}')
+                return f, None
+
+        if len(files) == 1:
+            pairs = [_one(files[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files)))) as pool:
+                pairs = list(pool.map(_one, files))
+        for f, data in pairs:
+            if data is not None:
+                result[f] = data
+        return result
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self._data),
+            }
+
+
+_cache = ProbeCache()
+
+
+def probe(filename):
+    return _cache.probe(filename)
+
+
+def probe_many(files, workers=4):
+    return _cache.probe_many(files, workers=workers)
+
+
+def get_probe_cache():
+    return _cache
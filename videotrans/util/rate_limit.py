@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+按渠道共享的令牌桶限速
+
+同一渠道(如 ChatGPT、DeepL)的所有并发请求共用一个桶，每次请求前 acquire 一个令牌
+rate 为每秒补充的令牌数，0 表示不限速
+遇到 429 时调用 backoff 暂停整个桶，暂停时长从 min_backoff 开始翻倍，最长 max_backoff，成功后复位
+"""
+import threading
+import time
+
+
+class TokenBucket:
+
+    def __init__(self, rate=0.0, capacity=1, min_backoff=5, max_backoff=60):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        # 429 后暂停到该时间点
+        self._paused_until = 0.0
+        self._backoff = 0
+        self._lock = threading.Lock()
+
+    def configure(self, rate=None, capacity=None):
+        with self._lock:
+            if rate is not None:
+                self.rate = float(rate)
+            if capacity is not None:
+                self.capacity = max(1, int(capacity))
+                self._tokens = min(self._tokens, self.capacity)
+
+    # 不阻塞，返回需等待的秒数，为 0 时已取得令牌
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.rate <= 0:
+                return 0
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, stop=None):
+        """
+        阻塞直到取得令牌，stop() 返回 True 时放弃并返回 False
+        """
+        while 1:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            if stop and stop():
+                return False
+            time.sleep(min(wait, 0.5))
+
+    # 遇到频率限制，暂停整个桶，返回本次暂停秒数
+    def backoff(self):
+        with self._lock:
+            self._backoff = self.min_backoff if not self._backoff else min(self.max_backoff, self._backoff * 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + self._backoff)
+            self._tokens = 0
+            return self._backoff
+
+    def success(self):
+        with self._lock:
+            self._backoff = 0
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+# 获取某渠道的令牌桶，rate 为每秒请求数
+def get_bucket(name, rate=0.0, capacity=1):
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = TokenBucket(rate=rate, capacity=capacity)
+            _buckets[name] = bucket
+        else:
+            bucket.configure(rate=rate, capacity=capacity)
+        return bucket
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+基于 NumPy 的静音检测与首尾静音去除
+
+与 pydub.silence.detect_silence / detect_nonsilent 判定规则一致:
+以毫秒为单位每隔 seek_step 取 min_silence_len 长的窗口，窗口内所有声道采样的整数 RMS <= 阈值即为静音，
+切片位置、RMS 取整、区间合并方式都与 pydub 相同，结果逐毫秒相同
+pydub 对每个窗口单独切片计算 RMS，这里用平方和的前缀和一次算出所有窗口
+
+非 wav/mp3/m4a 格式不再先转为 mp3 再转回，直接由 ffmpeg 解码、按原格式导出
+"""
+import concurrent.futures
+import os
+from pathlib import Path
+
+import numpy as np
+
+_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def _segment_array(audio):
+    """
+    AudioSegment -> (采样数组(帧数, 声道数), frame_rate, 最大振幅, 毫秒时长)，可在进程间传递
+    """
+    if audio.sample_width not in _DTYPES:
+        audio = audio.set_sample_width(2)
+    samples = np.frombuffer(audio.raw_data, dtype=_DTYPES[audio.sample_width]).reshape(-1, audio.channels)
+    return samples, audio.frame_rate, audio.max_possible_amplitude, len(audio)
+
+
+def detect_silence_array(samples, frame_rate, max_amplitude, duration_ms=None, min_silence_len=1000,
+                         silence_thresh=-16, seek_step=1):
+    """
+    samples: (帧数, 声道数) 整数采样
+    返回静音区间 [[start_ms, end_ms], ...]
+    """
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    frames, channels = samples.shape
+    seg_len = round(1000 * frames / frame_rate) if duration_ms is None else duration_ms
+    if seg_len < min_silence_len:
+        return []
+    thresh = (10 ** (silence_thresh / 20)) * max_amplitude
+
+    last_slice_start = seg_len - min_silence_len
+    starts = np.arange(0, last_slice_start + 1, seek_step, dtype=np.int64)
+    if last_slice_start % seek_step:
+        starts = np.append(starts, last_slice_start)
+    ends = np.minimum(starts + min_silence_len, seg_len)
+
+    # 每帧各声道平方和的前缀和，int64 足以容纳数小时的 16bit 音频
+    energy = np.square(samples, dtype=np.int64 if samples.dtype.itemsize < 4 else np.float64).sum(axis=1)
+    csum = np.concatenate(([0], np.cumsum(energy)))
+    # 与 pydub 切片相同: 帧号 = int(ms * frame_rate / 1000)
+    ratio = frame_rate / 1000.0
+    s = np.minimum((starts * ratio).astype(np.int64), frames)
+    e = np.minimum((ends * ratio).astype(np.int64), frames)
+    count = (e - s) * channels
+    total = (csum[e] - csum[s]).astype(np.float64)
+    mean = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+    # audioop.rms 返回向下取整的整数
+    rms = np.floor(np.sqrt(mean))
+    silence_starts = starts[rms <= thresh]
+    if silence_starts.size < 1:
+        return []
+
+    # 合并相邻的静音窗口: 不连续且间隔超过 min_silence_len 时断开
+    gaps = np.diff(silence_starts)
+    breaks = np.nonzero((gaps != seek_step) & (gaps > min_silence_len))[0]
+    range_starts = np.concatenate(([silence_starts[0]], silence_starts[breaks + 1]))
+    range_ends = np.concatenate((silence_starts[breaks], [silence_starts[-1]])) + min_silence_len
+    return [[int(a), int(b)] for a, b in zip(range_starts, range_ends)]
+
+
+def nonsilent_from_silence(silent_ranges, seg_len):
+    if not silent_ranges:
+        return [[0, seg_len]]
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == seg_len:
+        return []
+    prev_end = 0
+    nonsilent = []
+    for start, end in silent_ranges:
+        nonsilent.append([prev_end, start])
+        prev_end = end
+    if silent_ranges[-1][1] != seg_len:
+        nonsilent.append([prev_end, seg_len])
+    if nonsilent[0] == [0, 0]:
+        nonsilent.pop(0)
+    return nonsilent
+
+
+# 与 pydub.silence.detect_silence 参数、返回值相同
+def detect_silence(audio_segment, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+    samples, frame_rate, max_amplitude, seg_len = _segment_array(audio_segment)
+    return detect_silence_array(samples, frame_rate, max_amplitude, seg_len, min_silence_len, silence_thresh,
+                                seek_step)
+
+
+# 与 pydub.silence.detect_nonsilent 参数、返回值相同
+def detect_nonsilent(audio_segment, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+    samples, frame_rate, max_amplitude, seg_len = _segment_array(audio_segment)
+    silent = detect_silence_array(samples, frame_rate, max_amplitude, seg_len, min_silence_len, silence_thresh,
+                                  seek_step)
+    return nonsilent_from_silence(silent, seg_len)
+
+
+def _bounds_from_array(arr, silence_threshold=-50.0, chunk_size=10, is_start=True):
+    samples, frame_rate, max_amplitude, seg_len = arr
+    silent = detect_silence_array(samples, frame_rate, max_amplitude, seg_len, chunk_size, silence_threshold)
+    nonsilent = nonsilent_from_silence(silent, seg_len)
+    if not nonsilent:
+        return None
+    start = nonsilent[0][0] if is_start and nonsilent[0][0] > 0 else 0
+    return start, nonsilent[-1][1]
+
+
+def trim_bounds(audio, silence_threshold=-50.0, chunk_size=10, is_start=True):
+    """
+    去除尾部(is_start=True 时也去除头部)静音后应保留的 (start_ms, end_ms)，全部为静音时返回 None
+    """
+    return _bounds_from_array(_segment_array(audio), silence_threshold, chunk_size, is_start)
+
+
+def trim_bounds_many(audios, silence_threshold=-50.0, chunk_size=10, is_start=True, use_process=False):
+    """
+    批量计算多个 AudioSegment 的保留区间，结果与 audios 顺序一致
+    use_process=True 时在进程池中计算，只传递采样数组
+    """
+    arrays = [_segment_array(it) for it in audios]
+    if not use_process or len(arrays) < 2:
+        return [_bounds_from_array(it, silence_threshold, chunk_size, is_start) for it in arrays]
+    workers = max(1, min(len(arrays), (os.cpu_count() or 2) // 2))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_bounds_from_array, arrays, [silence_threshold] * len(arrays),
+                             [chunk_size] * len(arrays), [is_start] * len(arrays),
+                             chunksize=max(1, len(arrays) // (workers * 4))))
+
+
+def trim(audio, silence_threshold=-50.0, chunk_size=10, is_start=True):
+    bounds = trim_bounds(audio, silence_threshold, chunk_size, is_start)
+    if bounds is None:
+        # 全部为静音，原样返回
+        return audio
+    return audio[bounds[0]:bounds[1]]
+
+
+# pydub 读写时使用的格式名
+def _format(ext):
+    return {"m4a": "mp4", "aac": "adts"}.get(ext, ext)
+
+
+def trim_file(input_file_path, silence_threshold=-50.0, chunk_size=10, is_start=True):
+    """
+    原地去除音频文件首尾静音，返回 (路径, 处理后毫秒时长)，无法解码时时长为0
+    """
+    from pydub import AudioSegment
+    ext = Path(input_file_path).suffix.lower()[1:]
+    try:
+        audio = AudioSegment.from_file(input_file_path, format=_format(ext))
+    except Exception:
+        return input_file_path, 0
+    bounds = trim_bounds(audio, silence_threshold, chunk_size, is_start)
+    if bounds is None or (bounds[0] == 0 and bounds[1] >= len(audio)):
+        return input_file_path, len(audio)
+    trimmed = audio[bounds[0]:bounds[1]]
+    # 先写入临时文件，导出失败时不破坏原文件
+    tmp = f'{input_file_path}.trim.{ext}'
+    try:
+        trimmed.export(tmp, format=_format(ext))
+        Path(tmp).replace(input_file_path)
+    except Exception:
+        Path(tmp).unlink(missing_ok=True)
+        return input_file_path, len(audio)
+    return input_file_path, len(trimmed)
+
+
+def trim_files(files, silence_threshold=-50.0, chunk_size=10, is_start=True, use_process=False):
+    """
+    批量原地去除静音，返回 [(路径, 毫秒时长)]，顺序与 files 一致
+    """
+    if len(files) < 1:
+        return []
+    workers = max(1, min(len(files), (os.cpu_count() or 2) // 2))
+    pool = concurrent.futures.ProcessPoolExecutor if use_process else concurrent.futures.ThreadPoolExecutor
+    with pool(max_workers=workers) as executor:
+        return list(executor.map(trim_file, files, [silence_threshold] * len(files), [chunk_size] * len(files),
+                                 [is_start] * len(files)))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+保持音调的音频加速，可选多种实现
+pydub   = AudioSegment.speedup，分块交叉淡化，速度慢且有断续感
+ffmpeg  = atempo 滤镜链，单个 atempo 超过2倍时拆分为多级
+librosa = librosa.effects.time_stretch 相位声码器，需安装 librosa
+wsola   = 基于 NumPy 的 WSOLA 波形相似叠加，无需额外依赖
+所有实现均输入输出 pydub AudioSegment
+"""
+import os
+import time
+
+import numpy as np
+
+from videotrans.configure import config
+
+STRETCH_BACKENDS = ['ffmpeg', 'pydub', 'librosa', 'wsola']
+
+
+# AudioSegment 转为 (帧数, 声道数) 的 float32 数组，范围 -1~1
+def _to_array(audio):
+    audio = audio.set_sample_width(2)
+    samples = np.frombuffer(audio.raw_data, dtype=np.int16).reshape(-1, audio.channels)
+    return samples.astype(np.float32) / 32768.0
+
+
+def _from_array(samples, audio):
+    from pydub import AudioSegment
+    data = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    return AudioSegment(data=data.tobytes(), sample_width=2, frame_rate=audio.frame_rate, channels=audio.channels)
+
+
+# atempo 滤镜链，旧版 ffmpeg 单个 atempo 只支持 0.5-2.0
+def atempo_chain(rate):
+    filters = []
+    while rate > 2.0:
+        filters.append('atempo=2.0')
+        rate /= 2.0
+    filters.append(f'atempo={rate:.6f}')
+    return ','.join(filters)
+
+
+def _speedup_ffmpeg(audio, rate):
+    from pydub import AudioSegment
+    from videotrans.util import tools
+    name = f'{config.TEMP_DIR}/speedup-{time.time()}-{os.getpid()}-{id(audio)}'
+    try:
+        audio.export(name + '.wav', format='wav')
+        tools.runffmpeg(['-y', '-i', name + '.wav', '-filter:a', atempo_chain(rate), name + '-atempo.wav'])
+        return AudioSegment.from_file(name + '-atempo.wav', format='wav')
+    finally:
+        for f in [name + '.wav', name + '-atempo.wav']:
+            try:
+                os.unlink(f)
+            except OSError:
+                pass
+
+
+def _speedup_librosa(audio, rate):
+    import librosa
+    samples = _to_array(audio)
+    stretched = librosa.effects.time_stretch(np.ascontiguousarray(samples.T), rate=rate)
+    return _from_array(np.atleast_2d(stretched).T, audio)
+
+
+def wsola(samples, rate, sample_rate, frame_ms=30, tolerance_ms=10):
+    """
+    WSOLA 时间伸缩，samples 为 (帧数, 声道数) 数组，rate>1 为加速
+    每一帧在名义位置附近 tolerance 范围内寻找与上一帧自然延续波形最相似的位置，再以汉宁窗叠加
+    """
+    frame = max(64, int(sample_rate * frame_ms / 1000))
+    frame -= frame % 2
+    hop_out = frame // 2
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+    hop_in = hop_out * rate
+    total = samples.shape[0]
+    out_len = int(total / rate)
+    if out_len < frame or total < frame:
+        return samples[:out_len]
+
+    window = np.hanning(frame).astype(np.float32)
+    pad = frame + tolerance + hop_out
+    src = np.concatenate([samples, np.zeros((pad, samples.shape[1]), dtype=samples.dtype)])
+    mono = src.mean(axis=1)
+    out = np.zeros((out_len + frame, samples.shape[1]), dtype=np.float32)
+    norm = np.zeros(out_len + frame, dtype=np.float32)
+
+    prev = 0
+    out_pos = 0
+    k = 0
+    while out_pos < out_len:
+        nominal = int(k * hop_in)
+        if k == 0:
+            start = 0
+        else:
+            # 上一帧的自然延续
+            ref = mono[prev + hop_out:prev + hop_out + frame]
+            lo = max(0, nominal - tolerance)
+            hi = min(total, nominal + tolerance)
+            corr = np.correlate(mono[lo:hi + frame], ref, mode='valid')
+            start = lo + int(np.argmax(corr)) if corr.size else nominal
+        out[out_pos:out_pos + frame] += src[start:start + frame] * window[:, None]
+        norm[out_pos:out_pos + frame] += window
+        prev = start
+        out_pos += hop_out
+        k += 1
+    norm[norm < 1e-3] = 1.0
+    return out[:out_len] / norm[:out_len, None]
+
+
+def _speedup_wsola(audio, rate):
+    return _from_array(wsola(_to_array(audio), rate, audio.frame_rate), audio)
+
+
+# 按设置的实现对 AudioSegment 加速 rate 倍，保持音调
+def speedup(audio, rate, backend=None):
+    if not backend:
+        backend = config.settings.get('audio_stretch', 'ffmpeg')
+    if rate <= 1:
+        return audio
+    if backend == 'ffmpeg':
+        return _speedup_ffmpeg(audio, rate)
+    if backend == 'librosa':
+        try:
+            return _speedup_librosa(audio, rate)
+        except ImportError:
+            config.logger.warning('未安装 librosa，使用 wsola 加速')
+            return _speedup_wsola(audio, rate)
+    if backend == 'wsola':
+        return _speedup_wsola(audio, rate)
+    return audio.speedup(playback_speed=rate)
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import copy
 import datetime
 import hashlib
 import json
@@ -18,6 +17,7 @@ from pathlib import Path
 import requests
 
 from videotrans.configure import config
+from videotrans.util import ffmpeg_runner, cue_table
 
 
 # 根据 gptsovits config.params['gptsovits_role'] 返回以参考音频为key的dict
@@ -521,8 +521,9 @@ def extract_concise_error(stderr_text: str, max_lines=3, max_length=250) -> str:
 
 
 # 执行 ffmpeg
-def runffmpeg(arg, *, noextname=None, uuid=None, force_cpu=False):
-    arg_copy = copy.deepcopy(arg)
+# 实际执行见 videotrans/util/ffmpeg_runner.py，timeout 秒后结束进程，on_progress(已处理毫秒) 报告进度
+def runffmpeg(arg, *, noextname=None, uuid=None, force_cpu=False, timeout=None, on_progress=None):
+    arg_copy = list(arg)
     file_name = ""
 
     cmd = [config.FFMPEG_BIN, "-hide_banner", "-ignore_unknown"]
@@ -590,14 +591,8 @@ def runffmpeg(arg, *, noextname=None, uuid=None, force_cpu=False):
         config.queue_novice[noextname] = 'ing'
     try:
         config.logger.info(f'{force_cpu=},{cmd=}')
-        subprocess.run(cmd,
-                       stdout=subprocess.PIPE,
-                       stderr=subprocess.PIPE,
-                       encoding="utf-8",
-                       errors='replace',
-                       check=True,
-                       text=True,
-                       creationflags=0 if sys.platform != 'win32' else subprocess.CREATE_NO_WINDOW)
+        ffmpeg_runner.run(cmd, timeout=timeout, on_progress=on_progress,
+                          stop=(lambda: uuid in config.stoped_uuid_set) if uuid else None)
         if noextname:
             config.queue_novice[noextname] = "end"
         return True
@@ -627,7 +622,8 @@ def runffmpeg(arg, *, noextname=None, uuid=None, force_cpu=False):
             for i, it in enumerate(arg_copy):
                 if i > 0 and arg_copy[i - 1] == '-c:v' and arg_copy[i] not in ['copy', 'libx264', 'libx265']:
                     arg_copy[i] = default_codec
-            return runffmpeg(arg_copy, noextname=noextname, force_cpu=True)
+            return runffmpeg(arg_copy, noextname=noextname, uuid=uuid, force_cpu=True, timeout=timeout,
+                             on_progress=on_progress)
         if noextname:
             config.queue_novice[noextname] = "error"
         raise Exception(extract_concise_error(e.stderr))
@@ -703,13 +699,10 @@ def hide_show_element(wrap_layout, show_status):
 
 
 # 获取视频信息
+# ffprobe 结果按 (路径, 尺寸, mtime) 缓存，同一文件只探测一次
 def get_video_info(mp4_file, *, video_fps=False, video_scale=False, video_time=False, get_codec=False):
-    mp4_file = Path(mp4_file).as_posix()
-    out = runffprobe(
-        ['-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', mp4_file])
-    if out is False:
-        raise Exception(f'ffprobe error:dont get video information')
-    out = json.loads(out)
+    from videotrans.util.probe_cache import probe
+    out = probe(Path(mp4_file).as_posix())
     result = {
         "video_fps": 30,
         "video_codec_name": "",
@@ -799,42 +792,29 @@ def split_novoice_byraw(source_mp4, novoice_mp4, noextname, lib="copy"):
 
 
 # 从原始视频中分离出音频 cuda + h264_cuvid
-def split_audio_byraw(source_mp4, targe_audio, is_separate=False, uuid=None):
+# recogn_audio 不为空时，同一次解码中同时输出 16k 待识别音频
+# is_separate 时人声分离所需的 44.1k 双声道 wav 也在同一次解码中输出
+# novoice_mp4 不为空时，同时以流复制方式输出无声视频，noextname 用于标记其完成状态
+def split_audio_byraw(source_mp4, targe_audio, is_separate=False, uuid=None, recogn_audio=None, novoice_mp4=None,
+                      noextname=None):
     source_mp4 = Path(source_mp4).as_posix()
     targe_audio = Path(targe_audio).as_posix()
-    cmd = [
-        "-y",
-        "-i",
-        source_mp4,
-        "-vn",
-        "-ac",
-        "1",
-        "-b:a",
-        "128k",
-        "-c:a",
-        "aac",
-        targe_audio
-    ]
-    rs = runffmpeg(cmd)
+    outputs = []
+    if novoice_mp4:
+        outputs.append((["-an", "-c:v", "copy"], Path(novoice_mp4).as_posix()))
+    outputs.append((["-vn", "-ac", "1", "-b:a", "128k", "-c:a", "aac"], targe_audio))
+    if recogn_audio:
+        outputs.append((["-vn", "-ac", "1", "-ar", "16000"], Path(recogn_audio).as_posix()))
+    if is_separate:
+        tmpdir = config.TEMP_DIR + f"/{time.time()}"
+        os.makedirs(tmpdir, exist_ok=True)
+        tmpfile = tmpdir + "/raw.wav"
+        outputs.append((["-vn", "-ac", "2", "-ar", "44100", "-c:a", "pcm_s16le"], tmpfile))
+    rs = runffmpeg(ffmpeg_runner.multi_output(source_mp4, outputs), uuid=uuid,
+                   noextname=noextname if novoice_mp4 else None)
     if not is_separate:
         return rs
     # 继续人声分离
-    tmpdir = config.TEMP_DIR + f"/{time.time()}"
-    os.makedirs(tmpdir, exist_ok=True)
-    tmpfile = tmpdir + "/raw.wav"
-    runffmpeg([
-        "-y",
-        "-i",
-        source_mp4,
-        "-vn",
-        "-ac",
-        "2",
-        "-ar",
-        "44100",
-        "-c:a",
-        "pcm_s16le",
-        tmpfile
-    ])
     from videotrans.separate import st
     try:
         path = Path(targe_audio).parent.as_posix()
@@ -1021,7 +1001,8 @@ def precise_speed_up_audio(*, file_path=None, out=None, target_duration_ms=None,
     rate = min(max_rate, speedup_ratio)
     # 变速处理
     try:
-        fast_audio = audio.speedup(playback_speed=rate)
+        from videotrans.util.time_stretch import speedup
+        fast_audio = speedup(audio, rate)
         # 如果处理后的音频时长稍长于目标时长，进行剪裁
         if len(fast_audio) > target_duration_ms:
             fast_audio = fast_audio[:target_duration_ms]
@@ -1062,6 +1043,9 @@ print(ms_to_time_string(ms=12030))
 
 
 def ms_to_time_string(*, ms=0, seconds=None):
+    # 整数毫秒直接计算，不再经由 format_time 拆分字符串
+    if seconds is None and isinstance(ms, int):
+        return cue_table.format_ms(ms)
     # 计算小时、分钟、秒和毫秒
     if seconds is None:
         td = timedelta(milliseconds=ms)
@@ -1070,9 +1054,7 @@ def ms_to_time_string(*, ms=0, seconds=None):
     hours, remainder = divmod(td.seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
     milliseconds = td.microseconds // 1000
-
-    time_string = f"{hours}:{minutes}:{seconds},{milliseconds}"
-    return format_time(time_string, ',')
+    return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
 
 
 # 将不规范的 时:分:秒,|.毫秒格式为  aa:bb:cc,ddd形式
@@ -1126,95 +1108,26 @@ def get_ms_from_hmsm(time_str):
 
 
 def srt_str_to_listdict(srt_string):
-    """解析 SRT 字幕字符串，更精确地处理数字行和时间行之间的关系"""
-    srt_list = []
-    time_pattern = r'\s?(\d+):(\d+):(\d+)([,.]\d+)?\s*?-{1,2}>\s*?(\d+):(\d+):(\d+)([,.]\d+)?\n?'
-    lines = srt_string.splitlines()
-    i = 0
-
-    while i < len(lines):
-        time_match = re.match(time_pattern, lines[i].strip())
-        if time_match:
-            # 解析时间戳
-            start_time_groups = time_match.groups()[0:4]
-            end_time_groups = time_match.groups()[4:8]
-            print(f'当前时间行{i=},{start_time_groups}-->{end_time_groups}')
-
-            def parse_time(time_groups):
-                h, m, s, ms = time_groups
-                ms = ms.replace(',', '').replace('.', '') if ms else "0"
-                try:
-                    return int(h) * 3600000 + int(m) * 60000 + int(s) * 1000 + int(ms)
-                except (ValueError, TypeError):
-                    return None
+    """解析 SRT/VTT/ASS 字幕字符串，一次遍历，见 cue_table.parse"""
+    return cue_table.parse(srt_string).to_list()
 
-            start_time = parse_time(start_time_groups)
-            end_time = parse_time(end_time_groups)
-
-            if start_time is None or end_time is None:
-                i += 1
-                continue
-
-            i += 1
-            text_lines = []
-            while i < len(lines):
-                current_line = lines[i].strip()
-                next_line = lines[i + 1].strip() if i + 1 < len(lines) else ""  # 获取下一行，如果没有则为空字符串
-
-                if re.match(time_pattern, next_line):  # 判断下一行是否为时间行
-                    if re.fullmatch(r'\d+', current_line):  # 如果当前行为纯数字，则跳过
-                        i += 1
-                        break
-                    else:
-                        if current_line:
-                            text_lines.append(current_line)
-                        i += 1
-                        break
-
-                if current_line:
-                    text_lines.append(current_line)
-                    i += 1
-                else:
-                    i += 1
-
-            text = ('\n'.join(text_lines)).strip()
-            text = re.sub(r'</?[a-zA-Z]+>', '', text.replace("\r", '').strip())
-            text = re.sub(r'\n{2,}', '\n', text).strip()
-            if text and text[0] in ['-','[']:
-                text=text[1:]
-            if text and len(text)>0 and text[-1] in ['-',']']:
-                text=text[:-1]
-            it = {
-                "line": len(srt_list) + 1,  # 字幕索引，转换为整数
-                "start_time": int(start_time),
-                "end_time": int(end_time),  # 起始和结束时间
-                "text": text if text else "",  # 字幕文本
-            }
-            it['startraw'] = ms_to_time_string(ms=it['start_time'])
-            it['endraw'] = ms_to_time_string(ms=it['end_time'])
-            it["time"] = f"{it['startraw']} --> {it['endraw']}"
-            srt_list.append(it)
 
-
-        else:
-            i += 1  # 跳过非时间行
-
-    return srt_list
+def _parse_srt_table(content):
+    try:
+        return cue_table.parse(content)
+    except Exception as e:
+        config.logger.error(e)
+        return cue_table.parse(process_text_to_srt_str(content))
 
 
 # 将字符串或者字幕文件内容，格式化为有效字幕数组对象
 # 格式化为有效的srt格式
 def format_srt(content):
-    result = []
-    try:
-        result = srt_str_to_listdict(content)
-    except Exception as e:
-        config.logger.error(e)
-        result = srt_str_to_listdict(process_text_to_srt_str(content))
-    return result
+    return _parse_srt_table(content).to_list()
 
 
 # 将srt文件或合法srt字符串转为字典对象
+# 文件按 (路径, 尺寸, mtime) 缓存解析结果，同一任务中多次读取同一字幕不再重复解析
 def get_subtitle_from_srt(srtfile, *, is_file=True):
     def _readfile(file):
         content = ""
@@ -1230,22 +1143,28 @@ def get_subtitle_from_srt(srtfile, *, is_file=True):
         return content
 
     content = ''
+
+    def _parse_file(file):
+        nonlocal content
+        content = _readfile(file)
+        if len(content) < 1:
+            raise Exception(f"srt is empty:{srtfile=},{content=}")
+        return _parse_srt_table(content)
+
     if is_file:
-        content = _readfile(srtfile)
+        table = cue_table.get_parse_cache().load(srtfile, _parse_file)
     else:
         content = srtfile.strip()
-
-    if len(content) < 1:
-        raise Exception(f"srt is empty:{srtfile=},{content=}")
-    result = format_srt(copy.copy(content))
-
+        if len(content) < 1:
+            raise Exception(f"srt is empty:{srtfile=},{content=}")
+        table = _parse_srt_table(content)
 
     # txt 文件转为一条字幕
-    if len(result) < 1:
-        result = [
+    if len(table) < 1:
+        return [
             {"line": 1, "time": "00:00:00,000 --> 00:00:02,000", "text": "\n".join(content)}
         ]
-    return result
+    return table.to_list()
 
 
 # 将字幕字典列表写入srt文件
@@ -1253,6 +1172,7 @@ def save_srt(srt_list, srt_file):
     txt = get_srt_from_list(srt_list)
     with open(srt_file, "w", encoding="utf-8") as f:
         f.write(txt)
+    cue_table.get_parse_cache().forget(srt_file)
     return True
 
 
@@ -1264,7 +1184,7 @@ def get_current_time_as_yymmddhhmmss(format='hms'):
 
 # 从 字幕 对象中获取 srt 字幕串
 def get_srt_from_list(srt_list):
-    txt = ""
+    parts = []
     line = 0
     # it中可能含有完整时间戳 it['time']   00:00:01,123 --> 00:00:12,345
     # 开始和结束时间戳  it['startraw']=00:00:01,123  it['endraw']=00:00:12,345
@@ -1289,9 +1209,9 @@ def get_srt_from_list(srt_list):
             startraw = it['startraw']
             endraw = it['endraw']
 
-        
-        txt += f"{line}\n{startraw} --> {endraw}\n{it['text']}\n\n"
-    return txt
+
+        parts.append(f"{line}\n{startraw} --> {endraw}\n{it['text']}\n\n")
+    return "".join(parts)
 
 
 # 将srt字幕转为 ass字幕
@@ -1473,12 +1393,14 @@ def send_notification(title, message):
 
 # 获取音频时长
 def get_audio_time(audio_file):
-    # 如果存在缓存并且没有禁用缓存
-    out = runffprobe(['-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', audio_file])
-    if out is False:
-        raise Exception(f'ffprobe error:dont get video information')
-    out = json.loads(out)
-    return float(out['format']['duration'])
+    from videotrans.util.probe_cache import probe
+    return float(probe(audio_file)['format']['duration'])
+
+
+# 并发探测多个文件并放入缓存，之后的 get_video_info/get_audio_time 直接命中
+def probe_files(files):
+    from videotrans.util.probe_cache import probe_many
+    return probe_many([f for f in files if f])
 
 
 def kill_ffmpeg_processes():
@@ -1503,144 +1425,27 @@ def kill_ffmpeg_processes():
         pass
 
 
+# 静音检测见 videotrans/util/silence.py，结果与 pydub.silence 一致
 def remove_silence_from_chunk(audio, silence_threshold=-50.0, chunk_size=10, is_start=True):
-    from pydub.silence import detect_nonsilent
     """
-    Removes silence from the end of an audio file.
-
-    :param input_file_path: path to the input mp3 file
-    :param silence_threshold: the threshold in dBFS considered as silence
-    :param chunk_size: the chunk size to use in silence detection (in milliseconds)
-    :return: an AudioSegment without silence at the end
+    去除 AudioSegment 尾部(is_start=True 时也去除头部)静音，全部为静音时原样返回
     """
-    # Load the audio file
-    # Detect non-silent chunks
-    nonsilent_chunks = detect_nonsilent(
-        audio,
-        min_silence_len=chunk_size,
-        silence_thresh=silence_threshold
-    )
-
-    # If we have nonsilent chunks, get the start and end of the last nonsilent chunk
-    if nonsilent_chunks:
-        start_index, end_index = nonsilent_chunks[-1]
-    else:
-        # If the whole audio is silent, just return it as is
-        return audio
-
-    # Remove the silence from the end by slicing the audio segment
-    trimmed_audio = audio[:end_index]
-    if is_start and nonsilent_chunks[0] and nonsilent_chunks[0][0] > 0:
-        trimmed_audio = audio[nonsilent_chunks[0][0]:end_index]
-    return trimmed_audio
+    from videotrans.util import silence
+    return silence.trim(audio, silence_threshold=silence_threshold, chunk_size=chunk_size, is_start=is_start)
 
 
 # input_file_path 可能是字符串：文件路径，也可能是音频数据
 def remove_silence_from_end(input_file_path, silence_threshold=-50.0, chunk_size=10, is_start=True):
-    from pydub import AudioSegment
-    from pydub.silence import detect_nonsilent
-    """
-    Removes silence from the end of an audio file.
-
-    :param input_file_path: path to the input mp3 file
-    :param silence_threshold: the threshold in dBFS considered as silence
-    :param chunk_size: the chunk size to use in silence detection (in milliseconds)
-    :return: an AudioSegment without silence at the end
-    """
-    # Load the audio file
-    format = "wav"
+    from videotrans.util import silence
     if isinstance(input_file_path, str):
-        format = input_file_path.split('.')[-1].lower()
-        if format in ['wav', 'mp3', 'm4a']:
-            audio = AudioSegment.from_file(input_file_path, format=format if format in ['wav', 'mp3'] else 'mp4')
-        else:
-            # 转为mp3
-            try:
-                runffmpeg(['-y', '-i', input_file_path, input_file_path + ".mp3"])
-                audio = AudioSegment.from_file(input_file_path + ".mp3", format="mp3")
-            except Exception:
-                return input_file_path
-
-    else:
-        audio = input_file_path
-
-    # Detect non-silent chunks
-    nonsilent_chunks = detect_nonsilent(
-        audio,
-        min_silence_len=chunk_size,
-        silence_thresh=silence_threshold
-    )
-
-    # If we have nonsilent chunks, get the start and end of the last nonsilent chunk
-    if nonsilent_chunks:
-        start_index, end_index = nonsilent_chunks[-1]
-    else:
-        # If the whole audio is silent, just return it as is
-        return input_file_path
-
-    # Remove the silence from the end by slicing the audio segment
-    trimmed_audio = audio[:end_index]
-    if is_start and nonsilent_chunks[0] and nonsilent_chunks[0][0] > 0:
-        trimmed_audio = audio[nonsilent_chunks[0][0]:end_index]
-    if isinstance(input_file_path, str):
-        if format in ['wav', 'mp3', 'm4a']:
-            trimmed_audio.export(input_file_path, format=format if format in ['wav', 'mp3'] else 'mp4')
-            return input_file_path
-        try:
-            trimmed_audio.export(input_file_path + ".mp3", format="mp3")
-            runffmpeg(['-y', '-i', input_file_path + ".mp3", input_file_path])
-        except Exception:
-            pass
-        return input_file_path
-    return trimmed_audio
+        return silence.trim_file(input_file_path, silence_threshold, chunk_size, is_start)[0]
+    return silence.trim(input_file_path, silence_threshold=silence_threshold, chunk_size=chunk_size,
+                        is_start=is_start)
 
 
 def remove_silence_from_file(input_file_path, silence_threshold=-50.0, chunk_size=10, is_start=True):
-    from pydub import AudioSegment
-    from pydub.silence import detect_nonsilent
-    # Load the audio file
-    format = input_file_path.split('.')[-1].lower()
-    length = 0
-    if format in ['wav', 'mp3', 'm4a']:
-        audio = AudioSegment.from_file(input_file_path, format=format if format in ['wav', 'mp3'] else 'mp4')
-        length = len(audio)
-    else:
-        # 转为mp3
-        try:
-            runffmpeg(['-y', '-i', input_file_path, input_file_path + ".mp3"])
-            audio = AudioSegment.from_file(input_file_path + ".mp3", format="mp3")
-            length = len(audio)
-        except Exception:
-            return input_file_path, length
-
-    # Detect non-silent chunks
-    nonsilent_chunks = detect_nonsilent(
-        audio,
-        min_silence_len=chunk_size,
-        silence_thresh=silence_threshold
-    )
-
-    # If we have nonsilent chunks, get the start and end of the last nonsilent chunk
-    if nonsilent_chunks:
-        start_index, end_index = nonsilent_chunks[-1]
-    else:
-        # If the whole audio is silent, just return it as is
-        return input_file_path, length
-
-    # Remove the silence from the end by slicing the audio segment
-    trimmed_audio = audio[:end_index]
-    if is_start and nonsilent_chunks[0] and nonsilent_chunks[0][0] > 0:
-        trimmed_audio = audio[nonsilent_chunks[0][0]:end_index]
-    length = len(trimmed_audio)
-    if format in ['wav', 'mp3', 'm4a']:
-        trimmed_audio.export(input_file_path, format=format if format in ['wav', 'mp3'] else 'mp4')
-        return input_file_path, length
-    try:
-        trimmed_audio.export(input_file_path + ".mp3", format="mp3")
-        runffmpeg(['-y', '-i', input_file_path + ".mp3", input_file_path])
-    except Exception:
-        pass
-    return input_file_path, length
+    from videotrans.util import silence
+    return silence.trim_file(input_file_path, silence_threshold, chunk_size, is_start)
 
 
 def remove_qsettings_data():
@@ -38,31 +38,20 @@ class SignThread(QThread):
                 time.sleep(1)
                 return
 
-            for uuid in self.uuid_list:
-                if uuid in config.stoped_uuid_set:
-                    try:
-                        self.uuid_list.remove(uuid)
-                    except:
-                        pass
-                    continue
-                q = config.uuid_logs_queue.get(uuid)
-                if not q:
-                    continue
-                try:
-                    if q.empty():
-                        time.sleep(0.5)
-                        continue
-                    data = q.get(block=False)
-                    if not data:
-                        continue
-                    self.post(data)
-                    if data['type'] in ['error', 'succeed']:
-                        self.uuid_list.remove(uuid)
-                        self.post({"type": "jindu", "text": f'{int((length - len(self.uuid_list)) * 100 / length)}%'})
-                        config.stoped_uuid_set.add(uuid)
-                        del config.uuid_logs_queue[uuid]
-                except:
-                    pass
+            for uuid in [it for it in self.uuid_list if it in config.stoped_uuid_set]:
+                self.uuid_list.remove(uuid)
+            if len(self.uuid_list) == 0:
+                continue
+            # 阻塞等待任一任务的消息，不再逐个轮询
+            uuid, data = config.log_bus.get_any(self.uuid_list, timeout=0.5)
+            if not data:
+                continue
+            self.post(data)
+            if data.get('type') in ['error', 'succeed']:
+                self.uuid_list.remove(uuid)
+                self.post({"type": "jindu", "text": f'{int((length - len(self.uuid_list)) * 100 / length)}%'})
+                config.stoped_uuid_set.add(uuid)
+                config.log_bus.remove(uuid)
 
 langname_dict={
     "zh-cn": "中文简",
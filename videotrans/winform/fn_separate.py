@@ -42,12 +42,11 @@ def openwin():
         # 已在执行，在此点击停止
         if winobj.has_done:
             winobj.has_done = False
-            config.uuid_logs_queue[uuid] = 'stop'
+            config.log_bus.mute(uuid)
             winobj.set.setText(config.transobj['Start Separate'])
             return
         winobj.has_done = True
-        if uuid in config.uuid_logs_queue:
-            del config.uuid_logs_queue[uuid]
+        config.log_bus.remove(uuid)
 
         winobj.set.setText(config.transobj['Start Separate...'])
         basename = os.path.basename(file)
@@ -15,6 +15,9 @@ def openwin():
         # 创建一个空字典来存储结果
         line_edit_dict = config.settings
         shoud_model_list_sign=False
+        # line_edit_dict 即 config.settings 本身，先记录常驻识别进程相关设置的旧值
+        from videotrans.recognition._whisper_server import RESTART_SETTINGS, shutdown_whisper_server
+        old_server_settings = [str(line_edit_dict.get(k)) for k in RESTART_SETTINGS]
 
         # 遍历找到的所有QLineEdit控件
         for line_edit in winobj.findChildren(QLineEdit):
@@ -62,6 +65,8 @@ def openwin():
             config.settings = line_edit_dict
             if shoud_model_list_sign:
                 tools.set_process(text="",type='refreshmodel_list')
+            if old_server_settings != [str(line_edit_dict.get(k)) for k in RESTART_SETTINGS]:
+                shutdown_whisper_server()
 
         winobj.close()
 